@@ -1,13 +1,32 @@
 """
 Main entry point for the Telegram bot application before testing.
+
+Runs long polling by default, ``--webhook`` serves the webhook instead
+(see :mod:`app.bot.webhook`).
 """
 
-from .core import bot, dp
+import argparse
 import logging
 
+from .core import bot, dp
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Telegram bot")
+    parser.add_argument(
+        "--webhook",
+        action="store_true",
+        help="Receive updates with a webhook (WEBHOOK_* settings) instead of polling",
+    )
+    args = parser.parse_args()
+
     assert (
         bot is not None
     ), "Bot is not initialized, check environment variable BOT_TOKEN"
-    logging.info("Starting bot")
-    dp.run_polling(bot)
+    if args.webhook:
+        from .webhook import run_webhook
+
+        logging.info("Starting bot webhook")
+        run_webhook(dp, bot)
+    else:
+        logging.info("Starting bot")
+        dp.run_polling(bot)
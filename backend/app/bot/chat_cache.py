@@ -0,0 +1,88 @@
+"""
+Cross-process invalidation of the Telegram chat cache of the bot.
+
+Chat changes are announced with NOTIFY in their transaction (see
+:class:`app.db.repos.chat.ChatRepository`), wherever they are made (e.g.
+a chat deleted through the web API). The listener drops the changed
+Telegram chats from ``TELEGRAM_CHAT_CACHE``. Notifications sent while
+nobody listens are lost, so the cache is cleared whenever the listener
+(re)connects.
+"""
+
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Optional
+
+import asyncpg
+
+from app.config import settings
+from app.db.repos.chat import TELEGRAM_CHAT_CACHE, TELEGRAM_CHAT_CHANNEL
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class TelegramChatCacheListener:
+    """
+    Listens to the Telegram chat changes and invalidates the cache.
+    """
+
+    def __init__(
+        self,
+        dsn: Optional[str] = None,
+        cache: TTLCache = TELEGRAM_CHAT_CACHE,
+        retry_interval: float = 1.0,
+    ):
+        """
+        Initialize the listener.
+
+        :param dsn: asyncpg connection string, the configured database by default
+        :param cache: Cache to invalidate
+        :param retry_interval: Seconds before reconnecting after a failure
+        """
+        self.dsn = dsn or settings.database.dsn
+        self.cache = cache
+        self.retry_interval = retry_interval
+        self._task: Optional[asyncio.Task] = None
+
+    def on_notify(self, connection, pid, channel, payload: str):
+        """
+        Drop a changed Telegram chat from the cache.
+        """
+        self.cache.pop(int(payload))
+
+    async def _listen(self):
+        while True:
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                try:
+                    closed = asyncio.Event()
+                    connection.add_termination_listener(lambda _: closed.set())
+                    await connection.add_listener(TELEGRAM_CHAT_CHANNEL, self.on_notify)
+                    # changes made while not listening are unknown
+                    self.cache.clear()
+                    await closed.wait()
+                finally:
+                    await connection.close()
+                logger.warning("Telegram chat cache listener disconnected")
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Telegram chat cache listener failed")
+            await asyncio.sleep(self.retry_interval)
+
+    async def start(self):
+        """
+        Start listening.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        """
+        Stop listening.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
@@ -8,10 +8,13 @@ from aiogram import Bot, Dispatcher
 from aiogram.utils.token import TokenValidationError
 
 from app.config import settings
-from app.services.message_queue import MessageQueueService
+from app.services.message_queue import create_message_queue_service
 
+from .chat_cache import TelegramChatCacheListener
 from .handlers import index_router
 from .middlewares import DatabaseMiddleware, UserMiddleware
+from .scheduler import ShardedUpdateScheduler
+from .user_cache import UserIdentityCache
 
 logger = getLogger(__name__)
 
@@ -25,10 +28,26 @@ except TokenValidationError:
 
 dp = Dispatcher()
 
+user_cache = UserIdentityCache()
+dp.startup.register(user_cache.start)
+dp.shutdown.register(user_cache.stop)
+
+# Drop Telegram chats changed by other processes (e.g. the web API)
+chat_cache_listener = TelegramChatCacheListener()
+dp.startup.register(chat_cache_listener.start)
+dp.shutdown.register(chat_cache_listener.stop)
+
+# Keep updates of a chat in order, handle different chats concurrently
+scheduler = ShardedUpdateScheduler(shards=settings.scheduler.shards)
+dp.startup.register(scheduler.start)
+dp.shutdown.register(scheduler.stop)
+dp.update.outer_middleware(scheduler)
+dp["update_scheduler"] = scheduler
+
 # Setup middleware
 dp.update.middleware(DatabaseMiddleware())
-dp.message.middleware(UserMiddleware())
+dp.message.middleware(UserMiddleware(user_cache))
 
-dp["mq_service"] = MessageQueueService()
+dp["mq_service"] = create_message_queue_service()
 
 dp.include_router(index_router)
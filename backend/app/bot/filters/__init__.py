@@ -0,0 +1,7 @@
+"""
+Package for Telegram bot filters.
+"""
+
+from .mirrored_chat import MirroredChatFilter
+
+__all__ = ["MirroredChatFilter"]
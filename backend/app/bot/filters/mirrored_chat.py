@@ -0,0 +1,30 @@
+"""
+Filter for messages from Telegram chats mirrored into a chat.
+"""
+
+from typing import Any, Dict
+
+from aiogram.filters import Filter
+from aiogram.types import Message
+
+from app.bot.middlewares.context import DBReposContext
+
+
+class MirroredChatFilter(Filter):
+    """
+    Pass only messages from mirrored Telegram chats.
+
+    Provides the ``chat_id`` of the mirroring chat to the handler.
+    Runs before the message middlewares, so messages from not mirrored
+    chats are dropped without resolving the sender.
+    """
+
+    async def __call__(
+        self, message: Message, db_repos: DBReposContext
+    ) -> bool | Dict[str, Any]:
+        chat_id = await db_repos.chat_repo.resolve_chat_id_by_telegram_id(
+            message.chat.id
+        )
+        if chat_id is None:
+            return False
+        return {"chat_id": chat_id}
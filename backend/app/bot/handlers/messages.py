@@ -2,32 +2,38 @@
 Handlers for incoming messages from users.
 """
 
-from aiogram import Router
+from uuid import UUID
+
+from aiogram import F, Router
 from aiogram.types import Message
 
+from app.bot.filters import MirroredChatFilter
 from app.bot.middlewares.context import DBReposContext
 from app.db.models.user import User
 from app.services.message_queue import MessageQueueService
+from app.services.outbox import create_message
 
 router = Router()
 
 
-@router.message()
+@router.message(F.text, MirroredChatFilter())
 async def echo_message(
     message: Message,
     user: User,
-    db_repos: DBReposContext,
+    chat_id: UUID,
     mq_service: MessageQueueService,
+    db_repos: DBReposContext,
 ):
     """
     Process an incoming message from a user.
 
+    The message is stored together with its MQ message (outbox), the
+    outbox relay publishes it.
+
     Args:
         message (Message): The incoming Telegram message.
+        chat_id (UUID): The ID of the chat mirroring the Telegram chat.
     """
-    chat = await db_repos.chat_repo.get_chat_by_telegram_id(message.chat.id)
-
-    if chat:
-        await mq_service.publish_message(
-            chat_id=chat.id, user_id=user.id, content=message.text
-        )
+    await create_message(
+        db_repos.message_repo, mq_service, chat_id, user.id, message.text
+    )
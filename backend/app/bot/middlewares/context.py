@@ -2,17 +2,68 @@
 Middleware for managing context in Telegram bot interactions.
 """
 
-from app.db.conn import AsyncSession
+from functools import cached_property
+from typing import Callable, Optional
+
+from app.db.conn import AsyncSession, get_async_session
 from app.db.repos.chat import ChatRepository
+from app.db.repos.message import MessageRepository
 from app.db.repos.user import UserRepository
 
 
 class DBReposContext:
     """
     Middleware to handle and maintain context during bot interactions.
+
+    The session and the repositories are created on first use, so updates
+    whose handlers never touch the database do not open a session.
     """
 
-    def __init__(self, session: AsyncSession):
-        self.session = session
-        self.user_repo = UserRepository(session)
-        self.chat_repo = ChatRepository(session)
+    def __init__(self, session_factory: Callable[[], AsyncSession] = get_async_session):
+        self._session_factory = session_factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def session(self) -> AsyncSession:
+        """
+        Session of the update, opened on first access.
+        """
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    @property
+    def is_used(self) -> bool:
+        """
+        Whether the session has been opened.
+        """
+        return self._session is not None
+
+    @cached_property
+    def user_repo(self) -> UserRepository:
+        """
+        User repository bound to the update session.
+        """
+        return UserRepository(self.session)
+
+    @cached_property
+    def chat_repo(self) -> ChatRepository:
+        """
+        Chat repository bound to the update session.
+        """
+        return ChatRepository(self.session)
+
+    @cached_property
+    def message_repo(self) -> MessageRepository:
+        """
+        Message repository bound to the update session.
+        """
+        return MessageRepository(self.session)
+
+    async def close(self):
+        """
+        Close the session if it has been opened.
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -8,12 +8,14 @@ from aiogram import BaseMiddleware
 from aiogram.types import Message
 
 from app.bot.middlewares.context import DBReposContext
-from app.db.conn import get_async_session
 
 
 class DatabaseMiddleware(BaseMiddleware):
     """
     Middleware to manage database connections and sessions for bot interactions.
+
+    The session is lazy, a connection is checked out only when a handler
+    (or a filter) first runs a query through a repository.
     """
 
     async def __call__(
@@ -22,6 +24,9 @@ class DatabaseMiddleware(BaseMiddleware):
         event: Message,
         data: Dict[str, Any],
     ) -> Any:
-        async with get_async_session() as session:
-            data["db_repos"] = DBReposContext(session)
+        db_repos = DBReposContext()
+        data["db_repos"] = db_repos
+        try:
             return await handler(event, data)
+        finally:
+            await db_repos.close()
@@ -2,17 +2,25 @@
 Middleware for handling user-related operations in the Telegram bot.
 """
 
-from typing import Any, Awaitable, Callable, Dict
+from typing import Any, Awaitable, Callable, Dict, Optional
 
 from aiogram import BaseMiddleware
 from aiogram.types import Message
 
+from app.bot.user_cache import UserIdentityCache
+
 
 class UserMiddleware(BaseMiddleware):
     """
     Middleware to process and manage user-related context in bot interactions.
     """
 
+    def __init__(self, user_cache: Optional[UserIdentityCache] = None):
+        """
+        :param user_cache: Identity cache, every message is synced inline without it
+        """
+        self.user_cache = user_cache
+
     async def __call__(
         self,
         handler: Callable[[Message, Dict[str, Any]], Awaitable[Any]],
@@ -22,12 +30,15 @@ class UserMiddleware(BaseMiddleware):
         user = event.from_user
         repos = data["db_repos"]
 
-        db_user = await repos.user_repo.create_or_update_user(
-            telegram_id=user.id,
-            first_name=user.first_name,
-            last_name=user.last_name,
-            username=user.username,
-        )
+        if self.user_cache is not None:
+            db_user = await self.user_cache.get_user(user, repos.user_repo)
+        else:
+            db_user = await repos.user_repo.create_or_update_user(
+                telegram_id=user.id,
+                first_name=user.first_name,
+                last_name=user.last_name,
+                username=user.username,
+            )
 
         data["user"] = db_user
         return await handler(event, data)
@@ -0,0 +1,64 @@
+"""
+Replay recorded Telegram updates against the bot webhook.
+
+Useful to exercise the webhook locally without Telegram::
+
+    python -m app.bot.replay updates.jsonl --url http://localhost:8080/webhook
+
+The file holds one update (as JSON) per line, as Telegram sends them.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+from aiohttp import ClientSession
+
+from app.config import settings
+
+
+async def replay(path: str, url: str, secret: str, concurrency: int) -> Counter:
+    """
+    POST recorded updates to the webhook.
+
+    :param path: File with one JSON update per line
+    :param url: Webhook URL
+    :param secret: Secret token sent in X-Telegram-Bot-Api-Secret-Token
+    :param concurrency: Number of requests in flight
+    :return: Number of responses by status code
+    """
+    with open(path, encoding="utf-8") as file:
+        updates = [json.loads(line) for line in file if line.strip()]
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    statuses: Counter = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with ClientSession(headers=headers) as session:
+
+        async def post(update: dict):
+            async with semaphore:
+                async with session.post(url, json=update) as response:
+                    statuses[response.status] += 1
+
+        await asyncio.gather(*(post(update) for update in updates))
+    return statuses
+
+
+if __name__ == "__main__":
+    webhook = settings.webhook
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path", help="File with one JSON update per line")
+    parser.add_argument(
+        "--url", default=f"http://localhost:{webhook.port}{webhook.path}"
+    )
+    parser.add_argument("--secret", default=webhook.secret)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = asyncio.run(replay(args.path, args.url, args.secret, args.concurrency))
+    elapsed = time.perf_counter() - started
+    print(f"{sum(result.values())} updates in {elapsed:.2f}s, statuses: {dict(result)}")
@@ -0,0 +1,192 @@
+"""
+Sharded update scheduler for the Telegram bot.
+
+Updates are hashed by chat ID onto a fixed number of worker queues. Every
+queue is drained by a single worker, so the updates of one chat are
+handled one at a time in the order they arrived, while different chats
+are handled concurrently. An optional limiter bounds the updates handled
+at the same time, a slot is taken once an update leaves its queue.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import nullcontext, suppress
+from dataclasses import asdict, dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import Chat, TelegramObject
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]]
+Job = Tuple[Handler, TelegramObject, Dict[str, Any], asyncio.Future, float]
+
+
+@dataclass
+class ShardMetrics:
+    """
+    Cumulative metrics of a shard.
+
+    ``wait_*`` is the time updates spent in the queue before a worker
+    picked them up.
+    """
+
+    processed: int = 0
+    failed: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    def observe(self, wait: float):
+        """
+        Record an update picked up by the worker.
+
+        :param wait: Seconds the update spent in the queue
+        """
+        self.processed += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+
+class ShardedUpdateScheduler(BaseMiddleware):
+    """
+    Outer update middleware keeping per-chat order across concurrent updates.
+
+    The caller waits until its update is handled, so the dispatcher (and
+    the webhook) see the handler result as before. Updates without a chat
+    (e.g. inline queries) are handled right away.
+    """
+
+    def __init__(self, shards: int = 16, limiter: Optional[asyncio.Semaphore] = None):
+        """
+        Initialize the scheduler.
+
+        :param shards: Number of worker queues, i.e. chats handled at the same time
+        :param limiter: Bounds the updates handled at the same time, None for no bound
+        """
+        if shards < 1:
+            raise ValueError("At least one shard is required")
+        self.shards = shards
+        self.limiter = limiter
+        self._queues: List[asyncio.Queue] = []
+        self._metrics: List[ShardMetrics] = []
+        # enqueue times of the queued updates, oldest first
+        self._enqueued: List[Deque[float]] = []
+        self._workers: List[asyncio.Task] = []
+
+    @property
+    def is_running(self) -> bool:
+        """
+        Whether the workers have been started.
+        """
+        return bool(self._workers)
+
+    def get_shard(self, chat_id: int) -> int:
+        """
+        Get the shard handling a chat.
+
+        :param chat_id: Telegram chat ID
+        """
+        return hash(chat_id) % self.shards
+
+    async def __call__(
+        self,
+        handler: Handler,
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        chat: Optional[Chat] = data.get("event_chat")
+        if chat is None:
+            async with self.limiter or nullcontext():
+                return await handler(event, data)
+        if not self.is_running:
+            await self.start()
+
+        shard = self.get_shard(chat.id)
+        future = asyncio.get_running_loop().create_future()
+        enqueued = time.monotonic()
+        # put_nowait on an unbounded queue: no await between the dispatcher
+        # and the queue, so updates are queued in the order they arrived
+        self._queues[shard].put_nowait((handler, event, data, future, enqueued))
+        self._enqueued[shard].append(enqueued)
+        return await future
+
+    async def _work(self, shard: int):
+        queue = self._queues[shard]
+        metrics = self._metrics[shard]
+        enqueued_times = self._enqueued[shard]
+        while True:
+            job: Job = await queue.get()
+            handler, event, data, future, enqueued = job
+            enqueued_times.popleft()
+            metrics.observe(time.monotonic() - enqueued)
+            try:
+                if future.cancelled():
+                    # the caller has given up on the update
+                    continue
+                try:
+                    # queued updates hold no slot, a busy chat can't starve the others
+                    async with self.limiter or nullcontext():
+                        result = await handler(event, data)
+                except Exception as e:  # pylint: disable=broad-except
+                    metrics.failed += 1
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+            finally:
+                queue.task_done()
+
+    async def start(self):
+        """
+        Start the shard workers.
+        """
+        if self.is_running:
+            return
+        self._queues = [asyncio.Queue() for _ in range(self.shards)]
+        self._metrics = [ShardMetrics() for _ in range(self.shards)]
+        self._enqueued = [deque() for _ in range(self.shards)]
+        self._workers = [
+            asyncio.create_task(self._work(shard)) for shard in range(self.shards)
+        ]
+        logger.info("Update scheduler started with %s shards", self.shards)
+
+    async def stop(self):
+        """
+        Handle the queued updates and stop the workers.
+        """
+        if not self.is_running:
+            return
+        await asyncio.gather(*(queue.join() for queue in self._queues))
+        for worker in self._workers:
+            worker.cancel()
+        for worker in self._workers:
+            with suppress(asyncio.CancelledError):
+                await worker
+        self._workers = []
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """
+        Get live statistics of the shards.
+
+        :return: Per shard queue depth, lag (age of the oldest queued
+            update in seconds) and cumulative wait metrics
+        """
+        now = time.monotonic()
+        stats = []
+        for shard, metrics in enumerate(self._metrics):
+            enqueued = self._enqueued[shard]
+            shard_stats: Dict[str, Any] = {
+                "shard": shard,
+                "depth": self._queues[shard].qsize(),
+                "lag": now - enqueued[0] if enqueued else 0.0,
+            }
+            shard_stats.update(asdict(metrics))
+            shard_stats["wait_avg"] = (
+                metrics.wait_total / metrics.processed if metrics.processed else 0.0
+            )
+            stats.append(shard_stats)
+        return stats
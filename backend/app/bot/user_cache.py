@@ -0,0 +1,192 @@
+"""
+In-memory Telegram user identity cache for the bot process.
+
+Repeat senders are resolved from memory, profile changes are written to
+the database in periodic batches (write-behind) instead of inline.
+"""
+
+import asyncio
+import logging
+import uuid
+from contextlib import suppress
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Set, Tuple
+
+from aiogram.types import User as TelegramUser
+
+from app.db.conn import get_async_session
+from app.db.models.user import User
+from app.db.repos.user import UserRepository
+from app.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+Profile = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def get_profile(telegram_user: TelegramUser) -> Profile:
+    """
+    Get the stored profile fields of a Telegram user.
+    """
+    return telegram_user.first_name, telegram_user.last_name, telegram_user.username
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """
+    Immutable snapshot of a database user, shared by the updates of a sender.
+    """
+
+    id: uuid.UUID
+    telegram_id: int
+    first_name: Optional[str]
+    last_name: Optional[str]
+    username: Optional[str]
+    photo_url: Optional[str]
+
+    @classmethod
+    def from_user(cls, user: User) -> "CachedUser":
+        """
+        Take a snapshot of a database user.
+        """
+        return cls(
+            id=user.id,
+            telegram_id=user.telegram_id,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            username=user.username,
+            photo_url=user.photo_url,
+        )
+
+
+class UserIdentityCache:
+    """
+    Bounded LRU/TTL cache of ``telegram_id -> (user, profile hash)``.
+
+    The cached users are immutable snapshots, a profile change replaces
+    the snapshot instead of changing one a handler may still use.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 100_000,
+        ttl: float = 600.0,
+        flush_interval: float = 5.0,
+        max_pending: int = 1000,
+    ):
+        """
+        Initialize the cache.
+
+        :param maxsize: Max number of cached users
+        :param ttl: Seconds before a user is synced with the database again
+        :param flush_interval: Seconds between write-behind flushes
+        :param max_pending: Pending profile updates that trigger an early flush
+        """
+        self._users: TTLCache[int, Tuple[CachedUser, int]] = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._pending: Dict[int, Profile] = {}
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._background: Set[asyncio.Task] = set()
+
+    async def get_user(
+        self, telegram_user: TelegramUser, user_repo: UserRepository
+    ) -> CachedUser:
+        """
+        Resolve a Telegram user to the database user.
+
+        A cached user costs no queries, a changed profile is queued for the
+        next flush. Unknown users are upserted inline.
+
+        :param telegram_user: Sender of the update
+        :param user_repo: Repository used on a cache miss
+        """
+        profile = get_profile(telegram_user)
+        profile_hash = hash(profile)
+
+        cached = self._users.get(telegram_user.id)
+        if cached is not None:
+            user, cached_hash = cached
+            if cached_hash != profile_hash:
+                first_name, last_name, username = profile
+                user = replace(
+                    user, first_name=first_name, last_name=last_name, username=username
+                )
+                self._users.set(telegram_user.id, (user, profile_hash))
+                self._pending[telegram_user.id] = profile
+                if len(self._pending) >= self.max_pending:
+                    self._schedule_flush()
+            return user
+
+        user = CachedUser.from_user(
+            await user_repo.create_or_update_user(
+                telegram_id=telegram_user.id,
+                first_name=telegram_user.first_name,
+                last_name=telegram_user.last_name,
+                username=telegram_user.username,
+            )
+        )
+        # The upsert has written the latest profile already
+        self._pending.pop(telegram_user.id, None)
+        self._users.set(telegram_user.id, (user, profile_hash))
+        return user
+
+    def _schedule_flush(self):
+        if not self._flush_lock.locked():
+            task = asyncio.create_task(self.flush())
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    async def flush(self):
+        """
+        Write the pending profile updates in one batch.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            profiles = [
+                {
+                    "telegram_id": telegram_id,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "username": username,
+                }
+                for telegram_id, (first_name, last_name, username) in pending.items()
+            ]
+            try:
+                async with get_async_session() as session:
+                    await UserRepository(session).update_profiles(profiles)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to flush %s user profiles", len(profiles))
+                # keep them for the next flush unless a newer one has arrived
+                # or was upserted meanwhile (the cache no longer has them, a
+                # user missing from the cache is upserted on the next update)
+                for telegram_id, profile in pending.items():
+                    cached = self._users.get(telegram_id)
+                    if cached is not None and cached[1] == hash(profile):
+                        self._pending.setdefault(telegram_id, profile)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        """
+        Start the periodic write-behind flush.
+        """
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        """
+        Stop the periodic flush and write what is still pending.
+        """
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._flush_task
+            self._flush_task = None
+        await self.flush()
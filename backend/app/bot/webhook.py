@@ -0,0 +1,358 @@
+"""
+Webhook entry point for the Telegram bot.
+
+Telegram gets its answer as soon as an update is accepted, the update is
+handled in the background with a bounded number of updates at a time.
+Updates delivered again are skipped: recent ones by their ID, older ones
+(e.g. after a restart) by the persisted ID of the last processed update.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import nullcontext, suppress
+from typing import Any, Callable, Optional, Set
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.config import WebhookSettings, settings
+from app.db.conn import get_async_session
+from app.db.repos.bot_state import BotStateRepository
+
+logger = logging.getLogger(__name__)
+
+
+class UpdateTracker:
+    """
+    Tracks which updates were processed while they are handled concurrently.
+
+    Duplicates are recognized by the IDs of the recently claimed updates.
+    ``last_update_id`` is the watermark persisted for restarts: it only
+    moves over a contiguous run of processed update IDs, so an update
+    delivered late (e.g. again after a 503) is not skipped. An ID that
+    never arrives (Telegram may skip some) holds the watermark for
+    ``gap_timeout`` seconds at most.
+    """
+
+    def __init__(
+        self,
+        last_update_id: Optional[int] = None,
+        max_seen: int = 100_000,
+        gap_timeout: float = 60.0,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the tracker.
+
+        :param last_update_id: Persisted watermark, None if nothing was processed
+        :param max_seen: Number of recently claimed update IDs kept for deduplication
+        :param gap_timeout: Seconds the watermark waits for a missing update ID
+        :param timer: Monotonic clock (replaceable in tests)
+        """
+        self.last_update_id = last_update_id
+        # updates up to it were processed before the restart
+        self.resume_after = last_update_id
+        self.dirty = False
+        self.max_seen = max_seen
+        self.gap_timeout = gap_timeout
+        self._timer = timer
+        self._seen: OrderedDict[int, None] = OrderedDict()
+        self._in_flight: Set[int] = set()
+        self._done: Set[int] = set()
+        self._gap_since: Optional[float] = None
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Number of claimed updates that are not processed yet.
+        """
+        return len(self._in_flight)
+
+    def claim(self, update_id: int) -> bool:
+        """
+        Claim an update for processing.
+
+        :param update_id: ID of the update
+        :return: False if the update is a duplicate
+        """
+        if self.resume_after is not None and update_id <= self.resume_after:
+            return False
+        if update_id in self._seen:
+            return False
+        self._seen[update_id] = None
+        if len(self._seen) > self.max_seen:
+            self._seen.popitem(last=False)
+        if self.last_update_id is None:
+            self.last_update_id = update_id - 1
+        self._in_flight.add(update_id)
+        return True
+
+    def done(self, update_id: int):
+        """
+        Mark a claimed update as processed and move the watermark.
+
+        :param update_id: ID of the update
+        """
+        self._in_flight.discard(update_id)
+        if update_id > self.last_update_id:
+            self._done.add(update_id)
+        self.advance()
+
+    def advance(self):
+        """
+        Move the watermark over the processed updates following it.
+
+        A missing update ID is passed once it has held the watermark for
+        ``gap_timeout`` seconds.
+        """
+        if self.last_update_id is None:
+            return
+        watermark = self.last_update_id
+        while self._done:
+            if watermark + 1 in self._done:
+                watermark += 1
+                self._done.discard(watermark)
+                self._gap_since = None
+                continue
+            if watermark + 1 in self._in_flight:
+                # the next update is still being handled
+                break
+            now = self._timer()
+            if self._gap_since is None:
+                self._gap_since = now
+            if now - self._gap_since < self.gap_timeout:
+                break
+            logger.warning("Update %s never arrived, the watermark passes it", watermark + 1)
+            pending = [update_id for update_id in self._in_flight if update_id > watermark]
+            watermark = min(self._done | set(pending)) - 1
+            self._gap_since = None
+        if not self._done:
+            self._gap_since = None
+        if watermark != self.last_update_id:
+            self.last_update_id = watermark
+            self.dirty = True
+
+
+class ConcurrentRequestHandler(SimpleRequestHandler):
+    """
+    Webhook request handler with bounded concurrency and deduplication.
+
+    Accepted updates are answered with 200 right away, duplicates are
+    answered without handling. When ``backlog`` updates already wait for a
+    slot the request is rejected with 503 and Telegram delivers it again
+    later. With an update scheduler (``dispatcher["update_scheduler"]``)
+    the slot is taken by the scheduler once the update leaves its chat
+    queue, not while it waits there.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        secret_token: Optional[str] = None,
+        concurrency: int = 32,
+        backlog: int = 1000,
+        flush_interval: float = 1.0,
+        **data: Any,
+    ):
+        """
+        Initialize the request handler.
+
+        :param dispatcher: Dispatcher the updates are fed to
+        :param bot: Bot the updates belong to
+        :param secret_token: Expected X-Telegram-Bot-Api-Secret-Token, None to skip the check
+        :param concurrency: Max number of updates handled at the same time
+        :param backlog: Max number of accepted updates waiting for a slot
+        :param flush_interval: Seconds between last update ID flushes
+        """
+        super().__init__(
+            dispatcher=dispatcher,
+            bot=bot,
+            handle_in_background=True,
+            secret_token=secret_token,
+            **data,
+        )
+        self.concurrency = concurrency
+        self.backlog = backlog
+        self.flush_interval = flush_interval
+        self.tracker = UpdateTracker()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._scheduler = dispatcher.get("update_scheduler")
+        if self._scheduler is not None:
+            self._scheduler.limiter = self._semaphore
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def register(self, app: web.Application, /, path: str, **kwargs: Any) -> None:
+        """
+        Register the route and the state load/flush callbacks.
+        """
+        app.on_startup.append(self._handle_startup)
+        super().register(app, path, **kwargs)
+
+    async def _handle_startup(self, *a: Any, **kw: Any) -> None:
+        await self.load()
+        self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def load(self):
+        """
+        Load the last processed update ID.
+        """
+        async with get_async_session() as session:
+            last_update_id = await BotStateRepository(session).get_last_update_id(
+                self.bot.id
+            )
+        self.tracker = UpdateTracker(last_update_id)
+        logger.info("Webhook resumes after update %s", last_update_id)
+
+    async def flush(self):
+        """
+        Persist the last processed update ID if it has moved.
+        """
+        self.tracker.advance()
+        if not self.tracker.dirty:
+            return
+        self.tracker.dirty = False
+        update_id = self.tracker.last_update_id
+        try:
+            async with get_async_session() as session:
+                await BotStateRepository(session).save_last_update_id(
+                    self.bot.id, update_id
+                )
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Failed to save the last update ID %s", update_id)
+            self.tracker.dirty = True
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def _background_feed_update(self, bot: Bot, update: dict[str, Any]) -> None:
+        update_id = update.get("update_id")
+        try:
+            async with self._semaphore if self._scheduler is None else nullcontext():
+                result = await self.dispatcher.feed_raw_update(
+                    bot=bot, update=update, **self.data
+                )
+                if isinstance(result, TelegramMethod):
+                    await self.dispatcher.silent_call_request(bot=bot, result=result)
+        except Exception:  # pylint: disable=broad-except
+            # Telegram has got its answer already, the update is not retried
+            logger.exception("Failed to handle update %s", update_id)
+        finally:
+            if update_id is not None:
+                self.tracker.done(update_id)
+
+    async def _handle_request_background(
+        self, bot: Bot, request: web.Request
+    ) -> web.Response:
+        update = await request.json(loads=bot.session.json_loads)
+        update_id = update.get("update_id") if isinstance(update, dict) else None
+        if not isinstance(update_id, int):
+            return web.Response(status=400, text="Invalid update")
+
+        if self.tracker.in_flight >= self.concurrency + self.backlog:
+            return web.Response(status=503, text="Too many updates")
+        if not self.tracker.claim(update_id):
+            logger.debug("Skip duplicate update %s", update_id)
+            return web.json_response({}, dumps=bot.session.json_dumps)
+
+        task = asyncio.create_task(self._background_feed_update(bot=bot, update=update))
+        self._background_feed_update_tasks.add(task)
+        task.add_done_callback(self._background_feed_update_tasks.discard)
+        return web.json_response({}, dumps=bot.session.json_dumps)
+
+    async def close(self) -> None:
+        """
+        Finish the accepted updates, persist the state and close the bot session.
+        """
+        if self._background_feed_update_tasks:
+            await asyncio.gather(
+                *self._background_feed_update_tasks, return_exceptions=True
+            )
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._flush_task
+            self._flush_task = None
+        await self.flush()
+        await super().close()
+
+
+def create_app(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    webhook: WebhookSettings = settings.webhook,
+) -> web.Application:
+    """
+    Create the aiohttp application serving the webhook.
+
+    The webhook is registered in Telegram on startup when ``webhook.url``
+    is set, otherwise updates can be POSTed to ``webhook.path`` directly.
+    ``GET <webhook.path>/stats`` reports the in-flight updates and the
+    update scheduler shards (queue depth and lag).
+
+    :param dispatcher: Dispatcher the updates are fed to
+    :param bot: Bot the updates belong to
+    :param webhook: Webhook settings
+    """
+    app = web.Application()
+    handler = ConcurrentRequestHandler(
+        dispatcher=dispatcher,
+        bot=bot,
+        secret_token=webhook.secret or None,
+        concurrency=webhook.concurrency,
+        backlog=webhook.backlog,
+        flush_interval=webhook.interval,
+    )
+    handler.register(app, path=webhook.path)
+
+    async def get_stats(request: web.Request) -> web.Response:
+        if not handler.verify_secret(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), bot
+        ):
+            return web.Response(status=401, text="Unauthorized")
+        scheduler = dispatcher.get("update_scheduler")
+        return web.json_response(
+            {
+                "in_flight": handler.tracker.in_flight,
+                "last_update_id": handler.tracker.last_update_id,
+                "shards": scheduler.get_stats() if scheduler is not None else [],
+            }
+        )
+
+    app.router.add_get(webhook.path.rstrip("/") + "/stats", get_stats)
+
+    if webhook.url:
+
+        async def set_webhook(bot: Bot):
+            await bot.set_webhook(
+                url=webhook.url.rstrip("/") + webhook.path,
+                secret_token=webhook.secret or None,
+                max_connections=min(max(webhook.concurrency, 1), 100),
+                allowed_updates=dispatcher.resolve_used_update_types(),
+            )
+
+        dispatcher.startup.register(set_webhook)
+
+    setup_application(app, dispatcher, bot=bot)
+    return app
+
+
+def run_webhook(
+    dispatcher: Dispatcher,
+    bot: Bot,
+    webhook: WebhookSettings = settings.webhook,
+):
+    """
+    Serve the webhook until interrupted.
+
+    :param dispatcher: Dispatcher the updates are fed to
+    :param bot: Bot the updates belong to
+    :param webhook: Webhook settings
+    """
+    web.run_app(create_app(dispatcher, bot, webhook), host=webhook.host, port=webhook.port)
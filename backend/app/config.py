@@ -4,7 +4,7 @@ Configuration management using Pydantic v2 settings.
 
 import secrets
 import logging
-from typing import Any
+from typing import Any, Literal
 from sqlalchemy import URL
 from pydantic import (AmqpDsn, BaseModel, ConfigDict, Field,
                       computed_field, field_validator)
@@ -14,6 +14,33 @@ logging.basicConfig(level=logging.INFO)
 
 
 
+class DatabasePoolSettings(BaseModel):
+    """Database connection pool settings (DATABASE_POOL_*)."""
+
+    size: int = Field(5)  # connections kept open
+    overflow: int = Field(10)  # extra connections above size
+    timeout: float = Field(30.0)  # seconds to wait for a free connection
+    recycle: int = Field(1800)  # seconds before a connection is replaced, -1 never
+    ping: bool = Field(True)  # test connections on checkout (pre-ping)
+
+
+class DatabaseReplicaSettings(BaseModel):
+    """Read replica settings (DATABASE_REPLICA_*)."""
+
+    # can't usage list[str] because of pydantic settings
+    urls: Any = Field("")  # type: list[str], comma separated DSNs
+    lag: float = Field(5.0)  # max replication lag in seconds to route reads
+    interval: float = Field(5.0)  # seconds between replica health checks
+
+    @field_validator("urls", mode="before")
+    @classmethod
+    def decode_urls(cls, v: str | list[str]) -> list[str]:
+        """Split the comma separated DSNs."""
+        if isinstance(v, list):
+            return v
+        return [x.strip() for x in v.split(",") if x.strip()]
+
+
 class DatabaseSettings(BaseModel):
     """Database configuration settings."""
 
@@ -23,6 +50,15 @@ class DatabaseSettings(BaseModel):
     password: str = Field("postgres")
     name: str = Field("postgres")
 
+    pool: DatabasePoolSettings = DatabasePoolSettings()
+    # asyncpg prepared statement cache size per connection, 0 disables it
+    statements: int = Field(100)
+    # "pgbouncer" - behind PgBouncer in transaction pooling mode
+    # (server-side prepared statements are turned off)
+    profile: Literal["direct", "pgbouncer"] = Field("direct")
+
+    replica: DatabaseReplicaSettings = DatabaseReplicaSettings()
+
     @property
     def url(self):
         """Construct the full database connection URL."""
@@ -35,6 +71,13 @@ class DatabaseSettings(BaseModel):
             database=self.name,
         )
 
+    @property
+    def dsn(self) -> str:
+        """Plain connection string for direct asyncpg connections (LISTEN)."""
+        return self.url.set(drivername="postgresql").render_as_string(
+            hide_password=False
+        )
+
 
 class RabbitMQSettings(BaseModel):
     """RabbitMQ configuration settings."""
@@ -44,6 +87,8 @@ class RabbitMQSettings(BaseModel):
     host: str = Field("localhost")
     port: int = Field(5672)
     vhost: str = Field("/")
+    # payload codec of the published chat messages
+    codec: Literal["json", "orjson", "msgpack"] = Field("json")
 
     @computed_field
     @property
@@ -59,6 +104,92 @@ class RabbitMQSettings(BaseModel):
         )
 
 
+class MessageQueueRetrySettings(BaseModel):
+    """Retries of failed messages (MQ_RETRY_*)."""
+
+    attempts: int = Field(5)  # attempts before a message is dead-lettered
+    delay: float = Field(1.0)  # seconds before the first retry
+    multiplier: float = Field(4.0)  # delay growth per attempt
+    cap: float = Field(600.0)  # max seconds between attempts
+
+
+class MessageQueueBufferSettings(BaseModel):
+    """Publish buffer (MQ_BUFFER_*)."""
+
+    size: int = Field(10000)  # max messages waiting in memory
+    spill: float = Field(0.5)  # seconds without confirm before spilling
+
+
+class MessageQueueJournalSettings(BaseModel):
+    """Local journal of the publish buffer (MQ_JOURNAL_*)."""
+
+    dir: str = Field("")  # journals of the outbox relays, a slot each, empty - no buffer
+    segment: int = Field(64 * 1024 * 1024)  # bytes per journal segment file
+
+
+class MessageQueueSettings(BaseModel):
+    """Message queue transport settings (MQ_*)."""
+
+    # rabbitmq | memory (in-process) | postgres (LISTEN/NOTIFY)
+    transport: Literal["rabbitmq", "memory", "postgres"] = Field("rabbitmq")
+    capacity: int = Field(10000)  # max waiting messages per in-process queue
+    # chats are hashed onto this many ordered queues, same value everywhere
+    partitions: int = Field(16)
+    # failed messages are retried with exponential backoff, then dead-lettered
+    retry: MessageQueueRetrySettings = MessageQueueRetrySettings()
+    # relay publishes wait in memory, spill to a local journal while the broker is down
+    buffer: MessageQueueBufferSettings = MessageQueueBufferSettings()
+    journal: MessageQueueJournalSettings = MessageQueueJournalSettings()
+
+
+class OutboxSettings(BaseModel):
+    """Outbox relay settings (OUTBOX_*)."""
+
+    batch: int = Field(500)  # messages published per transaction
+    concurrency: int = Field(4)  # batches published at the same time per relay
+    interval: float = Field(1.0)  # seconds between polls without notifications
+
+
+class WebhookSettings(BaseModel):
+    """Telegram bot webhook settings (WEBHOOK_*)."""
+
+    url: str = Field("")  # public base URL registered in Telegram, empty - don't register
+    secret: str = Field("")  # X-Telegram-Bot-Api-Secret-Token, empty - not checked
+    host: str = Field("0.0.0.0")
+    port: int = Field(8080)
+    path: str = Field("/webhook")
+    concurrency: int = Field(32)  # updates handled at the same time
+    backlog: int = Field(1000)  # accepted updates waiting for a slot, 503 above
+    interval: float = Field(1.0)  # seconds between last update_id flushes
+
+
+class SchedulerSettings(BaseModel):
+    """Bot update scheduler settings (SCHEDULER_*)."""
+
+    shards: int = Field(16)  # worker queues, updates of a chat always share one
+
+
+class StreamReplaySettings(BaseModel):
+    """Replay of the missed messages on SSE resume (STREAM_REPLAY_*)."""
+
+    page: int = Field(100)  # missed messages read per query
+    limit: int = Field(1000)  # max missed messages replayed, a reset above
+    # seconds replayed before the last event, a message committed late has an
+    # older created_at than messages sent before it
+    grace: float = Field(10.0)
+
+
+class StreamSettings(BaseModel):
+    """Live chat message stream settings (STREAM_*)."""
+
+    pending: int = Field(100)  # messages waiting to be sent per connection
+    # WebSocket falling `pending` behind: drop its oldest messages or close it,
+    # an SSE client is always disconnected and resumes from its last event
+    overflow: Literal["drop_oldest", "disconnect"] = Field("drop_oldest")
+    keepalive: float = Field(15.0)  # seconds between SSE keep-alive comments
+    replay: StreamReplaySettings = StreamReplaySettings()
+
+
 class JWTSettings(BaseModel):
     """JWT configuration settings."""
 
@@ -88,6 +219,11 @@ class Settings(BaseSettings):
     jwt: JWTSettings = JWTSettings()
     database: DatabaseSettings = DatabaseSettings()
     rabbitmq: RabbitMQSettings = RabbitMQSettings()
+    mq: MessageQueueSettings = MessageQueueSettings()
+    outbox: OutboxSettings = OutboxSettings()
+    webhook: WebhookSettings = WebhookSettings()
+    scheduler: SchedulerSettings = SchedulerSettings()
+    stream: StreamSettings = StreamSettings()
 
     @field_validator("cors_origins", mode="before")
     @classmethod
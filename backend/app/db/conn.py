@@ -2,19 +2,101 @@
 Database connection module.
 """
 
+import time
+from dataclasses import asdict, dataclass
 from functools import cache
+from typing import Any
+from uuid import uuid4
 
+from sqlalchemy import exc
 from sqlalchemy.ext.asyncio import (AsyncEngine, AsyncSession,
                                     async_sessionmaker, create_async_engine)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from app.config import settings
+from app.config import DatabaseSettings, settings
 
 
+@dataclass
+class PoolCheckoutMetrics:
+    """
+    Cumulative connection checkout metrics of a pool.
+    """
+
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    def observe(self, wait: float):
+        """
+        Record a single checkout.
+
+        :param wait: Seconds spent waiting for the connection
+        """
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+
+class MeteredAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Async queue pool that measures how long checkouts wait for a connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolCheckoutMetrics()
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.observe(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def get_engine_options(database: DatabaseSettings = settings.database) -> dict[str, Any]:
+    """
+    Get ``create_async_engine`` options for the database settings.
+    """
+    connect_args: dict[str, Any] = {
+        "statement_cache_size": database.statements,
+        "prepared_statement_cache_size": database.statements,
+    }
+    if database.profile == "pgbouncer":
+        # PgBouncer in transaction mode may run every statement on another
+        # server connection, named prepared statements can not be reused
+        connect_args = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+
+    return {
+        "poolclass": MeteredAsyncQueuePool,
+        "pool_size": database.pool.size,
+        "max_overflow": database.pool.overflow,
+        "pool_timeout": database.pool.timeout,
+        "pool_recycle": database.pool.recycle,
+        "pool_pre_ping": database.pool.ping,
+        "connect_args": connect_args,
+    }
+
+
+@cache
 def get_async_engine(url: str = settings.database.url) -> AsyncEngine:
     """
     Get an async engine for the database.
     """
-    return create_async_engine(url)
+    return create_async_engine(url, **get_engine_options())
 
 
 @cache
@@ -38,3 +120,28 @@ def get_async_session() -> AsyncSession:
     """
     async_session = get_async_session_maker()
     return async_session()
+
+
+def get_pool_stats(engine: AsyncEngine | None = None) -> dict[str, Any]:
+    """
+    Get live connection pool statistics.
+
+    :param engine: Engine to inspect, the default engine if not provided
+    :return: Pool size, checked out/in and overflow connections and
+        cumulative checkout wait metrics
+    """
+    if engine is None:
+        engine = get_async_engine()
+
+    pool = engine.sync_engine.pool
+    stats: dict[str, Any] = {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(asdict(metrics))
+        stats["wait_avg"] = metrics.wait_total / metrics.checkouts if metrics.checkouts else 0.0
+    return stats
@@ -6,9 +6,11 @@ Database models module.
 
 from .ai_chat_config import AIChatConfig
 from .base import Base
+from .bot_state import BotState
 from .chat import Chat, ChatType
 from .chat_member import ChatMember, ChatMemberStatus
 from .chat_message import ChatMessage
+from .outbox import OutboxMessage
 from .user import User
 
 __all__ = [
@@ -19,4 +21,6 @@ __all__ = [
     "ChatType",
     "AIChatConfig",
     "ChatMessage",
+    "BotState",
+    "OutboxMessage",
 ]
@@ -0,0 +1,20 @@
+"""
+Bot state model.
+"""
+
+from sqlalchemy import BigInteger, Column
+
+from app.db.models.base import Base
+
+
+class BotState(Base):
+    """
+    Database model for the persisted state of a Telegram bot.
+    """
+
+    __tablename__ = "bot_state"
+
+    bot_id = Column(BigInteger, primary_key=True, autoincrement=False)
+
+    # Every update up to this ID has been processed
+    last_update_id = Column(BigInteger, nullable=False)
@@ -5,7 +5,7 @@ Chat model for group chats with AI.
 import enum
 import uuid
 
-from sqlalchemy import UUID, BigInteger, Column, Enum, ForeignKey, String
+from sqlalchemy import UUID, BigInteger, Column, Enum, ForeignKey, String, text
 from sqlalchemy.orm import relationship
 
 from app.db.models.base import Base
@@ -38,6 +38,11 @@ class Chat(Base):
 
     telegram_chat_id = Column(BigInteger, nullable=True, index=True)
 
+    # Denormalized number of messages, maintained by MessageRepository
+    message_count = Column(
+        BigInteger, default=0, server_default=text("0"), nullable=False
+    )
+
     owner = relationship("User")
     members = relationship("ChatMember", back_populates="chat")
     # chat_permissions = relationship("ChatPermission", back_populates="chat", uselist=False)
@@ -4,7 +4,7 @@ Message model for storing chat messages.
 
 import uuid
 
-from sqlalchemy import UUID, Column, ForeignKey, Text
+from sqlalchemy import UUID, Column, ForeignKey, Index, Text
 from sqlalchemy.orm import relationship
 
 from app.db.models.base import Base
@@ -16,6 +16,10 @@ class ChatMessage(Base):
     """
 
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # Keyset pagination of the chat history by (created_at, id)
+        Index("ix_chat_messages_chat_id_created_at_id", "chat_id", "created_at", "id"),
+    )
 
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     chat_id = Column(
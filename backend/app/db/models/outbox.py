@@ -0,0 +1,27 @@
+"""
+Outbox model for messages waiting to be published to the MQ.
+"""
+
+from sqlalchemy import BigInteger, Column, Identity, LargeBinary, SmallInteger, String
+
+from app.db.models.base import Base
+
+
+class OutboxMessage(Base):
+    """
+    Database model for an encoded MQ message written in the transaction of
+    the change it announces and deleted once published.
+    """
+
+    __tablename__ = "outbox"
+
+    # Publication order
+    id = Column(BigInteger, Identity(), primary_key=True)
+
+    # MQ partition of the message, published in order by one relay at a time
+    partition = Column(SmallInteger, nullable=False)
+
+    routing_key = Column(String, nullable=False)
+    content_type = Column(String, nullable=False)
+    message_id = Column(String, nullable=True)
+    body = Column(LargeBinary, nullable=False)
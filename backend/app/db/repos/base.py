@@ -2,13 +2,61 @@
 Base repository module.
 """
 
+from typing import Optional, Union
+
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from app.db.routing import LazyReplicaSession
+
+# Session.info key set once the session has written anything
+HAS_WRITES = "has_writes"
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_flush(session: Session, flush_context):
+    session.info[HAS_WRITES] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_dml(orm_execute_state: ORMExecuteState):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        orm_execute_state.session.info[HAS_WRITES] = True
 
 
 class BaseRepository:
     """
     Base repository for all database repositories.
+
+    :attr db: Primary session, used for writes
+    :attr replica: Optional read replica session, opened on first use if lazy
     """
 
-    def __init__(self, db: AsyncSession):
+    def __init__(
+        self,
+        db: AsyncSession,
+        replica: Optional[Union[AsyncSession, LazyReplicaSession]] = None,
+    ):
         self.db = db
+        self.replica = replica
+
+    @property
+    def reader(self) -> AsyncSession:
+        """
+        Session for read-only queries.
+
+        The replica if there is one, unless the primary session has already
+        written something (read-your-writes stays on the primary). Only
+        within the request, see ``app.db.routing``.
+        """
+        if self.replica is None or self.db.info.get(HAS_WRITES):
+            return self.db
+        replica = self.replica
+        if isinstance(replica, LazyReplicaSession):
+            replica = replica.session
+        return replica or self.db
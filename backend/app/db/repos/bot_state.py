@@ -0,0 +1,53 @@
+"""
+Bot state repository module.
+"""
+
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.future import select
+
+from app.db.models.bot_state import BotState
+from app.db.repos.base import BaseRepository
+
+
+class BotStateRepository(BaseRepository):
+    """
+    Repository for the persisted state of Telegram bots.
+    """
+
+    async def get_last_update_id(self, bot_id: int) -> Optional[int]:
+        """
+        Get the ID of the last processed update.
+
+        :param bot_id: Telegram ID of the bot
+        :return: The update ID, None if nothing was processed yet
+        """
+        result = await self.db.execute(
+            select(BotState.last_update_id).where(BotState.bot_id == bot_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def save_last_update_id(self, bot_id: int, update_id: int):
+        """
+        Save the ID of the last processed update.
+
+        The stored ID never goes back, so a late flush from an old process
+        can't make updates to be processed twice.
+
+        :param bot_id: Telegram ID of the bot
+        :param update_id: ID of the last processed update
+        """
+        statement = insert(BotState).values(bot_id=bot_id, last_update_id=update_id)
+        statement = statement.on_conflict_do_update(
+            index_elements=[BotState.bot_id],
+            set_={
+                "last_update_id": func.greatest(
+                    BotState.last_update_id, statement.excluded.last_update_id
+                ),
+                "updated_at": func.now(),
+            },
+        )
+        await self.db.execute(statement)
+        await self.db.commit()
@@ -7,7 +7,7 @@ from contextlib import suppress
 from typing import Optional
 from uuid import UUID
 
-from sqlalchemy import delete, update
+from sqlalchemy import delete, func, update
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.future import select
 
@@ -15,6 +15,16 @@ from app.db.models.chat import Chat, ChatType
 from app.db.models.chat_member import ChatMember, ChatMemberStatus
 from app.db.repos.base import BaseRepository
 from app.db.repos.exptions import ChatUsernameAlreadyExistsException
+from app.utils.ttl_cache import TTLCache
+
+# Process-local cache of telegram_chat_id -> chat ID (None for not mirrored
+# Telegram chats). Changes are announced with NOTIFY on TELEGRAM_CHAT_CHANNEL
+# (payload: the Telegram chat ID) when their transaction commits, the bot
+# drops them from its cache (app.bot.chat_cache). The TTL bounds staleness
+# in processes that don't listen.
+TELEGRAM_CHAT_CACHE: TTLCache[int, Optional[UUID]] = TTLCache(maxsize=100_000, ttl=300)
+TELEGRAM_CHAT_MISS_TTL = 30
+TELEGRAM_CHAT_CHANNEL = "telegram_chat_changed"
 
 
 class ChatRepository(BaseRepository):
@@ -22,14 +32,17 @@ class ChatRepository(BaseRepository):
     Chat repository for managing chat-related database operations.
     """
 
-    async def get_chat_by_id(self, chat_id: UUID) -> Optional[Chat]:
+    async def get_chat_by_id(self, chat_id: UUID, primary: bool = False) -> Optional[Chat]:
         """
         Get a chat by its ID.
 
         :param chat_id: The ID of the chat.
+        :param primary: Read from the primary, for the checks before a write
+            (a lagging replica may have an old owner or miss a new chat).
         :return: The chat if found, None otherwise.
         """
-        result = await self.db.execute(select(Chat).where(Chat.id == chat_id))
+        session = self.db if primary else self.reader
+        result = await session.execute(select(Chat).where(Chat.id == chat_id))
         return result.scalar_one_or_none()
 
     async def get_chat_by_username(self, username: str) -> Optional[Chat]:
@@ -42,6 +55,44 @@ class ChatRepository(BaseRepository):
         result = await self.db.execute(select(Chat).where(Chat.username == username))
         return result.scalar_one_or_none()
 
+    async def get_chat_by_telegram_id(self, telegram_chat_id: int) -> Optional[Chat]:
+        """
+        Get a chat by the ID of the mirrored Telegram chat.
+
+        :param telegram_chat_id: The ID of the Telegram chat.
+        :return: The chat if found, None otherwise.
+        """
+        result = await self.db.execute(
+            select(Chat).where(Chat.telegram_chat_id == telegram_chat_id).limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def resolve_chat_id_by_telegram_id(self, telegram_chat_id: int) -> Optional[UUID]:
+        """
+        Get the ID of the chat mirroring a Telegram chat (cached).
+
+        Misses are cached as well, so traffic from not mirrored Telegram
+        chats does not reach the database.
+
+        :param telegram_chat_id: The ID of the Telegram chat.
+        :return: The chat ID if the Telegram chat is mirrored, None otherwise.
+        """
+        missing = object()
+        chat_id = TELEGRAM_CHAT_CACHE.get(telegram_chat_id, missing)
+        if chat_id is not missing:
+            return chat_id
+
+        result = await self.reader.execute(
+            select(Chat.id).where(Chat.telegram_chat_id == telegram_chat_id).limit(1)
+        )
+        chat_id = result.scalar_one_or_none()
+        TELEGRAM_CHAT_CACHE.set(
+            telegram_chat_id,
+            chat_id,
+            ttl=None if chat_id is not None else TELEGRAM_CHAT_MISS_TTL,
+        )
+        return chat_id
+
     async def create_chat(
         self,
         owner_id: UUID,
@@ -140,6 +191,29 @@ class ChatRepository(BaseRepository):
         await self.db.commit()
         return result.rowcount > 0
 
+    async def set_telegram_chat_id(
+        self, chat_id: UUID, telegram_chat_id: Optional[int]
+    ) -> bool:
+        """
+        Mirror a Telegram chat into a chat (or stop mirroring with None).
+
+        :param chat_id: The ID of the chat.
+        :param telegram_chat_id: The ID of the Telegram chat, None to clear it.
+        :return: True if the chat was updated successfully, False otherwise.
+        """
+        previous = await self.db.execute(
+            select(Chat.telegram_chat_id).where(Chat.id == chat_id).with_for_update()
+        )
+        previous_telegram_chat_id = previous.scalar_one_or_none()
+        result = await self.db.execute(
+            update(Chat)
+            .where(Chat.id == chat_id)
+            .values(telegram_chat_id=telegram_chat_id)
+        )
+        await self._invalidate_telegram_chats(previous_telegram_chat_id, telegram_chat_id)
+        await self.db.commit()
+        return result.rowcount > 0
+
     async def delete_chat(self, chat_id: UUID) -> bool:
         """
         Delete a chat.
@@ -147,6 +221,29 @@ class ChatRepository(BaseRepository):
         :param chat_id: The ID of the chat to delete.
         :return: True if the chat was deleted successfully, False otherwise.
         """
-        result = await self.db.execute(delete(Chat).where(Chat.id == chat_id))
+        result = await self.db.execute(
+            delete(Chat).where(Chat.id == chat_id).returning(Chat.telegram_chat_id)
+        )
+        deleted = result.one_or_none()
+        if deleted is not None:
+            await self._invalidate_telegram_chats(deleted.telegram_chat_id)
         await self.db.commit()
-        return result.rowcount > 0
+        return deleted is not None
+
+    async def _invalidate_telegram_chats(self, *telegram_chat_ids: Optional[int]):
+        """
+        Drop Telegram chats from the caches of all processes.
+
+        Called in the changing transaction: the other processes are notified
+        on commit, the local cache right away (a lookup racing the commit
+        may cache the old value again until the notification arrives).
+
+        :param telegram_chat_ids: IDs of the changed Telegram chats, None is skipped.
+        """
+        for telegram_chat_id in telegram_chat_ids:
+            if telegram_chat_id is None:
+                continue
+            await self.db.execute(
+                select(func.pg_notify(TELEGRAM_CHAT_CHANNEL, str(telegram_chat_id)))
+            )
+            TELEGRAM_CHAT_CACHE.pop(telegram_chat_id)
@@ -15,7 +15,7 @@ from sqlalchemy.exc import IntegrityError
 from app.db.models.chat import Chat
 from app.db.models.chat_member import ChatMember, ChatMemberStatus
 from app.db.repos.base import BaseRepository
-from app.db.types.pagination import Pagination
+from app.db.types.pagination import CountStrategy, Pagination
 
 
 class ChatMemberRepository(BaseRepository):
@@ -188,25 +188,30 @@ class ChatMemberRepository(BaseRepository):
         return result.scalar_one_or_none()
 
     async def get_chat_members_by_status(
-        self, chat_id: UUID, status: ChatMemberStatus, page: int = 1, per_page: int = 50
+        self,
+        chat_id: UUID,
+        status: ChatMemberStatus,
+        page: int = 1,
+        per_page: int = 50,
+        count: CountStrategy = CountStrategy.EXACT,
     ) -> Pagination[ChatMember]:
         """
         Get chat members by status.
 
         :param chat_id: The ID of the chat.
         :param status: The status of the chat members to retrieve.
+        :param count: Strategy used to count the total.
         :return: A list of chat members with the specified status.
         """
-        result = await self.db.execute(
-            select(ChatMember).where(
-                ChatMember.chat_id == chat_id, ChatMember.status == status
-            )
+        query = select(ChatMember).where(
+            ChatMember.chat_id == chat_id, ChatMember.status == status
         )
         return await Pagination.from_query(
-            self.db,
-            query=result,
+            self.reader,
+            query=query,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            count=count,
         )
 
     async def get_chat_members(self, chat_id: UUID, page: int = 1, per_page: int = 50) -> Pagination[ChatMember]:
@@ -272,7 +277,8 @@ class ChatMemberRepository(BaseRepository):
         user_id: UUID, 
         statuses: List[ChatMemberStatus],
         page: int = 1,
-        per_page: int = 50
+        per_page: int = 50,
+        count: CountStrategy = CountStrategy.EXACT,
     ) -> Pagination[Chat]:
         """
         Get paginated chats where the user has a specific status.
@@ -281,6 +287,7 @@ class ChatMemberRepository(BaseRepository):
         :param statuses: List of statuses to filter chats by.
         :param page: Page number for pagination.
         :param per_page: Number of chats per page.
+        :param count: Strategy used to count the total.
         :return: Paginated list of chats.
         """
         query = (
@@ -293,17 +300,19 @@ class ChatMemberRepository(BaseRepository):
             .order_by(Chat.created_at.desc())
         )
         return await Pagination.from_query(
-            self.db,
+            self.reader,
             query=query,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            count=count,
         )
 
     async def get_user_active_chats(
         self, 
         user_id: UUID,
         page: int = 1,
-        per_page: int = 50
+        per_page: int = 50,
+        count: CountStrategy = CountStrategy.EXACT,
     ) -> Pagination[Chat]:
         """
         Get paginated chats where the user is an active member.
@@ -311,20 +320,23 @@ class ChatMemberRepository(BaseRepository):
         :param user_id: The ID of the user.
         :param page: Page number for pagination.
         :param per_page: Number of chats per page.
+        :param count: Strategy used to count the total.
         :return: Paginated list of chats.
         """
         return await self.get_user_chats_by_status(
             user_id=user_id,
             statuses=[ChatMemberStatus.MEMBER, ChatMemberStatus.ADMIN, ChatMemberStatus.OWNER],
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            count=count,
         )
 
     async def get_user_pending_chats(
         self, 
         user_id: UUID,
         page: int = 1,
-        per_page: int = 50
+        per_page: int = 50,
+        count: CountStrategy = CountStrategy.EXACT,
     ) -> Pagination[Chat]:
         """
         Get paginated chats where the user has a pending status.
@@ -332,11 +344,13 @@ class ChatMemberRepository(BaseRepository):
         :param user_id: The ID of the user.
         :param page: Page number for pagination.
         :param per_page: Number of chats per page.
+        :param count: Strategy used to count the total.
         :return: Paginated list of chats.
         """
         return await self.get_user_chats_by_status(
             user_id=user_id,
             statuses=[ChatMemberStatus.JOIN_REQUEST],
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            count=count,
         )
@@ -2,16 +2,24 @@
 Message repository module for managing message-related database operations.
 """
 
-from typing import Optional
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence
 from uuid import UUID
 
-from sqlalchemy import delete, select
+from sqlalchemy import Integer, column, delete, func, select, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import joinedload
 
+from app.db.models.chat import Chat
 from app.db.models.chat_message import ChatMessage
+from app.db.models.outbox import OutboxMessage
 from app.db.repos.base import BaseRepository
-from app.db.types.pagination import Pagination
+from app.db.repos.outbox import OutboxRepository
+from app.db.types.cursor import CursorPagination
+from app.db.types.pagination import CountStrategy, Pagination
 
 
 class MessageRepository(BaseRepository):
@@ -20,7 +28,13 @@ class MessageRepository(BaseRepository):
     """
 
     async def create_message(
-        self, chat_id: UUID, user_id: UUID, content: str
+        self,
+        chat_id: UUID,
+        user_id: UUID,
+        content: str,
+        message_id: Optional[UUID] = None,
+        created_at: Optional[datetime] = None,
+        outbox: Sequence[OutboxMessage] = (),
     ) -> ChatMessage:
         """
         Create a new message.
@@ -28,6 +42,9 @@ class MessageRepository(BaseRepository):
         :param chat_id: The ID of the chat
         :param user_id: The ID of the user sending the message
         :param content: The message content
+        :param message_id: The ID of the message, generated by default
+        :param created_at: The message timestamp, the transaction time by default
+        :param outbox: MQ messages announcing the message, committed with it
         :return: The created message
         """
         try:
@@ -36,7 +53,19 @@ class MessageRepository(BaseRepository):
                 user_id=user_id,
                 content=content,
             )
+            # unset columns get their defaults, None would be written as NULL
+            if message_id is not None:
+                message.id = message_id
+            if created_at is not None:
+                message.created_at = created_at
             self.db.add(message)
+            # The counter is bumped in the same transaction as the insert
+            await self.db.execute(
+                update(Chat)
+                .where(Chat.id == chat_id)
+                .values(message_count=Chat.message_count + 1)
+            )
+            await OutboxRepository(self.db).add(outbox)
             await self.db.commit()
             await self.db.refresh(message)
             return message
@@ -44,15 +73,81 @@ class MessageRepository(BaseRepository):
             await self.db.rollback()
             raise
 
+    async def create_messages(self, messages: Sequence[Dict[str, Any]]) -> int:
+        """
+        Create many messages in one transaction.
+
+        Rows are written with multi-row INSERTs, messages whose ``id``
+        exists already (redelivered ones) are skipped. The chat counters are
+        bumped by the number of rows actually inserted.
+
+        :param messages: Dicts with ``id``, ``chat_id``, ``user_id``,
+            ``content`` and ``created_at``
+        :return: Number of created messages
+        """
+        if not messages:
+            return 0
+
+        added: Counter = Counter()
+        # 5 parameters per row, 5000 rows (25000) stay below the 32767 bind parameter limit
+        for start in range(0, len(messages), 5000):
+            result = await self.db.execute(
+                insert(ChatMessage)
+                .values(
+                    [
+                        {
+                            "id": message["id"],
+                            "chat_id": message["chat_id"],
+                            "user_id": message["user_id"],
+                            "content": message["content"],
+                            "created_at": message["created_at"],
+                        }
+                        for message in messages[start : start + 5000]
+                    ]
+                )
+                .on_conflict_do_nothing(index_elements=[ChatMessage.id])
+                .returning(ChatMessage.chat_id)
+            )
+            added.update(result.scalars().all())
+
+        if added:
+            # Lock the chats in a fixed order, concurrent writers don't deadlock.
+            # FOR NO KEY UPDATE only serializes the counters, the FK checks
+            # (FOR KEY SHARE) of concurrent message inserts don't wait for it
+            await self.db.execute(
+                select(Chat.id)
+                .where(Chat.id.in_(added))
+                .order_by(Chat.id)
+                .with_for_update(key_share=True)
+            )
+            counts = values(
+                column("chat_id", PG_UUID), column("added", Integer), name="counts"
+            ).data(list(added.items()))
+            await self.db.execute(
+                update(Chat)
+                .where(Chat.id == counts.c.chat_id)
+                .values(message_count=Chat.message_count + counts.c.added)
+                .execution_options(synchronize_session=False)
+            )
+        await self.db.commit()
+        return sum(added.values())
+
     async def get_messages_by_chat(
-        self, chat_id: UUID, page: int = 1, per_page: int = 50
+        self,
+        chat_id: UUID,
+        page: int = 1,
+        per_page: int = 50,
+        count: CountStrategy = CountStrategy.COUNTER,
     ) -> Pagination[ChatMessage]:
         """
         Retrieve paginated messages for a specific chat.
 
+        The total is read from the chat message counter by default.
+
         :param chat_id: The ID of the chat
         :param page: Page number for pagination
         :param per_page: Number of messages per page
+        :param count: Strategy used to count the total
         :return: Paginated messages with total count
         """
         query = (
@@ -62,10 +157,48 @@ class MessageRepository(BaseRepository):
             .order_by(ChatMessage.created_at.desc())
         )
         return await Pagination.from_query(
-            self.db,
+            self.reader,
             query=query,
             page=page,
-            per_page=per_page
+            per_page=per_page,
+            count=count,
+            counter=(
+                select(Chat.message_count)
+                .where(Chat.id == chat_id)
+                .scalar_subquery()
+            ),
+        )
+
+    async def get_messages_by_chat_cursor(
+        self,
+        chat_id: UUID,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        per_page: int = 50,
+    ) -> CursorPagination[ChatMessage]:
+        """
+        Retrieve messages for a specific chat using keyset pagination.
+
+        Messages are ordered newest first by ``(created_at, id)``.
+
+        :param chat_id: The ID of the chat
+        :param before: Cursor, return messages older than it
+        :param after: Cursor, return messages newer than it
+        :param per_page: Number of messages per page
+        :return: Messages page with cursors to the neighbour pages
+        """
+        query = (
+            select(ChatMessage)
+            .options(joinedload(ChatMessage.user))
+            .where(ChatMessage.chat_id == chat_id)
+        )
+        return await CursorPagination.from_query(
+            self.reader,
+            query=query,
+            keys=(ChatMessage.created_at, ChatMessage.id),
+            before=before,
+            after=after,
+            per_page=per_page,
         )
 
     async def get_message_by_id(self, message_id: UUID) -> Optional[ChatMessage]:
@@ -85,5 +218,62 @@ class MessageRepository(BaseRepository):
         :param message_id: The ID of the message to delete
         :return: True if the message was deleted, False otherwise
         """
-        result = await self.db.execute(delete(ChatMessage).where(ChatMessage.id == message_id))
-        return result.rowcount > 0
+        result = await self.db.execute(
+            delete(ChatMessage)
+            .where(ChatMessage.id == message_id)
+            .returning(ChatMessage.chat_id)
+        )
+        chat_id = result.scalar_one_or_none()
+        if chat_id is None:
+            return False
+
+        await self.db.execute(
+            update(Chat)
+            .where(Chat.id == chat_id)
+            .values(message_count=Chat.message_count - 1)
+        )
+        await self.db.commit()
+        return True
+
+    async def reconcile_message_counts(
+        self, after_chat_id: Optional[UUID] = None, batch_size: int = 500
+    ) -> tuple[int, Optional[UUID]]:
+        """
+        Fix drifted message counters for a batch of chats.
+
+        The chat rows are locked first, so messages written concurrently are
+        either counted here or bump the counter after this transaction.
+
+        :param after_chat_id: Process chats with an ID greater than this one
+        :param batch_size: Number of chats to process
+        :return: Number of fixed counters and the last processed chat ID
+            (None when there are no chats left)
+        """
+        query = (
+            select(Chat.id)
+            .order_by(Chat.id)
+            .limit(batch_size)
+            .with_for_update(key_share=True)
+        )
+        if after_chat_id is not None:
+            query = query.where(Chat.id > after_chat_id)
+        chat_ids = (await self.db.execute(query)).scalars().all()
+        if not chat_ids:
+            await self.db.commit()
+            return 0, None
+
+        counts = (
+            select(Chat.id.label("chat_id"), func.count(ChatMessage.id).label("total"))
+            .outerjoin(ChatMessage, ChatMessage.chat_id == Chat.id)
+            .where(Chat.id.in_(chat_ids))
+            .group_by(Chat.id)
+            .subquery()
+        )
+        result = await self.db.execute(
+            update(Chat)
+            .where(Chat.id == counts.c.chat_id, Chat.message_count != counts.c.total)
+            .values(message_count=counts.c.total)
+            .execution_options(synchronize_session=False)
+        )
+        await self.db.commit()
+        return result.rowcount, chat_ids[-1]
@@ -0,0 +1,104 @@
+"""
+Outbox repository module for the messages waiting to be published.
+"""
+
+from typing import List, Sequence
+
+from sqlalchemy import Row, delete, extract, func, select
+
+from app.db.models.outbox import OutboxMessage
+from app.db.repos.base import BaseRepository
+
+# NOTIFY channel signalled by every transaction that adds outbox rows
+OUTBOX_CHANNEL = "outbox"
+
+# first key of the advisory locks held by a relay on the partitions it publishes
+OUTBOX_LOCK = 0x6F7574
+
+
+class OutboxRepository(BaseRepository):
+    """
+    Repository for the outbox of the MQ messages.
+    """
+
+    async def add(self, messages: Sequence[OutboxMessage]):
+        """
+        Add messages to the outbox of the current transaction, not committed.
+
+        The relays are notified when the transaction commits.
+
+        :param messages: Encoded messages to publish
+        """
+        if not messages:
+            return
+        self.db.add_all(messages)
+        await self.db.execute(select(func.pg_notify(OUTBOX_CHANNEL, "")))
+
+    async def lock_partitions(self, batch_size: int) -> List[int]:
+        """
+        Lock the partitions no other relay is publishing, oldest message first.
+
+        A partition is locked with a transaction advisory lock, only until
+        the locked ones hold a batch, so the other relays get the rest.
+
+        :param batch_size: Max number of messages of the batch
+        :return: The locked partitions
+        """
+        pending = await self.db.execute(
+            select(OutboxMessage.partition, func.count())
+            .group_by(OutboxMessage.partition)
+            .order_by(func.min(OutboxMessage.id))
+        )
+        locked: List[int] = []
+        messages = 0
+        for partition, count in pending.all():
+            if await self.db.scalar(
+                select(func.pg_try_advisory_xact_lock(OUTBOX_LOCK, partition))
+            ):
+                locked.append(partition)
+                messages += count
+                if messages >= batch_size:
+                    break
+        return locked
+
+    async def claim(self, batch_size: int) -> List[Row]:
+        """
+        Lock the oldest messages of the partitions no other relay is publishing.
+
+        The partitions are locked first (see :meth:`lock_partitions`), so
+        the messages of a partition are published by one relay at a time
+        and stay in order, while relays share the partitions. Rows locked
+        by another transaction are skipped.
+
+        :param batch_size: Max number of messages
+        :return: Rows with the message columns and their ``age`` in seconds
+        """
+        partitions = await self.lock_partitions(batch_size)
+        if not partitions:
+            return []
+        result = await self.db.execute(
+            select(
+                OutboxMessage.id,
+                OutboxMessage.routing_key,
+                OutboxMessage.content_type,
+                OutboxMessage.message_id,
+                OutboxMessage.body,
+                extract("epoch", func.clock_timestamp() - OutboxMessage.created_at).label(
+                    "age"
+                ),
+            )
+            .where(OutboxMessage.partition.in_(partitions))
+            .order_by(OutboxMessage.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        return list(result.all())
+
+    async def delete(self, ids: Sequence[int]):
+        """
+        Delete published messages and commit, releasing the partition locks.
+
+        :param ids: IDs of the published messages
+        """
+        await self.db.execute(delete(OutboxMessage).where(OutboxMessage.id.in_(ids)))
+        await self.db.commit()
@@ -2,9 +2,11 @@
 User repository module.
 """
 
-from typing import Optional
+import uuid
+from typing import Any, Dict, Optional, Sequence
 
-from sqlalchemy import UUID
+from sqlalchemy import UUID, exists, func, or_, union_all
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.future import select
 
 from ..models import User
@@ -56,27 +58,115 @@ class UserRepository(BaseRepository):
         """
         Create or update a user in the database.
 
+        A single ``INSERT ... ON CONFLICT DO UPDATE ... WHERE`` statement,
+        the row is written only if the profile has changed, otherwise the
+        stored user is returned by the same statement.
+        A missing ``photo_url`` keeps the stored one (the bot does not know it).
+
         :param telegram_id: The Telegram ID of the user.
         :param first_name: The first name of the user.
         :param last_name: The last name of the user.
         :param username: The username of the user.
         :param photo_url: The photo URL of the user.
         """
-        existing_user = await self.get_user_by_telegram_id(telegram_id)
-
-        if existing_user:
-            # Update existing user
-            existing_user.first_name = first_name
-            existing_user.last_name = last_name
-            existing_user.username = username
-            existing_user.photo_url = photo_url
-            await self.db.commit()
-            await self.db.refresh(existing_user)
-            return existing_user
-
-        return await self.create_user(
-            telegram_id, first_name, last_name, username, photo_url
+        users = User.__table__
+        stmt = insert(User).values(
+            id=uuid.uuid4(),
+            telegram_id=telegram_id,
+            first_name=first_name,
+            last_name=last_name,
+            username=username,
+            photo_url=photo_url,
+        )
+        excluded = stmt.excluded
+        upserted = (
+            stmt.on_conflict_do_update(
+                index_elements=[User.telegram_id],
+                set_={
+                    "first_name": excluded.first_name,
+                    "last_name": excluded.last_name,
+                    "username": excluded.username,
+                    "photo_url": func.coalesce(excluded.photo_url, User.photo_url),
+                    "updated_at": func.now(),
+                },
+                where=or_(
+                    User.first_name.is_distinct_from(excluded.first_name),
+                    User.last_name.is_distinct_from(excluded.last_name),
+                    User.username.is_distinct_from(excluded.username),
+                    excluded.photo_url.is_not(None)
+                    & User.photo_url.is_distinct_from(excluded.photo_url),
+                ),
+            )
+            .returning(*users.c)
+            .cte("upserted")
+        )
+        # Unchanged profile: nothing is written and RETURNING is empty,
+        # so the stored row is selected in the same statement
+        query = union_all(
+            select(*upserted.c),
+            select(*users.c).where(
+                users.c.telegram_id == telegram_id,
+                ~exists(select(upserted.c.id)),
+            ),
+        )
+        result = await self.db.execute(
+            select(User)
+            .from_statement(query)
+            .execution_options(populate_existing=True)
+        )
+        user = result.scalar_one_or_none()
+        await self.db.commit()
+
+        if user is None:
+            # The row was inserted by a concurrent transaction after the
+            # statement snapshot was taken, it is visible to a new statement
+            user = await self.get_user_by_telegram_id(telegram_id)
+        return user
+
+    async def update_profiles(self, profiles: Sequence[Dict[str, Any]]) -> int:
+        """
+        Create or update many users in one statement (no results returned).
+
+        Only changed rows are written, ``photo_url`` is not touched.
+
+        :param profiles: Dicts with ``telegram_id``, ``first_name``,
+            ``last_name`` and ``username`` (one per Telegram ID).
+        :return: Number of created or updated users.
+        """
+        if not profiles:
+            return 0
+
+        stmt = insert(User).values(
+            [
+                {
+                    "id": uuid.uuid4(),
+                    "telegram_id": profile["telegram_id"],
+                    "first_name": profile.get("first_name"),
+                    "last_name": profile.get("last_name"),
+                    "username": profile.get("username"),
+                }
+                for profile in profiles
+            ]
         )
+        excluded = stmt.excluded
+        result = await self.db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[User.telegram_id],
+                set_={
+                    "first_name": excluded.first_name,
+                    "last_name": excluded.last_name,
+                    "username": excluded.username,
+                    "updated_at": func.now(),
+                },
+                where=or_(
+                    User.first_name.is_distinct_from(excluded.first_name),
+                    User.last_name.is_distinct_from(excluded.last_name),
+                    User.username.is_distinct_from(excluded.username),
+                ),
+            )
+        )
+        await self.db.commit()
+        return result.rowcount
 
     async def get_user_by_telegram_id(self, telegram_id: int) -> Optional[User]:
         """
@@ -0,0 +1,224 @@
+"""
+Read replica routing module.
+
+Read-only repository methods may run on a replica, the router keeps track
+of replica health and replication lag in the background and falls back to
+the primary when no replica is usable.
+
+Read-your-writes holds within a request only: once the request session has
+written, its reads stay on the primary. A later request (e.g. the GET after
+a POST/redirect) may read from a replica that hasn't replayed the write yet,
+by up to ``DATABASE_REPLICA_LAG`` seconds. Endpoints that must see a write
+of an earlier request read with the primary session (``repo.db``).
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from functools import cache
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import (AsyncEngine, AsyncSession,
+                                    async_sessionmaker, create_async_engine)
+
+from app.config import settings
+from app.db.conn import get_engine_options
+
+logger = logging.getLogger(__name__)
+
+# Replay lag is 0 when everything received is replayed (an idle primary
+# does not make the replica "lag"), otherwise the age of the last replay
+LAG_QUERY = text(
+    """
+    SELECT pg_is_in_recovery(),
+           CASE
+               WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+               ELSE COALESCE(
+                   EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+               )
+           END
+    """
+)
+
+
+@dataclass
+class ReplicaState:
+    """
+    Health of a single replica.
+    """
+
+    engine: AsyncEngine
+    healthy: bool = False
+    lag: float = float("inf")
+    checked_at: float = 0.0
+
+
+class ReplicaRouter:
+    """
+    Picks a healthy replica with acceptable lag for read-only sessions.
+    """
+
+    def __init__(
+        self,
+        engines: List[AsyncEngine],
+        max_lag: float = 5.0,
+        check_interval: float = 5.0,
+        check_timeout: float = 2.0,
+    ):
+        """
+        Initialize the replica router.
+
+        :param engines: Engines of the replicas
+        :param max_lag: Max replication lag (seconds) to route reads to a replica
+        :param check_interval: Seconds between health checks
+        :param check_timeout: Seconds to wait for a single health check
+        """
+        self.replicas = [ReplicaState(engine=engine) for engine in engines]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._checker: Optional[asyncio.Task] = None
+        self._round_robin = itertools.count()
+        self._session_makers = {
+            id(engine): async_sessionmaker(
+                engine, expire_on_commit=False, class_=AsyncSession
+            )
+            for engine in engines
+        }
+
+    async def check_replica(self, replica: ReplicaState):
+        """
+        Refresh health and lag of a replica.
+        """
+        try:
+            async with asyncio.timeout(self.check_timeout):
+                async with replica.engine.connect() as conn:
+                    in_recovery, lag = (await conn.execute(LAG_QUERY)).one()
+            replica.healthy = True
+            # a promoted replica (not in recovery) does not lag
+            replica.lag = float(lag) if in_recovery else 0.0
+        except Exception as exc:  # pylint: disable=broad-except
+            if replica.healthy:
+                logger.warning("Replica %s is down: %s", replica.engine.url, exc)
+            replica.healthy = False
+            replica.lag = float("inf")
+        replica.checked_at = time.monotonic()
+
+    async def check(self):
+        """
+        Refresh health and lag of all replicas.
+        """
+        await asyncio.gather(*(self.check_replica(replica) for replica in self.replicas))
+
+    async def _run_checks(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    def start(self):
+        """
+        Start the background health checks, if they are not running.
+
+        Until the first check is done no replica is usable, reads go to
+        the primary.
+        """
+        if self._checker is None or self._checker.done():
+            self._checker = asyncio.create_task(self._run_checks())
+
+    async def stop(self):
+        """
+        Stop the background health checks.
+        """
+        if self._checker is not None:
+            self._checker.cancel()
+            await asyncio.gather(self._checker, return_exceptions=True)
+            self._checker = None
+
+    def pick(self) -> Optional[ReplicaState]:
+        """
+        Pick a usable replica (round robin), None if there is none.
+        """
+        usable = [
+            replica
+            for replica in self.replicas
+            if replica.healthy and replica.lag <= self.max_lag
+        ]
+        if not usable:
+            return None
+        return usable[next(self._round_robin) % len(usable)]
+
+    def get_session(self) -> Optional[AsyncSession]:
+        """
+        Get a session on a usable replica, None to fall back to the primary.
+
+        Doesn't wait for a health check, the last known state is used.
+        """
+        self.start()
+        replica = self.pick()
+        if replica is None:
+            return None
+        return self._session_makers[id(replica.engine)]()
+
+
+@cache
+def get_replica_router() -> Optional[ReplicaRouter]:
+    """
+    Get the replica router, None if no replicas are configured.
+    """
+    replica_settings = settings.database.replica
+    if not replica_settings.urls:
+        return None
+
+    options = get_engine_options()
+    return ReplicaRouter(
+        engines=[create_async_engine(url, **options) for url in replica_settings.urls],
+        max_lag=replica_settings.lag,
+        check_interval=replica_settings.interval,
+    )
+
+
+class LazyReplicaSession:
+    """
+    Read replica session opened on first use.
+
+    A request that only writes (or has written before reading) never
+    opens a replica session.
+    """
+
+    def __init__(self, router: ReplicaRouter):
+        """
+        :param router: Router picking the replica
+        """
+        self.router = router
+        self._session: Optional[AsyncSession] = None
+        self._opened = False
+
+    @property
+    def session(self) -> Optional[AsyncSession]:
+        """
+        Session on a usable replica, None to use the primary.
+        """
+        if not self._opened:
+            self._opened = True
+            self._session = self.router.get_session()
+        return self._session
+
+    async def close(self):
+        """
+        Close the session if it was opened.
+        """
+        if self._session is not None:
+            await self._session.close()
+
+
+def get_replica_session() -> Optional[LazyReplicaSession]:
+    """
+    Get a lazy read-only session on a replica, None if no replicas are configured.
+    """
+    router = get_replica_router()
+    if router is None:
+        return None
+    return LazyReplicaSession(router)
@@ -1,4 +1,4 @@
-from .pagination import Pagination
-
-__all__ = ["Pagination"]
+from .cursor import CursorPagination, InvalidCursorError
+from .pagination import CountStrategy, Pagination
 
+__all__ = ["Pagination", "CountStrategy", "CursorPagination", "InvalidCursorError"]
@@ -0,0 +1,202 @@
+"""
+Keyset (cursor) pagination for async SQLAlchemy queries.
+
+Instead of ``OFFSET`` the query is filtered by the sort key of the last seen
+row, so every page costs the same index range scan no matter how deep it is.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Generic, Iterator, List, Optional, Sequence, Tuple, TypeVar
+from uuid import UUID
+
+from sqlalchemy import tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy.sql import Select
+
+T = TypeVar("T")
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor can not be decoded."""
+
+    pass
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encode key values into an opaque, URL-safe cursor.
+
+    :param values: Key values of a row (e.g. ``(created_at, id)``)
+    :return: Opaque cursor string
+    """
+    raw = json.dumps(
+        [value.isoformat() if isinstance(value, datetime) else str(value) for value in values],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[InstrumentedAttribute]) -> Tuple[Any, ...]:
+    """
+    Decode an opaque cursor back into typed key values.
+
+    :param cursor: Cursor produced by :func:`encode_cursor`
+    :param columns: Key columns the cursor was built from
+    :return: Tuple of key values matching ``columns``
+    :raises InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(raw, list) or len(raw) != len(columns):
+            raise InvalidCursorError("Cursor does not match the sort key")
+
+        values = []
+        for column, value in zip(columns, raw):
+            python_type = column.type.python_type
+            if python_type is datetime:
+                values.append(datetime.fromisoformat(value))
+            elif python_type is UUID:
+                values.append(UUID(value))
+            else:
+                values.append(python_type(value))
+        return tuple(values)
+    except InvalidCursorError:
+        raise
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursorError("Invalid cursor") from exc
+
+
+class CursorPagination(Generic[T], Sequence[T]):
+    """
+    Keyset pagination result for async SQLAlchemy queries.
+
+    Items are always returned in the query order (newest first for a
+    descending key). ``next_cursor`` continues towards the end of the order
+    (older items), ``previous_cursor`` goes back to its start (newer items).
+
+    :attr items: List of items on the page
+    :attr per_page: Number of items per page
+    :attr has_next: There are more items after the page
+    :attr has_previous: There are more items before the page
+    :attr next_cursor: Cursor for the next page
+    :attr previous_cursor: Cursor for the previous page
+    """
+
+    def __init__(
+        self,
+        items: List[T],
+        per_page: int,
+        has_next: bool,
+        has_previous: bool,
+        next_cursor: Optional[str] = None,
+        previous_cursor: Optional[str] = None,
+    ):
+        """
+        Initialize the cursor pagination result.
+
+        :param items: List of items on the page
+        :param per_page: Number of items per page
+        :param has_next: There are more items after the page
+        :param has_previous: There are more items before the page
+        :param next_cursor: Cursor for the next page
+        :param previous_cursor: Cursor for the previous page
+        """
+        if per_page < 1:
+            raise ValueError("Items per page must be at least 1")
+        if len(items) > per_page:
+            raise ValueError("Items length must be less than or equal to per_page")
+
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __getitem__(self, index: int) -> T:
+        return self.items[index]
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.items)
+
+    def __contains__(self, item: T) -> bool:
+        return item in self.items
+
+    def __reversed__(self) -> Iterator[T]:
+        return reversed(self.items)
+
+    @classmethod
+    async def from_query(
+        cls,
+        session: AsyncSession,
+        query: Select[T],
+        keys: Sequence[InstrumentedAttribute],
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        per_page: int = 50,
+        descending: bool = True,
+    ) -> "CursorPagination[T]":
+        """
+        Create keyset pagination from an SQLAlchemy query.
+
+        The query must not be ordered, the order is derived from ``keys``
+        which have to be unique together (e.g. ``(created_at, id)``).
+
+        :param session: Async SQLAlchemy session
+        :param query: SQLAlchemy select query (without ORDER BY)
+        :param keys: Columns of the unique sort key
+        :param before: Cursor, return items that go after it in the order
+        :param after: Cursor, return items that go before it in the order
+        :param per_page: Number of items per page
+        :param descending: Order items by ``keys`` descending
+        :return: CursorPagination instance
+        """
+        if per_page < 1:
+            raise ValueError("Items per page must be at least 1")
+        if before and after:
+            raise InvalidCursorError("Only one of before/after can be used")
+
+        key = tuple_(*keys)
+        # "forward" walks the result order, "backward" walks it reversed
+        backward = after is not None
+        if before is not None:
+            value = tuple_(*decode_cursor(before, keys))
+            query = query.where(key < value if descending else key > value)
+        elif after is not None:
+            value = tuple_(*decode_cursor(after, keys))
+            query = query.where(key > value if descending else key < value)
+
+        if descending != backward:
+            query = query.order_by(*(column.desc() for column in keys))
+        else:
+            query = query.order_by(*(column.asc() for column in keys))
+
+        # Fetch one extra row to find out if there is anything left
+        result = await session.execute(query.limit(per_page + 1))
+        items = list(result.scalars().all())
+        has_more = len(items) > per_page
+        items = items[:per_page]
+        if backward:
+            items.reverse()
+
+        def cursor_of(item: T) -> str:
+            return encode_cursor([getattr(item, column.key) for column in keys])
+
+        has_next = has_more if not backward else True
+        has_previous = has_more if backward else before is not None
+
+        return cls(
+            items=items,
+            per_page=per_page,
+            has_next=has_next and bool(items),
+            has_previous=has_previous and bool(items),
+            next_cursor=cursor_of(items[-1]) if items and has_next else None,
+            previous_cursor=cursor_of(items[0]) if items and has_previous else None,
+        )
@@ -1,10 +1,13 @@
+import enum
+
 from sqlalchemy import func
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.sql import Select
+from sqlalchemy.sql.selectable import ScalarSelect
 
 
-from typing import Generic, Iterator, List, Sequence
+from typing import Generic, Iterator, List, Optional, Sequence
 
 from typing import TypeVar
 
@@ -12,15 +15,32 @@ from typing import TypeVar
 T = TypeVar("T")
 
 
+class CountStrategy(str, enum.Enum):
+    """
+    How the total number of items is obtained.
+
+    :cvar EXACT: Separate ``SELECT count(*)`` before the page query
+    :cvar WINDOW: ``count(*) OVER ()`` in the page query (single round trip)
+    :cvar NONE: No total, fetch ``per_page + 1`` rows to detect the next page
+    :cvar COUNTER: Read a maintained (denormalized) counter in the page query
+    """
+
+    EXACT = "exact"
+    WINDOW = "window"
+    NONE = "none"
+    COUNTER = "counter"
+
+
 class Pagination(Generic[T], Sequence[T]):
     """
     Pagination result class for async SQLAlchemy queries.
 
     :attr items: List of items to paginate
-    :attr total_items: Total number of items
-    :attr total_pages: Total number of pages
+    :attr total_items: Total number of items (None for CountStrategy.NONE)
+    :attr total_pages: Total number of pages (None for CountStrategy.NONE)
     :attr page: Current page number
     :attr per_page: Number of items per page
+    :attr count_strategy: Strategy used to obtain the total
     :attr has_next: Has next page
     :attr has_previous: Has previous page
     :attr next_page: Next page number
@@ -30,9 +50,11 @@ class Pagination(Generic[T], Sequence[T]):
     def __init__(
         self,
         items: List[T],
-        total_items: int,
+        total_items: Optional[int],
         page: int = 1,
         per_page: int = 10,
+        count_strategy: CountStrategy = CountStrategy.EXACT,
+        has_next: Optional[bool] = None,
     ):
         """
         Initialize the pagination result.
@@ -40,17 +62,22 @@ class Pagination(Generic[T], Sequence[T]):
         :param items: List of items to paginate
         :param page: Current page number
         :param per_page: Number of items per page
-        :param total_items: Total number of items
+        :param total_items: Total number of items (None if not counted)
+        :param count_strategy: Strategy used to obtain the total
+        :param has_next: Has next page, required when total_items is None
         """
         if page < 1:
             raise ValueError("Page number must be at least 1")
         if per_page < 1:
             raise ValueError("Items per page must be at least 1")
-        if total_items < 0:
+        if total_items is None and has_next is None:
+            raise ValueError("has_next is required when total items are unknown")
+        if total_items is not None and total_items < 0:
             raise ValueError("Total items must be at least 0")
 
         # logic to check if the page number is out of range
-        if (per_page * page) > total_items:
+        # (the last page may be filled only partially)
+        if total_items is not None and page > 1 and (page - 1) * per_page >= total_items:
             raise ValueError("Page number is out of range")
 
         # logic to check if the items length is out of range
@@ -61,13 +88,19 @@ class Pagination(Generic[T], Sequence[T]):
         self.page = page
         self.per_page = per_page
         self.total_items = total_items
+        self.count_strategy = count_strategy
+        self._has_next = has_next
 
     @property
-    def total_pages(self) -> int:
+    def total_pages(self) -> int | None:
+        if self.total_items is None:
+            return None
         return (self.total_items + self.per_page - 1) // self.per_page
 
     @property
     def has_next(self) -> bool:
+        if self.total_items is None:
+            return self._has_next
         return self.page < self.total_pages
 
     @property
@@ -104,9 +137,29 @@ class Pagination(Generic[T], Sequence[T]):
     def __reversed__(self) -> Iterator[T]:
         return reversed(self.items)
 
+    @staticmethod
+    async def count_query(session: AsyncSession, query: Select[T]) -> int:
+        """
+        Count all rows of an SQLAlchemy query.
+
+        :param session: Async SQLAlchemy session
+        :param query: SQLAlchemy select query
+        :return: Number of rows
+        """
+        total_items_result = await session.execute(
+            select(func.count()).select_from(query.order_by(None).subquery())
+        )
+        return total_items_result.scalar_one()
+
     @classmethod
     async def from_query(
-        cls, session: AsyncSession, query: Select[T], page: int = 1, per_page: int = 10
+        cls,
+        session: AsyncSession,
+        query: Select[T],
+        page: int = 1,
+        per_page: int = 10,
+        count: CountStrategy = CountStrategy.EXACT,
+        counter: Optional[ScalarSelect[int]] = None,
     ) -> "Pagination[T]":
         """
         Create pagination from an SQLAlchemy query.
@@ -115,23 +168,80 @@ class Pagination(Generic[T], Sequence[T]):
         :param query: SQLAlchemy select query
         :param page: Page number (1-indexed)
         :param per_page: Number of items per page
+        :param count: Strategy used to obtain the total number of items
+        :param counter: Scalar subquery reading the total, for CountStrategy.COUNTER
         :return: Pagination instance
         """
         if page < 1:
             raise ValueError("Page number must be at least 1")
         if per_page < 1:
             raise ValueError("Items per page must be at least 1")
+        if count == CountStrategy.COUNTER and counter is None:
+            raise ValueError("counter is required for CountStrategy.COUNTER")
+
+        offset = (page - 1) * per_page
+
+        if count == CountStrategy.NONE:
+            # One extra row tells if there is a next page
+            result = await session.execute(query.offset(offset).limit(per_page + 1))
+            items = result.scalars().all()
+            return cls(
+                items=items[:per_page],
+                total_items=None,
+                page=page,
+                per_page=per_page,
+                count_strategy=count,
+                has_next=len(items) > per_page,
+            )
+
+        if count in (CountStrategy.WINDOW, CountStrategy.COUNTER):
+            # The total is computed (or read) by the page query itself
+            if count == CountStrategy.WINDOW:
+                total_column = func.count().over()
+            else:
+                total_column = counter
+            result = await session.execute(
+                query.add_columns(total_column.label("total_items"))
+                .offset(offset)
+                .limit(per_page)
+            )
+            rows = result.all()
+            items = [row[0] for row in rows]
+            if rows:
+                total_items = rows[0][-1]
+            elif count == CountStrategy.COUNTER:
+                total_items = (await session.execute(select(counter))).scalar() or 0
+            elif page == 1:
+                total_items = 0
+            else:
+                # An empty page past the end carries no total, count it apart
+                total_items = await cls.count_query(session, query)
+
+            if count == CountStrategy.COUNTER:
+                # A drifted counter must not contradict the rows we have got
+                total_items = max(total_items, offset + len(items))
+
+            return cls(
+                items=items,
+                page=page,
+                per_page=per_page,
+                total_items=total_items,
+                count_strategy=count,
+            )
 
         # Count total items
-        total_items_result = await session.execute(
-            select(func.count()).select_from(query)
-        )
-        total_items = total_items_result.scalar_one()
+        total_items = await cls.count_query(session, query)
 
         # Get items
         result = await session.execute(
-            query.offset((page - 1) * per_page).limit(per_page)
+            query.offset(offset).limit(per_page)
         )
         items = result.scalars().all()
 
-        return cls(items=items, page=page, per_page=per_page, total_items=total_items)
+        return cls(
+            items=items,
+            page=page,
+            per_page=per_page,
+            total_items=total_items,
+            count_strategy=count,
+        )
@@ -0,0 +1,199 @@
+"""
+Live stream of the chat messages for the web workers.
+
+Every web worker (node) consumes one exclusive queue of its own and fans
+the messages out to the subscriptions of their chat in the process
+(:class:`app.services.fanout.FanoutHub`), instead of a queue per client.
+The node queue is bound to the chat message exchange only for the chats
+with local subscribers (``<chat_id>.*``): bound with the first subscriber
+of a chat, unbound after the last one left. A message reaches every node
+listening to its chat once, however many clients they hold.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from contextlib import suppress
+from typing import Callable, Dict, Optional, Set
+from uuid import UUID
+
+from app.services.codecs import Payload
+from app.services.fanout import FanoutHub, OverflowPolicy, Subscription
+from app.services.message_queue import MessageQueueService, create_message_queue_service
+
+logger = logging.getLogger(__name__)
+
+
+def node_queue_name() -> str:
+    """
+    Name of the queue of this process.
+    """
+    return f"chat_stream.{socket.gethostname()}.{os.getpid()}"
+
+
+class ChatStreamHub(FanoutHub):
+    """
+    Node subscription of a worker, fanned out to local subscribers.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[Payload], str],
+        mq_service_factory: Callable[[], MessageQueueService] = create_message_queue_service,
+        queue_name: Optional[str] = None,
+        retry_interval: float = 1.0,
+        **kwargs,
+    ):
+        """
+        Initialize the hub, the subscription starts with the first subscriber.
+
+        :param encode: Serializes a message for the subscribers
+        :param mq_service_factory: Creates the service of the subscription
+        :param queue_name: Name of the node queue, from the host and the process by default
+        :param retry_interval: Seconds before subscribing again after a failure
+        :param kwargs: Defaults of the subscriptions, see ``FanoutHub``
+        """
+        super().__init__(encode, **kwargs)
+        self.queue_name = queue_name or node_queue_name()
+        self.retry_interval = retry_interval
+        self._mq_service_factory = mq_service_factory
+        self._mq_service: Optional[MessageQueueService] = None
+        self._consumer: Optional[asyncio.Task] = None
+        # chats the node queue is bound to
+        self._bound: Set[UUID] = set()
+        self._bindings_changed = asyncio.Event()
+        # set once the chat is bound
+        self._bound_events: Dict[UUID, asyncio.Event] = {}
+
+    @staticmethod
+    def binding(chat_id: UUID) -> str:
+        """
+        Routing key pattern of the messages of a chat.
+        """
+        return f"{chat_id}.*"
+
+    def subscribe(
+        self,
+        chat_id: UUID,
+        max_pending: Optional[int] = None,
+        policy: Optional[OverflowPolicy] = None,
+        notify: Optional[Callable[[], None]] = None,
+    ) -> Subscription:
+        """
+        Subscribe to a chat, see ``FanoutHub.subscribe``.
+
+        The first subscriber of a chat has the node queue bound to it in the
+        background (``listen`` waits for it), the first subscriber of the
+        hub starts the node subscription.
+        """
+        subscription = super().subscribe(chat_id, max_pending, policy, notify)
+        if chat_id not in self._bound:
+            self._bindings_changed.set()
+        if self._consumer is None or self._consumer.done():
+            self._consumer = asyncio.create_task(self._consume())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """
+        Remove a subscription, the node queue is unbound from its chat in
+        the background once the last subscriber of the chat left, and the
+        listeners still waiting for the binding of the chat are released.
+        """
+        super().unsubscribe(subscription)
+        if subscription.chat_id not in self.subscriptions:
+            self._bindings_changed.set()
+            # a listener that timed out or left before the binding
+            event = self._bound_events.pop(subscription.chat_id, None)
+            if event is not None:
+                event.set()
+
+    async def listen(self, chat_id: UUID, timeout: float = 5.0, **kwargs) -> Subscription:
+        """
+        Subscribe to a chat and wait until the node queue is bound to it.
+
+        :param chat_id: UUID of the chat
+        :param timeout: Max seconds to wait for the binding, the subscription
+            is returned anyway
+        :param kwargs: Options of the subscription, see ``subscribe``
+        """
+        subscription = self.subscribe(chat_id, **kwargs)
+        if chat_id not in self._bound:
+            event = self._bound_events.setdefault(chat_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("Chat %s is not bound after %ss", chat_id, timeout)
+            except asyncio.CancelledError:
+                subscription.close()
+                raise
+        return subscription
+
+    async def dispatch(self, payload: Payload):
+        """
+        Fan a consumed message out to the subscribers of its chat.
+        """
+        self.publish(payload)
+
+    async def _bind_chats(self):
+        transport = self._mq_service.transport
+        while True:
+            await self._bindings_changed.wait()
+            self._bindings_changed.clear()
+            for chat_id in set(self.subscriptions) - self._bound:
+                await transport.bind(self.queue_name, self.binding(chat_id))
+                self._bound.add(chat_id)
+                event = self._bound_events.pop(chat_id, None)
+                if event is not None:
+                    event.set()
+            for chat_id in self._bound - set(self.subscriptions):
+                await transport.unbind(self.queue_name, self.binding(chat_id))
+                self._bound.discard(chat_id)
+
+    async def _consume(self):
+        if self._mq_service is None:
+            self._mq_service = self._mq_service_factory()
+        while True:
+            tasks = []
+            try:
+                await self._mq_service.transport.declare(self.queue_name, exclusive=True)
+                # a new queue has no bindings
+                self._bound.clear()
+                self._bindings_changed.set()
+                tasks = [
+                    asyncio.create_task(self._bind_chats()),
+                    # one handler task keeps the order of the messages
+                    asyncio.create_task(
+                        self._mq_service.consume(
+                            self.dispatch,
+                            queue_name=self.queue_name,
+                            routing_key=None,
+                            concurrency=1,
+                            exclusive=True,
+                        )
+                    ),
+                ]
+                # a failed binding restarts the subscription as well
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Chat stream subscription failed")
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.sleep(self.retry_interval)
+
+    async def stop(self):
+        """
+        Stop the subscription.
+        """
+        if self._consumer is not None:
+            self._consumer.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._consumer
+            self._consumer = None
+        if self._mq_service is not None:
+            await self._mq_service.close()
+            self._mq_service = None
@@ -0,0 +1,164 @@
+"""
+Payload codecs of the chat message exchange.
+
+A chat message payload is a dict with ``id``, ``chat_id``, ``user_id``
+(UUIDs), ``content`` (str) and ``created_at`` (aware datetime). Codecs are
+picked by name when publishing and by the AMQP ``content_type`` when
+consuming, so consumers decode whatever a publisher has sent.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict
+from uuid import UUID
+
+Payload = Dict[str, Any]
+
+FIELDS = ("id", "chat_id", "user_id", "content", "created_at")
+
+
+class MessageCodec:
+    """
+    Base class of the payload codecs.
+    """
+
+    name: str = ""
+    content_type: str = ""
+
+    def encode(self, payload: Payload) -> bytes:
+        """
+        Encode a payload to a message body.
+        """
+        raise NotImplementedError
+
+    def decode(self, body: bytes) -> Payload:
+        """
+        Decode a message body to a payload.
+        """
+        raise NotImplementedError
+
+
+def _from_text(data: Dict[str, Any]) -> Payload:
+    return {
+        "id": UUID(data["id"]),
+        "chat_id": UUID(data["chat_id"]),
+        "user_id": UUID(data["user_id"]),
+        "content": data["content"],
+        "created_at": datetime.fromisoformat(data["created_at"]),
+    }
+
+
+class JsonCodec(MessageCodec):
+    """
+    JSON object with UUIDs and the timestamp as strings (stdlib ``json``).
+    """
+
+    name = "json"
+    content_type = "application/json"
+
+    def encode(self, payload: Payload) -> bytes:
+        return json.dumps(
+            {
+                "id": str(payload["id"]),
+                "chat_id": str(payload["chat_id"]),
+                "user_id": str(payload["user_id"]),
+                "content": payload["content"],
+                "created_at": payload["created_at"].isoformat(),
+            },
+            separators=(",", ":"),
+        ).encode()
+
+    def decode(self, body: bytes) -> Payload:
+        return _from_text(json.loads(body))
+
+
+class OrjsonCodec(MessageCodec):
+    """
+    The same JSON object as :class:`JsonCodec`, encoded with ``orjson``.
+    """
+
+    name = "orjson"
+    content_type = "application/json"
+
+    def __init__(self):
+        import orjson  # pylint: disable=import-outside-toplevel
+
+        self._orjson = orjson
+
+    def encode(self, payload: Payload) -> bytes:
+        # orjson writes UUIDs and datetimes natively
+        return self._orjson.dumps({field: payload[field] for field in FIELDS})
+
+    def decode(self, body: bytes) -> Payload:
+        return _from_text(self._orjson.loads(body))
+
+
+class MsgpackCodec(MessageCodec):
+    """
+    MessagePack array ``[id, chat_id, user_id, content, created_at]``.
+
+    UUIDs are 16 raw bytes, the timestamp is a msgpack Timestamp.
+    """
+
+    name = "msgpack"
+    content_type = "application/msgpack"
+
+    def __init__(self):
+        import msgpack  # pylint: disable=import-outside-toplevel
+
+        self._packer = msgpack.Packer(datetime=True)
+        self._msgpack = msgpack
+
+    def encode(self, payload: Payload) -> bytes:
+        return self._packer.pack(
+            [
+                payload["id"].bytes,
+                payload["chat_id"].bytes,
+                payload["user_id"].bytes,
+                payload["content"],
+                payload["created_at"],
+            ]
+        )
+
+    def decode(self, body: bytes) -> Payload:
+        message_id, chat_id, user_id, content, created_at = self._msgpack.unpackb(
+            body, timestamp=3
+        )
+        return {
+            "id": UUID(bytes=message_id),
+            "chat_id": UUID(bytes=chat_id),
+            "user_id": UUID(bytes=user_id),
+            "content": content,
+            "created_at": created_at,
+        }
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec, OrjsonCodec, MsgpackCodec)}
+DECODERS = {
+    JsonCodec.content_type: JsonCodec,
+    MsgpackCodec.content_type: MsgpackCodec,
+}
+
+
+def get_codec(name: str) -> MessageCodec:
+    """
+    Get a codec by name.
+
+    :param name: ``json``, ``orjson`` or ``msgpack``
+    """
+    try:
+        return CODECS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown message codec: {name}") from None
+
+
+def get_decoder(content_type: str) -> MessageCodec:
+    """
+    Get a codec decoding a content type.
+
+    :param content_type: AMQP content type of the message
+    """
+    try:
+        return DECODERS[content_type]()
+    except KeyError:
+        raise ValueError(f"Unsupported message content type: {content_type}") from None
@@ -0,0 +1,185 @@
+"""
+Concurrent RabbitMQ consumer with batched acknowledgements.
+
+Deliveries are handled by a pool of worker tasks, so a slow handler does
+not hold the next messages. Handled messages are acknowledged in bulk
+with ``multiple=True`` once every older delivery has been handled as well.
+"""
+
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from aio_pika.abc import AbstractIncomingMessage, AbstractQueue
+
+from app.services.transports.base import RequeueMessage
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[AbstractIncomingMessage], Awaitable[None]]
+
+
+class DeliveryTracker:
+    """
+    Tracks which deliveries of a channel were handled.
+
+    Delivery tags are sequential per channel. ``watermark`` is the highest
+    tag such that every delivery up to it has been handled, acking the
+    latest successfully handled message below it with ``multiple=True``
+    settles all of them in one frame. Rejected messages are settled
+    individually and only move the watermark.
+    """
+
+    def __init__(self, channel: Any = None):
+        """
+        Initialize the tracker.
+
+        :param channel: Channel the delivery tags belong to
+        """
+        self.channel = channel
+        self.watermark = 0
+        self.pending = 0
+        self._done: Set[int] = set()
+        self._handled: Dict[int, AbstractIncomingMessage] = {}
+        self._last_handled: Optional[AbstractIncomingMessage] = None
+
+    def done(self, message: AbstractIncomingMessage, handled: bool = True):
+        """
+        Mark a delivery as finished.
+
+        :param message: Finished delivery
+        :param handled: False if the message has been rejected already
+        """
+        tag = message.delivery_tag
+        self._done.add(tag)
+        if handled:
+            self._handled[tag] = message
+        while self.watermark + 1 in self._done:
+            self.watermark += 1
+            self._done.discard(self.watermark)
+            handled_message = self._handled.pop(self.watermark, None)
+            if handled_message is not None:
+                self._last_handled = handled_message
+                self.pending += 1
+
+    def take(self) -> Optional[AbstractIncomingMessage]:
+        """
+        Take the message to ack with ``multiple=True``, None if nothing is pending.
+        """
+        message, self._last_handled = self._last_handled, None
+        self.pending = 0
+        return message
+
+
+class MessageConsumer:
+    """
+    Consumes a queue with a pool of handler tasks.
+
+    The number of unacked deliveries is bounded by the channel prefetch
+    (QoS), which has to be set before ``run``. An ordered consumer gives
+    every handler task its own share of the routing keys, so messages with
+    the same routing key (of the same chat) are handled one at a time in
+    delivery order.
+    """
+
+    def __init__(
+        self,
+        queue: AbstractQueue,
+        handler: MessageHandler,
+        concurrency: int = 10,
+        ack_batch: int = 50,
+        ack_interval: float = 0.2,
+        ordered: bool = False,
+    ):
+        """
+        Initialize the consumer.
+
+        :param queue: Queue to consume
+        :param handler: Coroutine called with every message
+        :param concurrency: Number of handler tasks
+        :param ack_batch: Handled messages that trigger an ack
+        :param ack_interval: Max seconds a handled message waits for its ack
+        :param ordered: Keep the order of the messages per routing key
+        """
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.ack_batch = ack_batch
+        self.ack_interval = ack_interval
+        self.tracker = DeliveryTracker()
+        self._jobs: List[asyncio.Queue] = [
+            asyncio.Queue() for _ in range(concurrency if ordered else 1)
+        ]
+        self._ack_lock = asyncio.Lock()
+
+    async def _on_message(self, message: AbstractIncomingMessage):
+        if message.channel is not self.tracker.channel:
+            # a new (reconnected) channel numbers the deliveries from 1 again,
+            # unacked deliveries of the old one are redelivered by the broker
+            self.tracker = DeliveryTracker(message.channel)
+        jobs = self._jobs[hash(message.routing_key) % len(self._jobs)]
+        jobs.put_nowait((message, self.tracker))
+
+    async def _work(self, jobs: asyncio.Queue):
+        while True:
+            job: Tuple[AbstractIncomingMessage, DeliveryTracker] = await jobs.get()
+            message, tracker = job
+            try:
+                handled = True
+                try:
+                    await self.handler(message)
+                except RequeueMessage:
+                    handled = False
+                    with suppress(Exception):
+                        await message.reject(requeue=True)
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Failed to handle message %s", message.message_id)
+                    handled = False
+                    with suppress(Exception):
+                        await message.reject(requeue=False)
+                tracker.done(message, handled)
+                if tracker is self.tracker and tracker.pending >= self.ack_batch:
+                    await self.flush()
+            finally:
+                jobs.task_done()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.ack_interval)
+            await self.flush()
+
+    async def flush(self):
+        """
+        Ack the handled messages below the watermark in one frame.
+        """
+        async with self._ack_lock:
+            message = self.tracker.take()
+            if message is None:
+                return
+            try:
+                await message.ack(multiple=True)
+            except Exception:  # pylint: disable=broad-except
+                # the channel is gone, the broker redelivers the messages
+                logger.exception("Failed to ack messages up to %s", message.delivery_tag)
+
+    async def run(self):
+        """
+        Consume until cancelled, then finish the received messages and ack them.
+        """
+        tasks: List[asyncio.Task] = [
+            asyncio.create_task(self._work(self._jobs[worker % len(self._jobs)]))
+            for worker in range(self.concurrency)
+        ]
+        tasks.append(asyncio.create_task(self._flush_periodically()))
+        consumer_tag = await self.queue.consume(self._on_message)
+        try:
+            await asyncio.Future()
+        finally:
+            with suppress(Exception):
+                await self.queue.cancel(consumer_tag)
+            await asyncio.gather(*(jobs.join() for jobs in self._jobs))
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.flush()
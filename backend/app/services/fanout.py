@@ -0,0 +1,272 @@
+"""
+In-process fan-out of chat messages to their subscribers.
+
+A hub maps chat IDs to subscriptions. A published message is serialized
+once and the same :class:`Message`, with the frames derived from it, is
+queued to every subscription of the chat. Every subscription has a bounded
+queue: a subscriber that doesn't keep up either loses its oldest messages
+(``drop_oldest``) or is evicted (``disconnect``), it can't slow the others
+down or hold an unbounded amount of memory.
+"""
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, Literal, Optional, Set
+from uuid import UUID
+
+from app.services.codecs import Payload
+
+OverflowPolicy = Literal["drop_oldest", "disconnect"]
+
+
+class SubscriptionClosed(Exception):
+    """Raised when reading from a closed or evicted subscription."""
+
+    pass
+
+
+class Message:
+    """
+    Message shared by all the subscribers of a chat.
+
+    :attr payload: Decoded chat message
+    :attr text: Serialized message
+    """
+
+    __slots__ = ("payload", "text", "_data", "_frames")
+
+    def __init__(self, payload: Payload, text: str):
+        self.payload = payload
+        self.text = text
+        self._data: Optional[bytes] = None
+        self._frames: Optional[Dict[str, bytes]] = None
+
+    @property
+    def data(self) -> bytes:
+        """
+        UTF-8 encoded text, encoded once.
+        """
+        if self._data is None:
+            self._data = self.text.encode()
+        return self._data
+
+    def frame(self, name: str, build: Callable[["Message"], bytes]) -> bytes:
+        """
+        Get a frame derived from the message, built once for all the subscribers.
+
+        :param name: Name of the frame format
+        :param build: Builds the frame
+        """
+        if self._frames is None:
+            self._frames = {}
+        frame = self._frames.get(name)
+        if frame is None:
+            frame = self._frames[name] = build(self)
+        return frame
+
+
+class Subscription:
+    """
+    Bounded queue of the messages of a chat for one subscriber.
+    """
+
+    __slots__ = (
+        "chat_id",
+        "max_pending",
+        "policy",
+        "pending",
+        "dropped",
+        "evicted",
+        "closed",
+        "_notify",
+        "_waiter",
+        "_hub",
+    )
+
+    def __init__(
+        self,
+        hub: "FanoutHub",
+        chat_id: UUID,
+        max_pending: int,
+        policy: OverflowPolicy,
+        notify: Optional[Callable[[], None]] = None,
+    ):
+        """
+        :param hub: Hub of the subscription
+        :param chat_id: UUID of the chat
+        :param max_pending: Max messages waiting to be read
+        :param policy: What to do when ``max_pending`` messages are waiting
+        :param notify: Called when a message is queued to an empty queue or
+            the subscription is evicted, must not block
+        """
+        self.chat_id = chat_id
+        self.max_pending = max_pending
+        self.policy = policy
+        self.pending: Deque[Message] = deque()
+        self.dropped = 0
+        self.evicted = False
+        self.closed = False
+        self._notify = notify
+        self._waiter: Optional[asyncio.Future] = None
+        self._hub = hub
+
+    def push(self, message: Message) -> bool:
+        """
+        Queue a message.
+
+        :return: False if the subscription was evicted instead
+        """
+        if len(self.pending) >= self.max_pending:
+            if self.policy == "disconnect":
+                self.evicted = True
+                self.close()
+                return False
+            self.pending.popleft()
+            self.dropped += 1
+            self._hub.stats.dropped += 1
+        self.pending.append(message)
+        if len(self.pending) == 1:
+            self._wake()
+        return True
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+        if self._notify is not None:
+            self._notify()
+
+    def get_nowait(self) -> Optional[Message]:
+        """
+        Get the oldest message, None if there is none.
+        """
+        return self.pending.popleft() if self.pending else None
+
+    async def get(self) -> Message:
+        """
+        Wait for the oldest message.
+
+        :raises SubscriptionClosed: If the subscription is closed
+        """
+        while not self.pending:
+            if self.closed:
+                raise SubscriptionClosed()
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+        return self.pending.popleft()
+
+    def close(self):
+        """
+        Unsubscribe, waiting messages are discarded.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        self.pending.clear()
+        self._hub.unsubscribe(self)
+        self._wake()
+
+
+@dataclass
+class HubStats:
+    """
+    Counters of a fan-out hub.
+    """
+
+    published: int = 0
+    delivered: int = 0
+    dropped: int = 0
+    evicted: int = 0
+
+
+class FanoutHub:
+    """
+    Registry of the subscriptions of the chats.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[Payload], str],
+        max_pending: int = 100,
+        policy: OverflowPolicy = "drop_oldest",
+    ):
+        """
+        Initialize the hub.
+
+        :param encode: Serializes a message for the subscribers
+        :param max_pending: Default max messages waiting per subscription
+        :param policy: Default policy for the subscribers that don't keep up
+        """
+        self.encode = encode
+        self.max_pending = max_pending
+        self.policy = policy
+        self.subscriptions: Dict[UUID, Set[Subscription]] = {}
+        self.stats = HubStats()
+
+    @property
+    def connections(self) -> int:
+        """
+        Number of subscriptions.
+        """
+        return sum(len(subscriptions) for subscriptions in self.subscriptions.values())
+
+    def subscribe(
+        self,
+        chat_id: UUID,
+        max_pending: Optional[int] = None,
+        policy: Optional[OverflowPolicy] = None,
+        notify: Optional[Callable[[], None]] = None,
+    ) -> Subscription:
+        """
+        Subscribe to the new messages of a chat.
+
+        :param chat_id: UUID of the chat
+        :param max_pending: Max messages waiting to be read, the hub default if None
+        :param policy: Policy when the subscriber doesn't keep up, the hub default if None
+        :param notify: Called when messages are ready or the subscription is evicted
+        """
+        subscription = Subscription(
+            self, chat_id, max_pending or self.max_pending, policy or self.policy, notify
+        )
+        self.subscriptions.setdefault(chat_id, set()).add(subscription)
+        return subscription
+
+    async def listen(self, chat_id: UUID, **kwargs) -> Subscription:
+        """
+        Subscribe to a chat once its messages reach the hub, right away here.
+
+        :param chat_id: UUID of the chat
+        :param kwargs: Options of the subscription, see ``subscribe``
+        """
+        return self.subscribe(chat_id, **kwargs)
+
+    def unsubscribe(self, subscription: Subscription):
+        """
+        Remove a subscription from the hub.
+        """
+        subscriptions = self.subscriptions.get(subscription.chat_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.subscriptions[subscription.chat_id]
+
+    def publish(self, payload: Payload) -> Optional[Message]:
+        """
+        Queue a message to the subscriptions of its chat.
+
+        :return: The shared message, None if the chat has no subscribers
+        """
+        subscriptions = self.subscriptions.get(payload["chat_id"])
+        if not subscriptions:
+            return None
+        message = Message(payload, self.encode(payload))
+        self.stats.published += 1
+        for subscription in list(subscriptions):
+            if subscription.push(message):
+                self.stats.delivered += 1
+            else:
+                self.stats.evicted += 1
+        return message
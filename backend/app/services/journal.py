@@ -0,0 +1,352 @@
+"""
+Segmented append-only journal on local disk.
+
+Records are appended to preallocated segment files (``<id>.seg``) written
+through a memory map, or with plain writes where the file can't be
+mapped. ``append`` returns once the records are flushed to disk (msync or
+fsync). Every record is stored as ``<length><crc32><data>``, a zero
+length marks the end of the written part of a segment and a record with a
+bad checksum (torn by a crash) ends its segment as well.
+
+Records are read in order from a checkpoint (``checkpoint``) that is
+moved forward with ``commit``, fully read segments are deleted. After a
+restart the last segment is sealed and appends go to a new one.
+
+A journal is used by one process at a time, it holds an exclusive lock on
+its directory. Processes sharing a directory take a slot of their own
+with :func:`open_journal_slot`.
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+HEADER = struct.Struct("<II")
+
+
+class Position(NamedTuple):
+    """
+    Position in the journal, the segment ID and the offset in it.
+    """
+
+    segment: int
+    offset: int
+
+
+class JournalLocked(OSError):
+    """
+    The journal directory is used by another process.
+    """
+
+
+class Segment:
+    """
+    Preallocated segment file.
+    """
+
+    def __init__(self, path: str, size: int):
+        """
+        Open a segment, the file is created with ``size`` zero bytes if missing.
+
+        :param path: Path of the segment file
+        :param size: Size of a new segment file
+        """
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size == 0:
+            os.ftruncate(self._fd, size)
+        self.size = os.fstat(self._fd).st_size
+        self._map: Optional[mmap.mmap] = None
+        try:
+            self._map = mmap.mmap(self._fd, self.size)
+        except (OSError, ValueError):
+            # e.g. a file system without shared mappings, fall back to writes
+            self._map = None
+
+    def write(self, offset: int, data: bytes):
+        """
+        Write bytes at an offset, not flushed.
+        """
+        if self._map is not None:
+            self._map[offset : offset + len(data)] = data
+        else:
+            os.pwrite(self._fd, data, offset)
+
+    def read(self, offset: int, length: int) -> bytes:
+        """
+        Read bytes at an offset.
+        """
+        if self._map is not None:
+            return self._map[offset : offset + length]
+        return os.pread(self._fd, length, offset)
+
+    def flush(self, start: int = 0, end: Optional[int] = None):
+        """
+        Flush the bytes written in a range to disk.
+        """
+        if self._map is not None:
+            # msync needs a page aligned start
+            start -= start % mmap.PAGESIZE
+            end = self.size if end is None else end
+            self._map.flush(start, end - start)
+        else:
+            os.fsync(self._fd)
+
+    def scan(self, offset: int = 0) -> Tuple[List[Tuple[int, bytes]], int]:
+        """
+        Read the valid records from an offset.
+
+        :return: ``(offset, data)`` of the records and the end of the last one
+        """
+        records = []
+        while offset + HEADER.size <= self.size:
+            length, crc = HEADER.unpack(self.read(offset, HEADER.size))
+            end = offset + HEADER.size + length
+            if length == 0 or end > self.size:
+                break
+            data = self.read(offset + HEADER.size, length)
+            if zlib.crc32(data) != crc:
+                break
+            records.append((offset, data))
+            offset = end
+        return records, offset
+
+    def close(self):
+        """
+        Unmap and close the file.
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        os.close(self._fd)
+
+
+class Journal:
+    """
+    Append-only journal of byte records.
+
+    ``append`` and the reads can run in different threads.
+    """
+
+    def __init__(self, directory: str, segment_size: int = 64 * 1024 * 1024):
+        """
+        Open the journal in a directory, created if missing.
+
+        :param directory: Directory of the segment files
+        :param segment_size: Size of a segment file, larger records get a
+            segment of their own
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # segments and checkpoint are rewritten and deleted, never shared
+        self._lock_fd: Optional[int] = os.open(
+            os.path.join(directory, "lock"), os.O_RDWR | os.O_CREAT, 0o600
+        )
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self._lock_fd)
+            raise JournalLocked(f"Journal {directory} is used by another process")
+
+        self._segments = sorted(
+            int(name[:-4]) for name in os.listdir(directory) if name.endswith(".seg")
+        )
+        self._checkpoint = self._load_checkpoint()
+        # left behind by a crash between a commit and the deletion
+        for segment in self._segments:
+            if segment < self._checkpoint.segment:
+                os.remove(self._path(segment))
+        self._segments = [
+            segment for segment in self._segments if segment >= self._checkpoint.segment
+        ]
+        # records appended and not committed
+        self.pending = 0
+        for segment in self._segments:
+            with self._open(segment) as opened:
+                start = self._checkpoint.offset if segment == self._checkpoint.segment else 0
+                self.pending += len(opened.scan(start)[0])
+
+        # the last segment may end with a torn record, append to a new one
+        self._writer: Optional[Segment] = None
+        self._write_offset = 0
+        # end of the durable records of the segment being written
+        self._committed = Position(0, 0)
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"{segment:020d}.seg")
+
+    def _open(self, segment: int, size: Optional[int] = None) -> "_Opened":
+        return _Opened(Segment(self._path(segment), size or self.segment_size))
+
+    def _load_checkpoint(self) -> Position:
+        try:
+            with open(os.path.join(self.directory, "checkpoint"), encoding="ascii") as file:
+                segment, offset = file.read().split()
+            return Position(int(segment), int(offset))
+        except (OSError, ValueError):
+            return Position(self._segments[0] if self._segments else 0, 0)
+
+    def _save_checkpoint(self, position: Position):
+        path = os.path.join(self.directory, "checkpoint")
+        with open(f"{path}.tmp", "w", encoding="ascii") as file:
+            file.write(f"{position.segment} {position.offset}")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(f"{path}.tmp", path)
+
+    def _sync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _roll(self, size: int):
+        if self._writer is not None:
+            self._writer.flush(0, self._write_offset)
+            self._writer.close()
+        segment = max(self._segments[-1] if self._segments else 0, self._checkpoint.segment) + 1
+        self._writer = Segment(self._path(segment), max(self.segment_size, size))
+        self._sync_directory()
+        self._segments.append(segment)
+        self._write_offset = 0
+
+    def append(self, records: Sequence[bytes]):
+        """
+        Append records and flush them to disk.
+
+        :param records: Records in order
+        """
+        if not records:
+            return
+        with self._lock:
+            start = self._write_offset
+            for data in records:
+                size = HEADER.size + len(data)
+                if self._writer is None or self._write_offset + size > self._writer.size:
+                    self._roll(size)
+                    start = 0
+                self._writer.write(
+                    self._write_offset, HEADER.pack(len(data), zlib.crc32(data)) + data
+                )
+                self._write_offset += size
+            self._writer.flush(start, self._write_offset)
+            self._committed = Position(self._segments[-1], self._write_offset)
+            self.pending += len(records)
+
+    def read(self, limit: int) -> Tuple[List[bytes], Position]:
+        """
+        Read the oldest records after the checkpoint.
+
+        :param limit: Max number of records
+        :return: The records and the position after the last one, to ``commit``
+        """
+        with self._lock:
+            segments = list(self._segments)
+            committed = self._committed
+        position = self._checkpoint
+        records: List[bytes] = []
+        for segment in segments:
+            if segment < position.segment:
+                continue
+            offset = position.offset if segment == position.segment else 0
+            with self._open(segment) as opened:
+                found, end = opened.scan(offset)
+            if segment == committed.segment:
+                # records being appended right now are not read yet
+                found = [(start, data) for start, data in found if start < committed.offset]
+                end = min(end, committed.offset)
+            for start, data in found[: limit - len(records)]:
+                records.append(data)
+                end = start + HEADER.size + len(data)
+            position = Position(segment, end)
+            if len(records) >= limit:
+                break
+        return records, position
+
+    def commit(self, position: Position, count: int):
+        """
+        Move the checkpoint after read records, delete the read segments.
+
+        :param position: Position returned by ``read``
+        :param count: Number of records read up to the position
+        """
+        self._save_checkpoint(position)
+        with self._lock:
+            self._checkpoint = position
+            self.pending = max(0, self.pending - count)
+            done = [segment for segment in self._segments if segment < position.segment]
+            self._segments = [segment for segment in self._segments if segment >= position.segment]
+        for segment in done:
+            os.remove(self._path(segment))
+
+    def close(self):
+        """
+        Close the segment being written and release the directory.
+        """
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+
+def open_journal_slot(directory: str, segment_size: int = 64 * 1024 * 1024) -> Journal:
+    """
+    Open a journal in a free slot (``<directory>/<n>``) of a directory
+    shared by several processes.
+
+    A free slot holding records is preferred, so the journal of a stopped
+    process is replayed by the next one.
+
+    :param directory: Directory of the slots, created if missing
+    :param segment_size: Size of a segment file
+    """
+    os.makedirs(directory, exist_ok=True)
+    slots = sorted(int(name) for name in os.listdir(directory) if name.isdigit())
+    empty: Optional[Journal] = None
+    for slot in slots:
+        try:
+            journal = Journal(os.path.join(directory, str(slot)), segment_size)
+        except JournalLocked:
+            continue
+        if journal.pending:
+            if empty is not None:
+                empty.close()
+            return journal
+        if empty is None:
+            empty = journal
+        else:
+            journal.close()
+    if empty is not None:
+        return empty
+    slot = slots[-1] + 1 if slots else 0
+    while True:
+        try:
+            return Journal(os.path.join(directory, str(slot)), segment_size)
+        except JournalLocked:
+            # taken by a process starting at the same time
+            slot += 1
+
+
+class _Opened:
+    """
+    Context manager closing a segment opened for reading.
+    """
+
+    def __init__(self, segment: Segment):
+        self.segment = segment
+
+    def __enter__(self) -> Segment:
+        return self.segment
+
+    def __exit__(self, *exc_info):
+        self.segment.close()
@@ -0,0 +1,226 @@
+"""
+Transactional outbox of the chat message exchange.
+
+A chat message and its encoded MQ message are written in one transaction,
+so the message is published if and only if it has been stored. Relays
+(``python -m app.workers.outbox_relay``) publish the outbox in batches and
+delete the published rows. They wake up on a NOTIFY sent by every commit
+that adds rows, and poll as a fallback.
+
+Delivery is at-least-once: a relay that fails between the publish and the
+commit of the delete publishes the batch again, consumers deduplicate by
+message ID. The messages of a partition are published by one relay at a
+time in outbox order, any number of relays share the partitions.
+
+With a publish buffer (MQ_JOURNAL_DIR) a relay keeps draining the outbox
+during a broker outage: a batch is deleted once it is journaled on the
+local disk of the relay, which publishes it when the broker is back.
+"""
+
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Optional, Sequence
+from uuid import UUID
+
+import asyncpg
+from sqlalchemy import Row
+
+from app.db.conn import AsyncSession, get_async_session
+from app.db.models.chat_message import ChatMessage
+from app.db.models.outbox import OutboxMessage
+from app.db.repos.message import MessageRepository
+from app.db.repos.outbox import OUTBOX_CHANNEL, OutboxRepository
+from app.services.message_queue import MessageQueueService
+from app.services.partitions import get_partition
+from app.services.publish_buffer import PublishBuffer
+from app.services.transports import Envelope, MessageTransport
+
+logger = logging.getLogger(__name__)
+
+
+async def create_message(
+    message_repo: MessageRepository,
+    mq_service: MessageQueueService,
+    chat_id: UUID,
+    user_id: UUID,
+    content: str,
+) -> ChatMessage:
+    """
+    Store a chat message and its MQ message in one transaction.
+
+    :param message_repo: Repository the message is written with
+    :param mq_service: Service encoding the MQ message
+    :param chat_id: UUID of the chat
+    :param user_id: UUID of the user
+    :param content: Message content
+    :return: The created message
+    """
+    payload = mq_service.build_payload(chat_id, user_id, content)
+    envelope = mq_service.encode_payload(payload)
+    return await message_repo.create_message(
+        chat_id,
+        user_id,
+        content,
+        message_id=payload["id"],
+        created_at=payload["created_at"],
+        outbox=[
+            OutboxMessage(
+                partition=get_partition(chat_id, mq_service.partitions),
+                routing_key=envelope.routing_key,
+                content_type=envelope.content_type,
+                message_id=envelope.message_id,
+                body=envelope.body,
+            )
+        ],
+    )
+
+
+def to_envelope(row: Row) -> Envelope:
+    """
+    Build the envelope of a claimed outbox row.
+    """
+    return Envelope(
+        body=row.body,
+        routing_key=row.routing_key,
+        content_type=row.content_type,
+        message_id=row.message_id,
+    )
+
+
+@dataclass
+class RelayStats:
+    """
+    Published batches and outbox to publish lag.
+    """
+
+    batches: int = 0
+    messages: int = 0
+    failed: int = 0
+    # lags of the recent messages in milliseconds, from the commit of the
+    # outbox row (database clock) to the publish confirm
+    lags: Deque[float] = field(default_factory=lambda: deque(maxlen=10000))
+
+    def observe(self, lags: Sequence[float]):
+        """
+        Record a published batch.
+
+        :param lags: Seconds each message spent in the outbox
+        """
+        self.batches += 1
+        self.messages += len(lags)
+        self.lags.extend(lag * 1000 for lag in lags)
+
+    def summary(self) -> str:
+        """
+        Format the stats as a short human readable summary.
+        """
+        if not self.batches:
+            return "no batches published"
+        ordered = sorted(self.lags)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return (
+            f"{self.messages} messages in {self.batches} batches "
+            f"({self.failed} failed), lag median={statistics.median(ordered):.2f}ms "
+            f"p99={p99:.2f}ms max={ordered[-1]:.2f}ms"
+        )
+
+
+class OutboxRelay:
+    """
+    Publishes the outbox with a few concurrent batch loops.
+    """
+
+    def __init__(
+        self,
+        transport: MessageTransport,
+        dsn: Optional[str] = None,
+        batch_size: int = 500,
+        concurrency: int = 4,
+        interval: float = 1.0,
+        session_factory: Callable[[], AsyncSession] = get_async_session,
+        buffer: Optional[PublishBuffer] = None,
+    ):
+        """
+        Initialize the relay.
+
+        :param transport: Transport the messages are published with, it
+            returns once they are confirmed
+        :param dsn: asyncpg connection string to LISTEN for new rows, poll only if None
+        :param batch_size: Max messages published per transaction
+        :param concurrency: Batches published at the same time
+        :param interval: Seconds between polls when no notification comes
+        :param session_factory: Factory of the sessions the outbox is read with
+        :param buffer: Buffer the messages are published through, a batch is
+            deleted once confirmed or journaled (see :mod:`app.services.publish_buffer`)
+        """
+        self.transport = transport
+        self.dsn = dsn
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.interval = interval
+        self.stats = RelayStats()
+        self._session_factory = session_factory
+        self.buffer = buffer
+        self._wake = asyncio.Event()
+
+    async def _publish(self, envelopes: Sequence[Envelope]):
+        if self.buffer is not None:
+            await self.buffer.put(envelopes)
+        else:
+            await self.transport.publish(envelopes)
+
+    async def relay_batch(self) -> int:
+        """
+        Publish one batch of the outbox and delete it.
+
+        :return: Number of published messages
+        """
+        async with self._session_factory() as session:
+            repo = OutboxRepository(session)
+            rows = await repo.claim(self.batch_size)
+            if not rows:
+                await session.rollback()
+                return 0
+            started = time.perf_counter()
+            await self._publish([to_envelope(row) for row in rows])
+            await repo.delete([row.id for row in rows])
+            elapsed = time.perf_counter() - started
+        self.stats.observe([float(row.age) + elapsed for row in rows])
+        return len(rows)
+
+    async def _loop(self):
+        while True:
+            # a notification during the batch starts the next one right away
+            self._wake.clear()
+            try:
+                published = await self.relay_batch()
+            except Exception:  # pylint: disable=broad-except
+                self.stats.failed += 1
+                logger.exception("Failed to relay an outbox batch")
+                await asyncio.sleep(self.interval)
+                continue
+            if published < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.interval)
+                except TimeoutError:
+                    pass
+
+    async def run(self):
+        """
+        Relay until cancelled.
+        """
+        connection: Optional[asyncpg.Connection] = None
+        if self.dsn is not None:
+            connection = await asyncpg.connect(self.dsn)
+            await connection.add_listener(OUTBOX_CHANNEL, lambda *args: self._wake.set())
+        try:
+            async with asyncio.TaskGroup() as loops:
+                for _ in range(self.concurrency):
+                    loops.create_task(self._loop())
+        finally:
+            if connection is not None:
+                await connection.close()
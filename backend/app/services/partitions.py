@@ -0,0 +1,63 @@
+"""
+Partitioning of the chat message stream.
+
+Chats are assigned to a fixed number of partitions by consistent hashing
+of the chat ID, the partition is the last word of the routing key
+(``<chat_id>.<partition>``). Every partition has its own durable queue
+with a single active consumer, so the messages of a chat are consumed in
+order while the partitions are spread over consumer processes.
+"""
+
+from typing import Set
+from uuid import UUID
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """
+    Jump consistent hash (Lamping & Veach).
+
+    Growing ``buckets`` from N to N+1 moves only 1/(N+1) of the keys, and
+    the result is the same in every process (unlike ``hash()``).
+
+    :param key: 64 bit key
+    :param buckets: Number of buckets
+    """
+    key &= 0xFFFFFFFFFFFFFFFF
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def get_partition(chat_id: UUID, partitions: int) -> int:
+    """
+    Get the partition of a chat.
+
+    :param chat_id: UUID of the chat
+    :param partitions: Number of partitions
+    """
+    return jump_hash(chat_id.int, partitions)
+
+
+def chat_routing_key(chat_id: UUID, partitions: int) -> str:
+    """
+    Routing key of the messages of a chat.
+    """
+    return f"{chat_id}.{get_partition(chat_id, partitions)}"
+
+
+def parse_partitions(value: str) -> Set[int]:
+    """
+    Parse a partition list like ``0-3,8,10``.
+    """
+    partitions: Set[int] = set()
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        partitions.update(range(int(first), int(last or first) + 1))
+    return partitions
+
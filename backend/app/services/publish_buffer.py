@@ -0,0 +1,287 @@
+"""
+Publish buffer that keeps publishers fast while the broker is down.
+
+Published messages wait in a bounded in-memory buffer that a background
+task sends to the transport in batches. A publisher returns once its
+messages are acknowledged, either confirmed by the broker or, when the
+broker fails or doesn't confirm within ``spill_after`` seconds (or the
+buffer is full), appended to a local :class:`app.services.journal.Journal`
+and flushed to disk. Publish latency stays bounded by ``spill_after``
+plus a disk flush during an outage, and an acknowledged message survives
+a crash.
+
+While the journal holds messages every new message is journaled too, so
+a replay task publishes the journal in order once the broker is back and
+the buffer then switches back to direct publishing. Delivery is
+at-least-once: a batch that timed out may have reached the broker too.
+"""
+
+import asyncio
+import json
+import logging
+import struct
+from collections import deque
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Deque, List, Sequence, Tuple
+
+from app.services.journal import Journal
+from app.services.transports import Envelope, MessageTransport
+
+logger = logging.getLogger(__name__)
+
+_HEADER_LENGTH = struct.Struct("<I")
+
+
+def encode_envelope(envelope: Envelope) -> bytes:
+    """
+    Serialize an envelope as a journal record.
+    """
+    header = json.dumps(
+        {
+            "k": envelope.routing_key,
+            "t": envelope.content_type,
+            "i": envelope.message_id,
+            "h": envelope.headers,
+        },
+        separators=(",", ":"),
+    ).encode()
+    return _HEADER_LENGTH.pack(len(header)) + header + envelope.body
+
+
+def decode_envelope(record: bytes) -> Envelope:
+    """
+    Deserialize a journal record.
+    """
+    (length,) = _HEADER_LENGTH.unpack_from(record)
+    header = json.loads(record[_HEADER_LENGTH.size : _HEADER_LENGTH.size + length])
+    return Envelope(
+        body=record[_HEADER_LENGTH.size + length :],
+        routing_key=header["k"],
+        content_type=header["t"],
+        message_id=header["i"],
+        headers=header["h"],
+    )
+
+
+@dataclass
+class BufferStats:
+    """
+    Counters of the publish buffer.
+    """
+
+    published: int = 0
+    spilled: int = 0
+    replayed: int = 0
+    failures: int = 0
+
+
+class PublishBuffer:
+    """
+    Bounded publish buffer spilling to a journal.
+    """
+
+    def __init__(
+        self,
+        transport: MessageTransport,
+        journal: Journal,
+        max_size: int = 10000,
+        batch_size: int = 256,
+        spill_after: float = 0.5,
+        retry_interval: float = 1.0,
+    ):
+        """
+        Initialize the buffer.
+
+        :param transport: Transport the messages are published with
+        :param journal: Journal the messages are spilled to
+        :param max_size: Max messages waiting in memory, the others are spilled
+        :param batch_size: Max messages published at once
+        :param spill_after: Seconds a publish may take before its messages are spilled
+        :param retry_interval: Seconds between replay attempts while the broker is down
+        """
+        self.transport = transport
+        self.journal = journal
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.spill_after = spill_after
+        self.retry_interval = retry_interval
+        self.stats = BufferStats()
+        self._pending: Deque[Tuple[Envelope, asyncio.Future]] = deque()
+        self._ready = asyncio.Event()
+        self._replay = asyncio.Event()
+        # the journal holds messages, new ones are appended after them
+        self._spilling = journal.pending > 0
+        self._journal_lock = asyncio.Lock()
+        # held while a batch is being published
+        self._publish_lock = asyncio.Lock()
+        self._spills: Deque[Tuple[Sequence[Envelope], asyncio.Future]] = deque()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def spilling(self) -> bool:
+        """
+        Whether messages go to the journal instead of the broker.
+        """
+        return self._spilling
+
+    async def put(self, envelopes: Sequence[Envelope]):
+        """
+        Publish messages, returns once they are confirmed or journaled.
+
+        :param envelopes: Messages in order
+        """
+        if not self._tasks:
+            await self.start()
+        if self._spilling:
+            await self._spill(envelopes)
+            return
+        if len(self._pending) + len(envelopes) > self.max_size:
+            # after the batch being published, it may still be spilled
+            async with self._publish_lock:
+                await self._spill(envelopes)
+            return
+        loop = asyncio.get_running_loop()
+        futures = []
+        for envelope in envelopes:
+            future = loop.create_future()
+            self._pending.append((envelope, future))
+            futures.append(future)
+        self._ready.set()
+        await asyncio.gather(*futures)
+
+    async def _spill(self, envelopes: Sequence[Envelope]):
+        # group commit: concurrent spills are appended with one disk flush
+        future = asyncio.get_running_loop().create_future()
+        self._spills.append((envelopes, future))
+        if not self._journal_lock.locked():
+            async with self._journal_lock:
+                while self._spills:
+                    await self._append_spills()
+        await future
+
+    async def _append_spills(self):
+        # messages still waiting in memory go first, the order is kept
+        waiting = list(self._pending)
+        self._pending.clear()
+        spills = list(self._spills)
+        self._spills.clear()
+        records = [encode_envelope(envelope) for envelope, _ in waiting]
+        for envelopes, _ in spills:
+            records.extend(encode_envelope(envelope) for envelope in envelopes)
+        try:
+            await asyncio.to_thread(self.journal.append, records)
+        except Exception as e:  # pylint: disable=broad-except
+            # the messages are not acknowledged, their publishers get the error
+            for _, future in waiting + spills:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        if not self._spilling:
+            logger.warning(
+                "Broker unavailable, spilling messages to %s", self.journal.directory
+            )
+        self._spilling = True
+        self.stats.spilled += len(records)
+        for _, future in waiting + spills:
+            if not future.done():
+                future.set_result(None)
+        self._replay.set()
+
+    async def _publish_pending(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            while self._pending and not self._spilling:
+                async with self._publish_lock:
+                    await self._publish_batch()
+
+    async def _publish_batch(self):
+        batch = [
+            self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))
+        ]
+        try:
+            await asyncio.wait_for(
+                self.transport.publish([envelope for envelope, _ in batch]),
+                self.spill_after,
+            )
+        except asyncio.CancelledError:
+            # stopped, the messages are journaled by ``stop``
+            self._pending.extendleft(reversed(batch))
+            raise
+        except Exception as e:  # pylint: disable=broad-except
+            self.stats.failures += 1
+            logger.warning("Publish failed (%r), spilling %s messages", e, len(batch))
+            # back in front of the waiting messages, spilled in order
+            self._pending.extendleft(reversed(batch))
+            await self._spill([])
+            return
+        self.stats.published += len(batch)
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    async def _replay_journal(self):
+        while True:
+            await self._replay.wait()
+            records, position = await asyncio.to_thread(self.journal.read, self.batch_size)
+            if not records:
+                async with self._journal_lock:
+                    # no append can start meanwhile, spills queued for the
+                    # lock are appended here or they would never be
+                    while True:
+                        while self._spills:
+                            await self._append_spills()
+                        records, position = await asyncio.to_thread(
+                            self.journal.read, self.batch_size
+                        )
+                        if records:
+                            break
+                        await asyncio.to_thread(self.journal.commit, position, 0)
+                        if not self._spills:
+                            self._spilling = False
+                            self._replay.clear()
+                            logger.info("Journal replayed, publishing directly again")
+                            break
+                if not records:
+                    continue
+            try:
+                await self.transport.publish([decode_envelope(record) for record in records])
+            except Exception:  # pylint: disable=broad-except
+                self.stats.failures += 1
+                logger.warning(
+                    "Broker still unavailable, %s messages journaled", self.journal.pending
+                )
+                await asyncio.sleep(self.retry_interval)
+                continue
+            await asyncio.to_thread(self.journal.commit, position, len(records))
+            self.stats.replayed += len(records)
+
+    async def start(self):
+        """
+        Start the publishing and replay tasks, a journal left by a previous
+        run is replayed.
+        """
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._publish_pending()),
+            asyncio.create_task(self._replay_journal()),
+        ]
+        if self._spilling:
+            logger.info("Replaying %s journaled messages", self.journal.pending)
+            self._replay.set()
+
+    async def stop(self):
+        """
+        Stop the tasks, messages still waiting in memory are journaled.
+        """
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+        if self._pending:
+            await self._spill([])
+        self.journal.close()
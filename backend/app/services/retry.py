@@ -0,0 +1,156 @@
+"""
+Retries and dead letters of failed chat messages.
+
+A message whose handler raises is acked and sent back to its queue after
+a delay growing exponentially with the attempts, so the consumer goes on
+with the next messages (of the same partition too) in the meantime. The
+attempt count travels in the ``x-attempts`` header. After
+``max_attempts``, or right away for a :class:`PermanentError`, the message
+is moved to a dead letter queue together with its last error, from which
+it can be replayed (``python -m app.workers.replay``).
+
+A retried message is handled after the messages published later, retries
+don't keep the order of a chat.
+"""
+
+import logging
+from dataclasses import dataclass, replace
+from datetime import UTC, datetime
+from typing import Optional
+
+from app.config import MessageQueueSettings, settings
+from app.services.transports import Envelope, EnvelopeHandler, MessageTransport
+
+logger = logging.getLogger(__name__)
+
+ATTEMPTS_HEADER = "x-attempts"
+ERROR_HEADER = "x-error"
+FAILED_AT_HEADER = "x-failed-at"
+QUEUE_HEADER = "x-original-queue"
+
+# errors longer than this are truncated in the header
+MAX_ERROR_LENGTH = 1000
+
+
+class PermanentError(Exception):
+    """Raised for a message that fails on every attempt, e.g. an undecodable one."""
+
+    pass
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff of the retries of a queue.
+
+    With the defaults a message is retried after 1s, 4s, 16s and 64s and
+    dead-lettered after the fifth failure.
+    """
+
+    max_attempts: int = 5
+    initial_delay: float = 1.0
+    multiplier: float = 4.0
+    max_delay: float = 600.0
+    # <queue>.dead by default
+    dead_letter_queue: Optional[str] = None
+
+    def delay(self, attempt: int) -> float:
+        """
+        Seconds before the next attempt.
+
+        :param attempt: Number of the failed attempt, starting at 1
+        """
+        return min(self.max_delay, self.initial_delay * self.multiplier ** (attempt - 1))
+
+    def get_dead_letter_queue(self, queue_name: str) -> str:
+        """
+        Name of the dead letter queue of a queue.
+        """
+        return self.dead_letter_queue or f"{queue_name}.dead"
+
+
+def get_retry_policy(mq: MessageQueueSettings = settings.mq) -> RetryPolicy:
+    """
+    Create the retry policy configured in the settings (MQ_RETRY_*).
+    """
+    return RetryPolicy(
+        max_attempts=mq.retry.attempts,
+        initial_delay=mq.retry.delay,
+        multiplier=mq.retry.multiplier,
+        max_delay=mq.retry.cap,
+    )
+
+
+def get_attempts(envelope: Envelope) -> int:
+    """
+    Number of failed attempts of a message.
+    """
+    return int(envelope.headers.get(ATTEMPTS_HEADER, 0))
+
+
+def mark_failed(envelope: Envelope, queue_name: str, error: Exception) -> Envelope:
+    """
+    Copy of a message with one more failed attempt in the headers.
+
+    :param envelope: Failed message
+    :param queue_name: Queue the message failed in
+    :param error: Exception raised by the handler
+    """
+    return replace(
+        envelope,
+        headers={
+            **envelope.headers,
+            ATTEMPTS_HEADER: get_attempts(envelope) + 1,
+            ERROR_HEADER: f"{type(error).__name__}: {error}"[:MAX_ERROR_LENGTH],
+            FAILED_AT_HEADER: datetime.now(UTC).isoformat(),
+            QUEUE_HEADER: queue_name,
+        },
+    )
+
+
+def with_retries(
+    handler: EnvelopeHandler,
+    transport: MessageTransport,
+    queue_name: str,
+    policy: RetryPolicy,
+) -> EnvelopeHandler:
+    """
+    Wrap a handler to retry and dead-letter the messages it fails.
+
+    The wrapped handler only raises if the failed message can't be sent
+    on, the transport rejects it then.
+
+    :param handler: Handler of the messages of the queue
+    :param transport: Transport the queue belongs to
+    :param queue_name: Durable queue the handler consumes
+    :param policy: Retry policy
+    """
+    dead_letter_queue = policy.get_dead_letter_queue(queue_name)
+
+    async def on_message(envelope: Envelope):
+        try:
+            await handler(envelope)
+        except Exception as e:  # pylint: disable=broad-except
+            failed = mark_failed(envelope, queue_name, e)
+            attempts = get_attempts(failed)
+            if isinstance(e, PermanentError) or attempts >= policy.max_attempts:
+                logger.warning(
+                    "Message %s failed %s times, moved to %s: %s",
+                    envelope.message_id,
+                    attempts,
+                    dead_letter_queue,
+                    failed.headers[ERROR_HEADER],
+                )
+                await transport.send(dead_letter_queue, [failed])
+            else:
+                delay = policy.delay(attempts)
+                logger.info(
+                    "Message %s failed (attempt %s), retry in %ss: %s",
+                    envelope.message_id,
+                    attempts,
+                    delay,
+                    failed.headers[ERROR_HEADER],
+                )
+                await transport.send(queue_name, [failed], delay)
+
+    return on_message
@@ -0,0 +1,45 @@
+"""
+Message queue transports.
+"""
+
+from app.config import MessageQueueSettings, settings
+
+from .base import (Envelope, EnvelopeHandler, MessageTransport, RequeueMessage,
+                   topic_matches)
+
+
+def get_transport(
+    exchange_name: str = "chat_messages",
+    mq: MessageQueueSettings = settings.mq,
+) -> MessageTransport:
+    """
+    Create the transport selected in the settings (MQ_TRANSPORT).
+
+    Backend modules are imported on demand, so e.g. the in-process
+    transport doesn't need aio_pika.
+
+    :param exchange_name: Name of the exchange
+    :param mq: Message queue settings
+    """
+    if mq.transport == "memory":
+        from .memory import MemoryTransport  # pylint: disable=import-outside-toplevel
+
+        return MemoryTransport(exchange_name, queue_size=mq.capacity)
+    if mq.transport == "postgres":
+        from .postgres import PostgresTransport  # pylint: disable=import-outside-toplevel
+
+        return PostgresTransport(settings.database.dsn, exchange_name)
+
+    from .rabbitmq import RabbitMQTransport  # pylint: disable=import-outside-toplevel
+
+    return RabbitMQTransport(str(settings.rabbitmq.url), exchange_name)
+
+
+__all__ = [
+    "Envelope",
+    "EnvelopeHandler",
+    "MessageTransport",
+    "RequeueMessage",
+    "get_transport",
+    "topic_matches",
+]
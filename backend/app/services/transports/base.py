@@ -0,0 +1,236 @@
+"""
+Transport interface of the message queue service.
+
+A transport moves encoded messages (:class:`Envelope`) from publishers to
+consumers with topic routing. Payload encoding stays in
+:class:`app.services.message_queue.MessageQueueService`.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Envelope:
+    """
+    Encoded message as it travels through a transport.
+    """
+
+    body: bytes
+    routing_key: str
+    content_type: str
+    message_id: Optional[str] = None
+    headers: Dict[str, Any] = field(default_factory=dict)
+
+
+EnvelopeHandler = Callable[[Envelope], Awaitable[None]]
+
+
+class RequeueMessage(Exception):
+    """Raised by a handler to give the message back to its queue, not handled."""
+
+    pass
+
+
+def topic_matches(pattern: str, routing_key: str) -> bool:
+    """
+    Check a routing key against an AMQP topic pattern.
+
+    Words are separated by dots, ``*`` matches exactly one word and ``#``
+    zero or more words.
+
+    :param pattern: Binding pattern, e.g. ``chat.*`` or ``#``
+    :param routing_key: Routing key of a message
+    """
+    return _match_words(pattern.split("."), routing_key.split("."))
+
+
+def _match_words(pattern: List[str], words: List[str]) -> bool:
+    if not pattern:
+        return not words
+    if pattern[0] == "#":
+        return _match_words(pattern[1:], words) or (
+            bool(words) and _match_words(pattern, words[1:])
+        )
+    if not words:
+        return False
+    return pattern[0] in ("*", words[0]) and _match_words(pattern[1:], words[1:])
+
+
+class MessageTransport:
+    """
+    Base class of the transports.
+
+    Publishing returns once the messages are as durable as the transport
+    makes them. Consuming calls the handler for every message, a handler
+    that returns acks the message, one that raises rejects it, one that
+    raises :class:`RequeueMessage` puts it back if the transport can.
+    """
+
+    async def connect(self):
+        """
+        Connect to the backend, called before every publish and consume.
+        """
+
+    async def close(self):
+        """
+        Release the backend connections.
+        """
+
+    async def publish(self, envelopes: Sequence[Envelope]):
+        """
+        Publish messages in order.
+
+        :param envelopes: Messages to publish
+        """
+        raise NotImplementedError
+
+    async def declare(self, queue_name: str, exclusive: bool = False):
+        """
+        Declare a durable queue without bindings, e.g. for dead letters.
+
+        :param queue_name: Name of the queue
+        :param exclusive: The queue belongs to this process and is deleted
+            with its connection (a per-node queue) instead of durable
+        """
+
+    async def bind(self, queue_name: str, routing_key: str):
+        """
+        Bind a declared queue to the exchange.
+
+        :param queue_name: Name of the queue
+        :param routing_key: Routing key pattern
+        """
+        raise NotImplementedError
+
+    async def unbind(self, queue_name: str, routing_key: str):
+        """
+        Remove a binding added with ``bind``.
+
+        :param queue_name: Name of the queue
+        :param routing_key: Routing key pattern
+        """
+        raise NotImplementedError
+
+    async def send(self, queue_name: str, envelopes: Sequence[Envelope], delay: float = 0):
+        """
+        Put messages into a named queue directly, bypassing the routing.
+
+        The queue has to exist (declared by a consumer or with ``declare``).
+        Used for retries and dead letters, the routing key of the messages
+        is kept.
+
+        :param queue_name: Name of the durable queue
+        :param envelopes: Messages to send
+        :param delay: Seconds before the messages are delivered
+        """
+        raise NotImplementedError
+
+    async def consume(
+        self,
+        handler: EnvelopeHandler,
+        queue_name: Optional[str] = None,
+        routing_key: Optional[str] = "#",
+        prefetch: int = 100,
+        concurrency: int = 10,
+        ack_batch: int = 50,
+        ack_interval: float = 0.2,
+        single_active: bool = False,
+        ordered: bool = False,
+        exclusive: bool = False,
+    ):
+        """
+        Consume messages with concurrent handlers until cancelled.
+
+        :param handler: Coroutine called with every message
+        :param queue_name: Durable queue name shared by consumers, None for a temporary queue
+        :param routing_key: Routing key pattern the queue is bound with, None
+            to leave it unbound (it only receives the messages sent to it)
+        :param prefetch: Max unacked messages held by this consumer
+        :param concurrency: Number of handler tasks
+        :param ack_batch: Handled messages acked at once (if the transport batches acks)
+        :param ack_interval: Max seconds a handled message waits for its ack (same)
+        :param single_active: Only one consumer of the named queue receives
+            messages at a time, the others take over when it goes away
+        :param ordered: Handle the messages of a routing key one at a time in order
+        :param exclusive: The named queue is declared exclusive, see ``declare``
+        """
+        raise NotImplementedError
+
+
+async def run_workers(
+    queue: asyncio.Queue,
+    handler: EnvelopeHandler,
+    concurrency: int,
+    requeue: Optional[Callable[[Envelope], None]] = None,
+    ordered: bool = False,
+    prefetch: int = 100,
+):
+    """
+    Drain a local queue with a pool of handler tasks until cancelled.
+
+    Messages whose handler raises are dropped. When cancelled, or when
+    the handler raises ``RequeueMessage``, the messages are given to
+    ``requeue`` if provided.
+
+    :param queue: Queue of envelopes
+    :param handler: Coroutine called with every envelope
+    :param concurrency: Number of handler tasks
+    :param requeue: Called with the messages interrupted by the shutdown
+    :param ordered: Handle the messages of a routing key one at a time in order
+    :param prefetch: Max messages taken from the queue and not handled yet
+        when ordered
+    """
+    # ordered: messages waiting in the lanes plus the ones being handled
+    taken = asyncio.Semaphore(prefetch)
+
+    async def work(source: asyncio.Queue):
+        while True:
+            envelope = await source.get()
+            try:
+                await handler(envelope)
+            except asyncio.CancelledError:
+                if requeue is not None:
+                    requeue(envelope)
+                raise
+            except RequeueMessage:
+                if requeue is not None:
+                    requeue(envelope)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to handle message %s", envelope.message_id)
+            finally:
+                source.task_done()
+                if ordered:
+                    taken.release()
+
+    async def dispatch(lanes: List[asyncio.Queue]):
+        while True:
+            await taken.acquire()
+            envelope = await queue.get()
+            queue.task_done()
+            lanes[hash(envelope.routing_key) % len(lanes)].put_nowait(envelope)
+
+    if ordered:
+        # one lane per handler task, the messages of a routing key always
+        # go to the same lane
+        lanes = [asyncio.Queue() for _ in range(concurrency)]
+        tasks = [asyncio.create_task(work(lane)) for lane in lanes]
+        tasks.append(asyncio.create_task(dispatch(lanes)))
+    else:
+        lanes = []
+        tasks = [asyncio.create_task(work(queue)) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for lane in lanes:
+            while not lane.empty():
+                envelope = lane.get_nowait()
+                if requeue is not None:
+                    requeue(envelope)
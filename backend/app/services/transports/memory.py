@@ -0,0 +1,220 @@
+"""
+In-process transport.
+
+An asyncio broker with a topic exchange and bounded queues, for tests,
+benchmarks and single process deployments without an external broker.
+Publishers wait while a bound queue is full (backpressure). A handler
+that returns acks the message, one that raises drops it, messages being
+handled when a consumer stops are put back at the end of the queue, past
+its bound.
+Delayed messages wait in a task and are lost with the process.
+"""
+
+import asyncio
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Sequence, Set
+from uuid import uuid4
+
+from .base import Envelope, EnvelopeHandler, MessageTransport, run_workers, topic_matches
+
+
+class MemoryQueue:
+    """
+    Bounded queue of a :class:`MemoryBroker`.
+    """
+
+    def __init__(self, name: str, maxsize: int):
+        """
+        :param name: Queue name
+        :param maxsize: Max number of waiting messages
+        """
+        self.name = name
+        self.messages: asyncio.Queue = asyncio.Queue(maxsize)
+        self.bindings: Set[str] = set()
+        # held by the active consumer of a single active consumer queue
+        self.active = asyncio.Lock()
+
+    def requeue(self, envelope: Envelope):
+        """
+        Put a message back at the end of the queue, even when it is full.
+
+        Publishers waiting for room refill the queue as soon as messages
+        are taken, a consumer putting back its messages must not wait.
+        """
+        messages = self.messages
+        # pylint: disable=protected-access
+        maxsize, messages._maxsize = messages._maxsize, 0
+        try:
+            messages.put_nowait(envelope)
+        finally:
+            messages._maxsize = maxsize
+
+
+class MemoryBroker:
+    """
+    Topic exchange routing to in-process queues.
+    """
+
+    def __init__(self, queue_size: int = 10000):
+        """
+        :param queue_size: Max number of waiting messages per queue
+        """
+        self.queue_size = queue_size
+        self.queues: Dict[str, MemoryQueue] = {}
+        # routing key -> bound queues, dropped whenever a binding changes
+        self._routes: Dict[str, List[MemoryQueue]] = {}
+
+    def declare_queue(self, name: str) -> MemoryQueue:
+        """
+        Get a queue, created if it doesn't exist.
+        """
+        queue = self.queues.get(name)
+        if queue is None:
+            queue = self.queues[name] = MemoryQueue(name, self.queue_size)
+        return queue
+
+    def delete_queue(self, name: str):
+        """
+        Delete a queue with its bindings and messages.
+        """
+        if self.queues.pop(name, None) is not None:
+            self._routes.clear()
+
+    def bind(self, queue: MemoryQueue, pattern: str):
+        """
+        Bind a queue to the exchange.
+        """
+        queue.bindings.add(pattern)
+        self._routes.clear()
+
+    def unbind(self, queue: MemoryQueue, pattern: str):
+        """
+        Remove a binding of a queue.
+        """
+        queue.bindings.discard(pattern)
+        self._routes.clear()
+
+    def route(self, routing_key: str) -> List[MemoryQueue]:
+        """
+        Get the queues a routing key is delivered to.
+        """
+        queues = self._routes.get(routing_key)
+        if queues is None:
+            queues = self._routes[routing_key] = [
+                queue
+                for queue in self.queues.values()
+                if any(topic_matches(pattern, routing_key) for pattern in queue.bindings)
+            ]
+        return queues
+
+    async def publish(self, envelope: Envelope):
+        """
+        Deliver a message to every bound queue.
+        """
+        for queue in self.route(envelope.routing_key):
+            await queue.messages.put(envelope)
+
+
+# exchange name -> broker shared by the transports of the process
+_brokers: Dict[str, MemoryBroker] = {}
+
+
+def get_broker(exchange_name: str, queue_size: int = 10000) -> MemoryBroker:
+    """
+    Get the in-process broker of an exchange.
+    """
+    broker = _brokers.get(exchange_name)
+    if broker is None:
+        broker = _brokers[exchange_name] = MemoryBroker(queue_size)
+    return broker
+
+
+class MemoryTransport(MessageTransport):
+    """
+    Transport over a :class:`MemoryBroker`.
+
+    Transports with the same exchange name share the broker, so publishers
+    and consumers created independently in one process see each other.
+    """
+
+    def __init__(
+        self,
+        exchange_name: str = "chat_messages",
+        queue_size: int = 10000,
+        broker: Optional[MemoryBroker] = None,
+    ):
+        """
+        :param exchange_name: Name of the exchange
+        :param queue_size: Max number of waiting messages per queue
+        :param broker: Broker to use instead of the shared one
+        """
+        self.exchange_name = exchange_name
+        self.broker = broker or get_broker(exchange_name, queue_size)
+        self._delayed: Set[asyncio.Task] = set()
+
+    async def publish(self, envelopes: Sequence[Envelope]):
+        for envelope in envelopes:
+            await self.broker.publish(envelope)
+
+    async def declare(self, queue_name: str, exclusive: bool = False):
+        self.broker.declare_queue(queue_name)
+
+    async def bind(self, queue_name: str, routing_key: str):
+        self.broker.bind(self.broker.declare_queue(queue_name), routing_key)
+
+    async def unbind(self, queue_name: str, routing_key: str):
+        queue = self.broker.queues.get(queue_name)
+        if queue is not None:
+            self.broker.unbind(queue, routing_key)
+
+    async def send(self, queue_name: str, envelopes: Sequence[Envelope], delay: float = 0):
+        queue = self.broker.declare_queue(queue_name)
+        if delay <= 0:
+            for envelope in envelopes:
+                await queue.messages.put(envelope)
+            return
+
+        async def deliver(envelopes: List[Envelope]):
+            await asyncio.sleep(delay)
+            for envelope in envelopes:
+                await queue.messages.put(envelope)
+
+        task = asyncio.create_task(deliver(list(envelopes)))
+        self._delayed.add(task)
+        task.add_done_callback(self._delayed.discard)
+
+    async def close(self):
+        for task in list(self._delayed):
+            task.cancel()
+
+    async def consume(
+        self,
+        handler: EnvelopeHandler,
+        queue_name: Optional[str] = None,
+        routing_key: Optional[str] = "#",
+        prefetch: int = 100,
+        concurrency: int = 10,
+        ack_batch: int = 50,
+        ack_interval: float = 0.2,
+        single_active: bool = False,
+        ordered: bool = False,
+        exclusive: bool = False,
+    ):
+        name = queue_name or f"amq.gen-{uuid4().hex}"
+        queue = self.broker.declare_queue(name)
+        if routing_key is not None:
+            self.broker.bind(queue, routing_key)
+        try:
+            # the next single active consumer takes over when this one stops
+            async with queue.active if single_active else nullcontext():
+                await run_workers(
+                    queue.messages,
+                    handler,
+                    concurrency,
+                    requeue=queue.requeue,
+                    ordered=ordered,
+                    prefetch=prefetch,
+                )
+        finally:
+            if queue_name is None or exclusive:
+                self.broker.delete_queue(name)
@@ -0,0 +1,199 @@
+"""
+Postgres LISTEN/NOTIFY transport.
+
+For small deployments that already run Postgres and no broker. Messages
+are sent with ``pg_notify`` on a channel named after the exchange and
+filtered by routing key on the listening side.
+
+NOTIFY is at-most-once: messages are not stored, a consumer that is not
+listening misses them, and every listening consumer receives every
+message (a named queue shared by several consumers is not load-balanced).
+Single active consumers are elected with a session advisory lock.
+Messages sent to a queue carry its name in the ``x-queue`` header and are
+only taken by consumers of that queue, delayed ones wait in a task of the
+sending process. Bindings added with ``bind`` only filter the messages of
+the consumers of the process. Payloads are limited to about 8000 bytes.
+"""
+
+import asyncio
+import base64
+import json
+import logging
+from typing import Dict, List, Optional, Sequence, Set
+
+import asyncpg
+
+from .base import Envelope, EnvelopeHandler, MessageTransport, run_workers, topic_matches
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads must be shorter than 8000 bytes
+MAX_PAYLOAD = 7999
+
+
+class PostgresTransport(MessageTransport):
+    """
+    Transport over Postgres LISTEN/NOTIFY.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        exchange_name: str = "chat_messages",
+        standby_interval: float = 1.0,
+    ):
+        """
+        :param dsn: asyncpg connection string (``postgresql://...``)
+        :param exchange_name: Name of the NOTIFY channel
+        :param standby_interval: Seconds between takeover attempts of a
+            standby single active consumer
+        """
+        self.dsn = dsn
+        self.exchange_name = exchange_name
+        self.standby_interval = standby_interval
+        self._pool: Optional[asyncpg.Pool] = None
+        self._connect_lock = asyncio.Lock()
+        self._delayed: Set[asyncio.Task] = set()
+        # queue -> routing key patterns added with ``bind``
+        self._bindings: Dict[str, Set[str]] = {}
+
+    async def connect(self):
+        if self._pool is not None:
+            return
+        async with self._connect_lock:
+            if self._pool is None:
+                self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=4)
+
+    async def close(self):
+        for task in list(self._delayed):
+            task.cancel()
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    @staticmethod
+    def encode(envelope: Envelope) -> str:
+        """
+        Encode an envelope as a NOTIFY payload.
+        """
+        payload = json.dumps(
+            {
+                "k": envelope.routing_key,
+                "t": envelope.content_type,
+                "i": envelope.message_id,
+                "h": envelope.headers,
+                "b": base64.b64encode(envelope.body).decode(),
+            },
+            separators=(",", ":"),
+        )
+        if len(payload) > MAX_PAYLOAD:
+            raise ValueError(f"Message {envelope.message_id} is too large for NOTIFY")
+        return payload
+
+    @staticmethod
+    def decode(payload: str) -> Envelope:
+        """
+        Decode a NOTIFY payload.
+        """
+        data = json.loads(payload)
+        return Envelope(
+            body=base64.b64decode(data["b"]),
+            routing_key=data["k"],
+            content_type=data["t"],
+            message_id=data["i"],
+            headers=data["h"],
+        )
+
+    async def publish(self, envelopes: Sequence[Envelope]):
+        await self.connect()
+        async with self._pool.acquire() as connection:
+            # notifications of a statement are sent in order
+            await connection.executemany(
+                "SELECT pg_notify($1, $2)",
+                [(self.exchange_name, self.encode(envelope)) for envelope in envelopes],
+            )
+
+    async def declare(self, queue_name: str, exclusive: bool = False):
+        self._bindings.setdefault(queue_name, set())
+
+    async def bind(self, queue_name: str, routing_key: str):
+        self._bindings.setdefault(queue_name, set()).add(routing_key)
+
+    async def unbind(self, queue_name: str, routing_key: str):
+        self._bindings.get(queue_name, set()).discard(routing_key)
+
+    async def send(self, queue_name: str, envelopes: Sequence[Envelope], delay: float = 0):
+        envelopes = [
+            Envelope(
+                body=envelope.body,
+                routing_key=envelope.routing_key,
+                content_type=envelope.content_type,
+                message_id=envelope.message_id,
+                headers={**envelope.headers, "x-queue": queue_name},
+            )
+            for envelope in envelopes
+        ]
+        if delay <= 0:
+            await self.publish(envelopes)
+            return
+
+        async def deliver(envelopes: List[Envelope]):
+            await asyncio.sleep(delay)
+            try:
+                await self.publish(envelopes)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to send %s delayed messages", len(envelopes))
+
+        task = asyncio.create_task(deliver(envelopes))
+        self._delayed.add(task)
+        task.add_done_callback(self._delayed.discard)
+
+    async def consume(
+        self,
+        handler: EnvelopeHandler,
+        queue_name: Optional[str] = None,
+        routing_key: Optional[str] = "#",
+        prefetch: int = 100,
+        concurrency: int = 10,
+        ack_batch: int = 50,
+        ack_interval: float = 0.2,
+        single_active: bool = False,
+        ordered: bool = False,
+        exclusive: bool = False,
+    ):
+        messages: asyncio.Queue = asyncio.Queue(prefetch)
+        bindings = self._bindings.setdefault(queue_name, set()) if queue_name else set()
+
+        def on_notify(connection, pid, channel, payload):
+            envelope = self.decode(payload)
+            target = envelope.headers.pop("x-queue", None)
+            if target is not None:
+                if target != queue_name:
+                    return
+            elif not (
+                routing_key is not None and topic_matches(routing_key, envelope.routing_key)
+            ) and not any(topic_matches(pattern, envelope.routing_key) for pattern in bindings):
+                return
+            try:
+                messages.put_nowait(envelope)
+            except asyncio.QueueFull:
+                logger.warning("Consumer is behind, message %s dropped", envelope.message_id)
+
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            if single_active and queue_name:
+                # the lock is held by the session, another consumer gets it
+                # once the connection of the active one is gone
+                key = f"{self.exchange_name}:{queue_name}"
+                while not await connection.fetchval(
+                    "SELECT pg_try_advisory_lock(hashtext($1))", key
+                ):
+                    await asyncio.sleep(self.standby_interval)
+            await connection.add_listener(self.exchange_name, on_notify)
+            await run_workers(
+                messages, handler, concurrency, ordered=ordered, prefetch=prefetch
+            )
+        finally:
+            await connection.close()
+            if exclusive:
+                self._bindings.pop(queue_name, None)
@@ -0,0 +1,97 @@
+"""
+Bounded in-memory LRU cache with per-entry TTL.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    LRU cache bounded by size where every entry expires after a TTL.
+
+    ``None`` is a valid value (e.g. for negative caching), use the
+    ``default`` argument of :meth:`get` to tell a miss from it.
+
+    :attr maxsize: Max number of entries, the least recently used are evicted
+    :attr ttl: Default entry time to live in seconds
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 10_000,
+        ttl: float = 300.0,
+        timer: Callable[[], float] = time.monotonic,
+    ):
+        """
+        Initialize the cache.
+
+        :param maxsize: Max number of entries
+        :param ttl: Default entry time to live in seconds
+        :param timer: Monotonic clock (replaceable in tests)
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def get(self, key: K, default: Any = None) -> Optional[V]:
+        """
+        Get a value and mark it as recently used.
+
+        :param key: Cache key
+        :param default: Returned on a miss (or an expired entry)
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= self._timer():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: K, value: V, ttl: Optional[float] = None):
+        """
+        Set a value, evicting the least recently used entries if full.
+
+        :param key: Cache key
+        :param value: Value to store
+        :param ttl: Time to live in seconds, the cache default if not provided
+        """
+        self._data[key] = (self._timer() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: K, default: Any = None) -> Optional[V]:
+        """
+        Remove a value.
+
+        :param key: Cache key
+        :param default: Returned if there is no such key
+        """
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        return entry[1]
+
+    def clear(self):
+        """
+        Remove all values.
+        """
+        self._data.clear()
+
+    def __contains__(self, key: K) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > self._timer()
+
+    def __len__(self) -> int:
+        return len(self._data)
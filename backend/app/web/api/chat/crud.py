@@ -215,7 +215,7 @@ async def delete_chat(
     """
     Delete a chat by its ID.
     """
-    chat = await chat_repo.get_chat_by_id(chat_id)
+    chat = await chat_repo.get_chat_by_id(chat_id, primary=True)
     if not chat:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
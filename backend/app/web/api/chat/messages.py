@@ -2,6 +2,8 @@
 Chat message API endpoints.
 """
 
+from typing import Literal, Optional, Union
+
 from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from uuid import UUID
 
@@ -9,22 +11,43 @@ from app.db.models.user import User
 from app.db.repos.chat import ChatRepository
 from app.db.repos.chat_member import ChatMemberRepository
 from app.db.repos.message import MessageRepository
+from app.db.types.cursor import InvalidCursorError
+from app.db.types.pagination import CountStrategy
 from app.web.depends import get_current_user, get_repo
-from app.web.shemas.chat_messages import PaginatedChatMessagesResponse, ChatMessageResponse
+from app.web.shemas.chat_messages import (
+    ChatMessageResponse,
+    CursorChatMessagesResponse,
+    PaginatedChatMessagesResponse,
+)
 
 chat_messages_router = APIRouter(prefix="/messages", tags=["Chat Messages"])
 
 
 @chat_messages_router.get(
     "/{chat_id}",
-    response_model=PaginatedChatMessagesResponse,
+    response_model=Union[PaginatedChatMessagesResponse, CursorChatMessagesResponse],
     summary="Get chat messages",
-    description="Retrieve paginated messages for a specific chat.",
+    description=(
+        "Retrieve paginated messages for a specific chat. "
+        "Uses page numbers by default, `mode=cursor` (or passing `before`/`after`) "
+        "switches to cursor pagination which costs the same for any page depth."
+    ),
+    responses={400: {"description": "Invalid cursor"}},
 )
 async def get_chat_messages(
     chat_id: UUID = Path(..., description="Unique identifier of the chat"),
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(50, ge=1, le=100, description="Number of messages per page"),
+    count: CountStrategy = Query(
+        CountStrategy.COUNTER,
+        description=(
+            "How to count the total in page mode: `counter` (maintained chat counter), "
+            "`exact`, `window` or `none` (no total)"
+        ),
+    ),
+    mode: Literal["page", "cursor"] = Query("page", description="Pagination mode"),
+    before: Optional[str] = Query(None, description="Cursor, return messages older than it"),
+    after: Optional[str] = Query(None, description="Cursor, return messages newer than it"),
     user: User = Depends(get_current_user),
     chat_repo: ChatRepository = Depends(get_repo(ChatRepository)),
     chat_member_repo: ChatMemberRepository = Depends(get_repo(ChatMemberRepository)),
@@ -45,23 +68,44 @@ async def get_chat_messages(
     if not chat_member:
         raise HTTPException(status_code=403, detail="Not a member of this chat")
 
+    if mode == "cursor" or before or after:
+        try:
+            messages_page = await message_repo.get_messages_by_chat_cursor(
+                chat_id=chat_id, before=before, after=after, per_page=per_page
+            )
+        except InvalidCursorError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+        return CursorChatMessagesResponse(
+            items=[
+                ChatMessageResponse.model_validate(message)
+                for message in messages_page.items
+            ],
+            per_page=messages_page.per_page,
+            has_next=messages_page.has_next,
+            has_previous=messages_page.has_previous,
+            next_cursor=messages_page.next_cursor,
+            previous_cursor=messages_page.previous_cursor,
+        )
+
     # Get paginated messages
     paginated_messages = await message_repo.get_messages_by_chat(
-        chat_id=chat_id, page=page, per_page=per_page
+        chat_id=chat_id, page=page, per_page=per_page, count=count
     )
 
     # Convert to response model
     return PaginatedChatMessagesResponse(
         items=[
-            ChatMessageResponse.model_validate(message) 
+            ChatMessageResponse.model_validate(message)
             for message in paginated_messages.items
         ],
         total_items=paginated_messages.total_items,
         total_pages=paginated_messages.total_pages,
+        count_strategy=paginated_messages.count_strategy,
         page=paginated_messages.page,
         per_page=paginated_messages.per_page,
         has_next=paginated_messages.has_next,
         has_previous=paginated_messages.has_previous,
         next_page=paginated_messages.next_page,
         previous_page=paginated_messages.previous_page
-    ) 
\ No newline at end of file
+    )
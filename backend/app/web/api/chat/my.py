@@ -28,7 +28,8 @@ async def get_user_chats(
     chats = await chat_member_repo.get_user_active_chats(
         user_id=user.id, 
         page=params.page,
-        per_page=params.per_page
+        per_page=params.per_page,
+        count=params.count,
     )
     return ChatListResponse.model_validate(chats)
 
@@ -52,6 +53,7 @@ async def get_user_chat_requests(
     chat_requests = await chat_member_repo.get_user_pending_chats(
         user_id=user.id, 
         page=params.page,
-        per_page=params.per_page
+        per_page=params.per_page,
+        count=params.count,
     )
     return ChatListResponse.model_validate(chat_requests)
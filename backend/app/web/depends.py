@@ -2,27 +2,62 @@
 Dependency functions for the backend.
 """
 
+from typing import AsyncIterator, Optional
+
 from fastapi import Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.conn import get_async_session
 from app.db.models.user import User
 from app.db.repos import BaseRepository
 from app.db.repos.user import UserRepository
+from app.db.routing import LazyReplicaSession, get_replica_session
 from app.utils.access_token import decode_token
 from app.web.security import oauth2_scheme
 
 
+async def get_db_session() -> AsyncIterator[AsyncSession]:
+    """
+    Get the request-scoped database session (unit of work).
+
+    FastAPI caches the dependency per request, so every repository of the
+    request shares one session (and at most one pooled connection),
+    the session is closed when the request is finished.
+    """
+    async with get_async_session() as session:
+        yield session
+
+
+async def get_replica_db_session() -> AsyncIterator[Optional[LazyReplicaSession]]:
+    """
+    Get the request-scoped read replica session.
+
+    The session is opened on the first read, None when no replica is
+    configured (reads go to the primary).
+    """
+    session = get_replica_session()
+    if session is None:
+        yield None
+        return
+    try:
+        yield session
+    finally:
+        await session.close()
+
+
 def get_repo(repo_type: type[BaseRepository], *args, **kwargs):
     """
     Get a dependency function for a repository instance.
     """
 
-    def get_repo_func():
+    def get_repo_func(
+        session: AsyncSession = Depends(get_db_session),
+        replica: Optional[LazyReplicaSession] = Depends(get_replica_db_session),
+    ):
         """
-        Create a repository instance.
+        Create a repository instance bound to the request sessions.
         """
-        with get_async_session() as session:
-            yield repo_type(session, *args, **kwargs)
+        return repo_type(session, *args, replica=replica, **kwargs)
 
     return get_repo_func
 
@@ -2,17 +2,42 @@
 Main module for the backend.
 """
 
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
+
+from app.db.conn import get_pool_stats
+from app.db.routing import get_replica_router
 
 from .api import api_router
+from .depends import get_current_user
+from .sse import sse_router
+from .ws import chat_stream_hub, ws_router
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """
+    Stop the shared subscription of the live streams and the replica
+    health checks on shutdown.
+    """
+    yield
+    await chat_stream_hub.stop()
+    router = get_replica_router()
+    if router is not None:
+        await router.stop()
+
 
 app = FastAPI(
     title="TelegramThreadAI",
     description="AI-enhanced Telegram threads platform",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.include_router(api_router)
+app.include_router(ws_router)
+app.include_router(sse_router)
 
 
 @app.get("/healthcheck", tags=["Healthcheck"])
@@ -21,3 +46,16 @@ def healthcheck():
     Healthcheck endpoint to check if the server is running
     """
     return {"status": "ok"}
+
+
+@app.get(
+    "/healthcheck/db/pool",
+    tags=["Healthcheck"],
+    dependencies=[Depends(get_current_user)],
+)
+def database_pool_stats():
+    """
+    Live database connection pool statistics (to size the pool under load),
+    for authenticated users only
+    """
+    return get_pool_stats()
@@ -4,6 +4,7 @@ Security-related utilities and functions for the web application.
 
 from fastapi import HTTPException, Request
 from fastapi.security import APIKeyHeader
+from starlette.requests import HTTPConnection
 from starlette.status import HTTP_403_FORBIDDEN
 
 
@@ -24,9 +25,9 @@ class APIKeyAuth(APIKeyHeader):
         self.name_in_cookie = name_in_cookie
         self.name_in_query = name_in_query
 
-    def get_api_key(self, request: Request):
+    def get_api_key(self, request: HTTPConnection):
         """
-        Get the API key from the request.
+        Get the API key from the request or the WebSocket handshake.
         """
         api_key = request.headers.get(self.model.name)
         if not api_key and self.name_in_cookie:
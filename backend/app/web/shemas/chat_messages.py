@@ -5,12 +5,13 @@ This module defines Pydantic models used for validating
 and serializing chat messages in the application.
 """
 
+from datetime import datetime
 from typing import Optional
 from uuid import UUID
 
 from pydantic import BaseModel, ConfigDict, Field
 
-from app.web.shemas.paginate import PaginatedResponse
+from app.web.shemas.paginate import CursorPaginatedResponse, PaginatedResponse
 from app.web.shemas.user import UserSchema
 
 
@@ -28,7 +29,7 @@ class ChatMessageResponse(BaseModel):
     )
     user: Optional[UserSchema] = Field(None, description="User who sent the message.")
     content: str = Field(..., description="Content of the message.")
-    created_at: str = Field(..., description="Timestamp when the message was created.")
+    created_at: datetime = Field(..., description="Timestamp when the message was created.")
 
 
 class PaginatedChatMessagesResponse(PaginatedResponse[ChatMessageResponse]):
@@ -37,3 +38,11 @@ class PaginatedChatMessagesResponse(PaginatedResponse[ChatMessageResponse]):
     """
 
     pass
+
+
+class CursorChatMessagesResponse(CursorPaginatedResponse[ChatMessageResponse]):
+    """
+    Cursor paginated response for chat messages.
+    """
+
+    pass
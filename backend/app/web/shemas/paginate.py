@@ -2,6 +2,8 @@ from typing import Generic, List, TypeVar, Optional
 
 from pydantic import BaseModel, Field, ConfigDict
 
+from app.db.types.pagination import CountStrategy
+
 T = TypeVar('T')
 
 class PaginationParams(BaseModel):
@@ -10,6 +12,10 @@ class PaginationParams(BaseModel):
     """
     page: int = Field(1, ge=1, description="Page number")
     per_page: int = Field(50, ge=1, le=100, description="Number of items per page")
+    count: CountStrategy = Field(
+        CountStrategy.EXACT,
+        description="How to count the total: `exact`, `window` (same query) or `none` (no total)",
+    )
 
 class PaginatedResponse(BaseModel, Generic[T]):
     """
@@ -19,11 +25,31 @@ class PaginatedResponse(BaseModel, Generic[T]):
 
     items: List[T]
 
-    total_items: int = Field(..., description="Total number of items")
-    total_pages: int = Field(..., description="Total number of pages")
+    total_items: int | None = Field(None, description="Total number of items (null if not counted)")
+    total_pages: int | None = Field(None, description="Total number of pages (null if not counted)")
+    count_strategy: CountStrategy = Field(
+        CountStrategy.EXACT, description="Strategy used to obtain the total"
+    )
     
     has_next: bool = Field(..., description="Has next page")
     has_previous: bool = Field(..., description="Has previous page")
     
     next_page: int | None = Field(None, description="Next page number")
     previous_page: int | None = Field(None, description="Previous page number")
+
+
+class CursorPaginatedResponse(BaseModel, Generic[T]):
+    """
+    Generic cursor (keyset) paginated response schema.
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    items: List[T]
+
+    per_page: int = Field(..., description="Number of items per page")
+
+    has_next: bool = Field(..., description="Has next (older) page")
+    has_previous: bool = Field(..., description="Has previous (newer) page")
+
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, pass it as `before`")
+    previous_cursor: Optional[str] = Field(None, description="Cursor of the previous page, pass it as `after`")
@@ -0,0 +1,201 @@
+"""
+Server-Sent Events endpoints for the live chat messages.
+
+For the clients behind proxies that break WebSockets. Every message event
+has the ``(created_at, id)`` cursor of the message as its ID, a client
+reconnecting with ``Last-Event-ID`` gets the messages it missed from the
+database before the live ones.
+
+Messages are not sent in cursor order, ``created_at`` is set before the
+commit, so a resume replays ``STREAM_REPLAY_GRACE`` seconds before the last
+event too. A client may get a message twice and drops it by its ``id``.
+"""
+
+import asyncio
+from datetime import timedelta
+from typing import AsyncIterator, List, Optional, Set
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query
+from fastapi.responses import StreamingResponse
+
+from app.config import settings
+from app.db.conn import get_async_session
+from app.db.models.chat_message import ChatMessage
+from app.db.models.user import User
+from app.db.repos.chat_member import ChatMemberRepository
+from app.db.repos.message import MessageRepository
+from app.db.repos.user import UserRepository
+from app.db.types.cursor import InvalidCursorError, decode_cursor, encode_cursor
+from app.services.fanout import Message, SubscriptionClosed
+from app.utils.access_token import decode_token
+from app.web.security import oauth2_scheme
+from app.web.shemas.chat_messages import ChatMessageResponse
+from app.web.ws import chat_stream_hub
+
+sse_router = APIRouter(prefix="/sse", tags=["SSE"])
+
+CURSOR_KEYS = (ChatMessage.created_at, ChatMessage.id)
+
+KEEPALIVE = b": keep-alive\n\n"
+
+
+def format_event(event_id: str, data: str, event: Optional[str] = None) -> bytes:
+    """
+    Format a server-sent event, ``data`` must be a single line.
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}id: {event_id}\ndata: {data}\n\n".encode()
+
+
+def message_event(message: Message) -> bytes:
+    """
+    Format the event of a live message.
+    """
+    return format_event(
+        encode_cursor((message.payload["created_at"], message.payload["id"])), message.text
+    )
+
+
+async def get_stream_user(token: str, chat_id: UUID) -> User:
+    """
+    Authenticate a stream and check that the user is a member of the chat.
+
+    Not the request-scoped session of the API: FastAPI closes it only when
+    the response is finished, an open stream would hold a connection.
+
+    :raises HTTPException: 401 if not authenticated, 403 if not a member
+    """
+    user_id = decode_token(token)["sub"]
+    async with get_async_session() as session:
+        user = await UserRepository(session).get_user_by_id(user_id)
+        if user is None:
+            raise HTTPException(status_code=401, detail="Not authenticated")
+        if not await ChatMemberRepository(session).get_chat_member(chat_id, user.id):
+            raise HTTPException(status_code=403, detail="Not a member of this chat")
+    return user
+
+
+async def replay_messages(chat_id: UUID, cursor: str) -> Optional[List[ChatMessage]]:
+    """
+    Read the messages of a chat after a cursor, oldest first.
+
+    The replay starts ``STREAM_REPLAY_GRACE`` seconds before the cursor,
+    except for the message of the cursor itself. Every query is a keyset
+    page of the ``(chat_id, created_at, id)`` index on the primary (a
+    replica may not have them yet).
+
+    :return: The messages, None when more than ``STREAM_REPLAY_LIMIT`` were missed
+    """
+    created_at, last_id = decode_cursor(cursor, CURSOR_KEYS)
+    cursor = encode_cursor(
+        (created_at - timedelta(seconds=settings.stream.replay.grace), UUID(int=0))
+    )
+    messages: List[ChatMessage] = []
+    while len(messages) <= settings.stream.replay.limit:
+        async with get_async_session() as session:
+            page = await MessageRepository(session).get_messages_by_chat_cursor(
+                chat_id, after=cursor, per_page=settings.stream.replay.page
+            )
+        messages.extend(row for row in reversed(page.items) if row.id != last_id)
+        if not page.has_previous:
+            return messages
+        cursor = page.previous_cursor
+    return None
+
+
+async def get_last_message(chat_id: UUID) -> Optional[ChatMessage]:
+    """
+    Read the newest message of a chat.
+    """
+    async with get_async_session() as session:
+        page = await MessageRepository(session).get_messages_by_chat_cursor(chat_id, per_page=1)
+    return page.items[0] if page.items else None
+
+
+async def chat_events(chat_id: UUID, cursor: Optional[str]) -> AsyncIterator[bytes]:
+    """
+    Stream the messages of a chat after a cursor, then the live ones.
+    """
+    # subscribed before the replay, no message falls between the two, a
+    # client falling behind is disconnected and resumes from its last event
+    subscription = await chat_stream_hub.listen(chat_id, policy="disconnect")
+    try:
+        # replayed messages that may come live as well, the live order
+        # isn't the cursor order so only these are skipped
+        replayed: Set[UUID] = set()
+        if cursor is not None:
+            messages = await replay_messages(chat_id, cursor)
+            if messages is None:
+                # too far behind, the client reloads the history
+                last = await get_last_message(chat_id)
+                if last is not None:
+                    yield format_event(
+                        encode_cursor((last.created_at, last.id)), "{}", event="reset"
+                    )
+                messages = []
+            for row in messages:
+                replayed.add(row.id)
+                yield format_event(
+                    encode_cursor((row.created_at, row.id)),
+                    ChatMessageResponse.model_validate(row).model_dump_json(),
+                )
+
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.get(), settings.stream.keepalive)
+            except asyncio.TimeoutError:
+                yield KEEPALIVE
+                continue
+            except SubscriptionClosed:
+                return
+            if replayed and message.payload["id"] in replayed:
+                replayed.discard(message.payload["id"])
+                continue
+            # built once for all the streams of the chat
+            yield message.frame("sse", message_event)
+    finally:
+        subscription.close()
+
+
+@sse_router.get(
+    "/chats/{chat_id}",
+    response_class=StreamingResponse,
+    summary="Stream chat messages",
+    description=(
+        "Server-sent events of the new messages of a chat, with keep-alive comments. "
+        "Reconnecting with `Last-Event-ID` (or `after`) replays the missed messages first, "
+        "a `reset` event means too many were missed and the history has to be reloaded."
+    ),
+    responses={
+        400: {"description": "Invalid cursor"},
+        401: {"description": "Not authenticated"},
+        403: {"description": "Not a member"},
+    },
+)
+async def chat_messages_events(
+    chat_id: UUID = Path(..., description="Unique identifier of the chat"),
+    last_event_id: Optional[str] = Header(None, description="ID of the last received event"),
+    after: Optional[str] = Query(None, description="Cursor, stream messages newer than it"),
+    token: str = Depends(oauth2_scheme),
+):
+    """
+    Stream the new messages of a chat as server-sent events.
+
+    Requires the user to be a member of the chat, checked once at connect.
+    """
+    await get_stream_user(token, chat_id)
+
+    cursor = last_event_id or after
+    if cursor is not None:
+        try:
+            decode_cursor(cursor, CURSOR_KEYS)
+        except InvalidCursorError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    return StreamingResponse(
+        chat_events(chat_id, cursor),
+        media_type="text/event-stream",
+        # nginx would buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,141 @@
+"""
+WebSocket endpoints for the live chat messages.
+"""
+
+import asyncio
+import logging
+from contextlib import suppress
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, HTTPException, WebSocket
+from starlette.status import WS_1008_POLICY_VIOLATION, WS_1013_TRY_AGAIN_LATER
+
+from app.config import settings
+from app.db.conn import get_async_session
+from app.db.models.user import User
+from app.db.repos.chat_member import ChatMemberRepository
+from app.db.repos.user import UserRepository
+from app.services.chat_stream import ChatStreamHub
+from app.services.codecs import Payload
+from app.services.fanout import Subscription
+from app.utils.access_token import decode_token
+from app.web.security import oauth2_scheme
+from app.web.shemas.chat_messages import ChatMessageResponse
+
+logger = logging.getLogger(__name__)
+
+ws_router = APIRouter(prefix="/ws", tags=["WebSocket"])
+
+
+def encode_message(payload: Payload) -> str:
+    """
+    Serialize a chat message as a ``ChatMessageResponse``.
+    """
+    return ChatMessageResponse.model_validate(payload).model_dump_json()
+
+
+chat_stream_hub = ChatStreamHub(
+    encode_message,
+    max_pending=settings.stream.pending,
+    policy=settings.stream.overflow,
+)
+
+
+class SocketSender:
+    """
+    Sends the messages of a subscription to a socket.
+
+    A send task runs only while messages are waiting, an idle socket
+    costs no task. An evicted subscription closes the socket.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        """
+        :param websocket: Accepted socket
+        """
+        self.websocket = websocket
+        self.subscription: Optional[Subscription] = None
+        self._sender: Optional[asyncio.Task] = None
+
+    def notify(self):
+        """
+        Start sending, called by the subscription.
+        """
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._send())
+
+    async def _send(self):
+        try:
+            while (message := self.subscription.get_nowait()) is not None:
+                await self.websocket.send_text(message.text)
+            if self.subscription.evicted:
+                await self.websocket.close(
+                    code=WS_1013_TRY_AGAIN_LATER, reason="Too slow to receive the messages"
+                )
+        except Exception as e:  # pylint: disable=broad-except
+            # the receive loop of the endpoint sees the disconnect
+            logger.debug("Failed to send to a socket: %r", e)
+        finally:
+            self._sender = None
+
+    async def close(self):
+        """
+        Stop sending.
+        """
+        if self._sender is not None:
+            self._sender.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._sender
+
+
+async def get_websocket_user(websocket: WebSocket, chat_id: UUID) -> Optional[User]:
+    """
+    Authenticate a socket with the ``x-token`` of the API and check that
+    the user is a member of the chat.
+
+    The session is closed before streaming, an open socket holds no
+    database connection.
+
+    :return: The user, None if not authenticated or not a member
+    """
+    token = oauth2_scheme.get_api_key(websocket)
+    if not token:
+        return None
+    try:
+        user_id = decode_token(token)["sub"]
+    except HTTPException:
+        return None
+    async with get_async_session() as session:
+        user = await UserRepository(session).get_user_by_id(user_id)
+        if user is None:
+            return None
+        if not await ChatMemberRepository(session).get_chat_member(chat_id, user.id):
+            return None
+    return user
+
+
+@ws_router.websocket("/chats/{chat_id}")
+async def chat_messages_stream(websocket: WebSocket, chat_id: UUID):
+    """
+    Push the new messages of a chat as ``ChatMessageResponse`` JSON frames.
+
+    Requires the user to be a member of the chat, checked once at connect.
+    """
+    user = await get_websocket_user(websocket, chat_id)
+    if user is None:
+        await websocket.close(code=WS_1008_POLICY_VIOLATION, reason="Not a member of this chat")
+        return
+    await websocket.accept()
+
+    sender = SocketSender(websocket)
+    sender.subscription = await chat_stream_hub.listen(chat_id, notify=sender.notify)
+    try:
+        while True:
+            # the client doesn't send anything, wait for the disconnect
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    finally:
+        sender.subscription.close()
+        await sender.close()
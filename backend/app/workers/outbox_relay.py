@@ -0,0 +1,79 @@
+"""
+Outbox relay publishing the stored chat messages to the MQ.
+
+Publishes the ``outbox`` table in batches with publisher confirms and
+deletes the published rows, see :mod:`app.services.outbox`. Any number of
+relays can run, they share the partitions. With MQ_JOURNAL_DIR set the
+publishes go through a buffer spilling to a journal of the relay.
+
+python -m app.workers.outbox_relay [--batch-size 500] [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.config import settings
+from app.services.message_queue import create_message_queue_service, create_publish_buffer
+from app.services.outbox import OutboxRelay
+
+logger = logging.getLogger(__name__)
+
+
+async def report(relay: OutboxRelay, interval: float):
+    """
+    Log the relay stats periodically.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        logger.info("Relayed %s", relay.stats.summary())
+
+
+async def main(batch_size: int, concurrency: int, interval: float, report_interval: float):
+    """
+    Relay the outbox until interrupted.
+    """
+    mq_service = create_message_queue_service()
+    buffer = create_publish_buffer(mq_service.transport, mq_service.exchange_name)
+    relay = OutboxRelay(
+        mq_service.transport,
+        dsn=settings.database.dsn,
+        batch_size=batch_size,
+        concurrency=concurrency,
+        interval=interval,
+        buffer=buffer,
+    )
+    reporter = asyncio.create_task(report(relay, report_interval))
+    try:
+        await relay.run()
+    finally:
+        reporter.cancel()
+        if buffer is not None:
+            # the messages still in memory are journaled
+            await buffer.stop()
+        await mq_service.close()
+        logger.info("Relayed %s", relay.stats.summary())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the outbox to the MQ")
+    parser.add_argument(
+        "--batch-size", type=int, default=settings.outbox.batch, help="Messages per batch"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.outbox.concurrency,
+        help="Batches published at the same time",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=settings.outbox.interval,
+        help="Seconds between polls without notifications",
+    )
+    parser.add_argument(
+        "--report-interval", type=float, default=60, help="Seconds between stats logs"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.batch_size, args.concurrency, args.interval, args.report_interval))
@@ -0,0 +1,255 @@
+"""
+Persistence worker storing the published chat messages in Postgres.
+
+Consumes the partitions of the ``chat_messages`` exchange (consumer group
+``persist``), buffers the messages and writes them with multi-row INSERTs,
+flushing when ``--batch-size`` messages are buffered or every
+``--flush-interval`` seconds. A message is acked only after its batch has
+been committed. Several workers share the partitions, ``--owned`` picks
+the partitions a worker takes first. Messages that can't be written are
+retried with backoff and end up in ``chat_messages.persist.dead``.
+
+python -m app.workers.persist [--owned 0-7] [--batch-size 1000]
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from collections import deque
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from app.db.conn import AsyncSession, get_async_session
+from app.db.repos.message import MessageRepository
+from app.services.codecs import FIELDS
+from app.services.message_queue import create_message_queue_service
+from app.services.partitions import parse_partitions
+from app.services.retry import get_retry_policy
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class FlushStats:
+    """
+    Flush batch sizes and latencies.
+    """
+
+    batches: int = 0
+    messages: int = 0
+    failed: int = 0
+    size_max: int = 0
+    # latencies of the recent flushes in milliseconds
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def observe(self, size: int, latency: float):
+        """
+        Record a flushed batch.
+
+        :param size: Number of messages in the batch
+        :param latency: Seconds the flush took
+        """
+        self.batches += 1
+        self.messages += size
+        self.size_max = max(self.size_max, size)
+        self.latencies.append(latency * 1000)
+
+    def summary(self) -> str:
+        """
+        Format the stats as a short human readable summary.
+        """
+        if not self.batches:
+            return "no batches flushed"
+        ordered = sorted(self.latencies)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        return (
+            f"{self.messages} messages in {self.batches} batches "
+            f"(avg size {self.messages / self.batches:.0f}, max {self.size_max}, "
+            f"{self.failed} failed), flush median={statistics.median(ordered):.2f}ms "
+            f"p99={p99:.2f}ms"
+        )
+
+
+def to_row(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a decoded MQ message to a ``chat_messages`` row.
+    """
+    return {field: payload[field] for field in FIELDS}
+
+
+class MessageBuffer:
+    """
+    Buffers messages and writes them in batches.
+
+    ``add`` returns once the message has been committed, so it can be used
+    as a consumer handler: the consumer acks after the commit.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 1000,
+        flush_interval: float = 0.05,
+        session_factory: Callable[[], AsyncSession] = get_async_session,
+    ):
+        """
+        Initialize the buffer.
+
+        :param batch_size: Buffered messages that trigger a flush
+        :param flush_interval: Max seconds a message waits for a flush
+        :param session_factory: Factory of the sessions the batches are written with
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = FlushStats()
+        self._session_factory = session_factory
+        self._rows: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._background: Set[asyncio.Task] = set()
+
+    async def add(self, payload: Dict[str, Any]):
+        """
+        Buffer a message and wait until it is committed.
+
+        :param payload: Decoded MQ message
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._rows.append((to_row(payload), future))
+        if len(self._rows) >= self.batch_size and not self._flush_lock.locked():
+            task = asyncio.create_task(self.flush())
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+        await future
+
+    async def _write(self, rows: List[Dict[str, Any]]):
+        async with self._session_factory() as session:
+            await MessageRepository(session).create_messages(rows)
+
+    async def flush(self):
+        """
+        Write the buffered messages in one transaction.
+
+        If the batch fails, its messages are written one by one, so a
+        single bad message (e.g. of a deleted chat) fails alone.
+        """
+        async with self._flush_lock:
+            batch, self._rows = self._rows, []
+            if not batch:
+                return
+            started = time.perf_counter()
+            try:
+                await self._write([row for row, _ in batch])
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Failed to write a batch of %s messages", len(batch))
+                for row, future in batch:
+                    try:
+                        await self._write([row])
+                    except Exception as e:  # pylint: disable=broad-except
+                        self.stats.failed += 1
+                        if not future.done():
+                            future.set_exception(e)
+                    else:
+                        if not future.done():
+                            future.set_result(None)
+            else:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_result(None)
+            self.stats.observe(len(batch), time.perf_counter() - started)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        """
+        Start the periodic flush.
+        """
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_periodically())
+
+    async def stop(self):
+        """
+        Stop the periodic flush and write what is still buffered.
+        """
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._flush_task
+            self._flush_task = None
+        await self.flush()
+
+
+async def report(buffer: MessageBuffer, interval: float):
+    """
+    Log the flush stats periodically.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        logger.info("Persisted %s", buffer.stats.summary())
+
+
+async def main(
+    owned: Optional[Set[int]],
+    batch_size: int,
+    flush_interval: float,
+    prefetch: int,
+    report_interval: float,
+):
+    """
+    Consume and persist messages until interrupted.
+    """
+    buffer = MessageBuffer(batch_size=batch_size, flush_interval=flush_interval)
+    mq_service = create_message_queue_service()
+    await buffer.start()
+    reporter = asyncio.create_task(report(buffer, report_interval))
+    try:
+        await mq_service.consume_partitions(
+            buffer.add,
+            group="persist",
+            owned=owned,
+            prefetch=prefetch,
+            # every buffered message waits in its own handler task
+            concurrency=prefetch,
+            ack_batch=batch_size,
+            ack_interval=flush_interval,
+            # rows carry their timestamp, the write order doesn't matter
+            ordered=False,
+            retry=get_retry_policy(),
+        )
+    finally:
+        reporter.cancel()
+        await buffer.stop()
+        await mq_service.close()
+        logger.info("Persisted %s", buffer.stats.summary())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Persist chat messages from the MQ")
+    parser.add_argument(
+        "--owned", default=None, help="Partitions taken first, e.g. 0-7 (all by default)"
+    )
+    parser.add_argument("--batch-size", type=int, default=1000, help="Messages per flush")
+    parser.add_argument(
+        "--flush-interval", type=float, default=0.05, help="Max seconds between flushes"
+    )
+    parser.add_argument(
+        "--prefetch", type=int, default=1000, help="Unacked messages per partition"
+    )
+    parser.add_argument(
+        "--report-interval", type=float, default=60, help="Seconds between stats logs"
+    )
+    args = parser.parse_args()
+    asyncio.run(
+        main(
+            parse_partitions(args.owned) if args.owned else None,
+            args.batch_size,
+            args.flush_interval,
+            args.prefetch,
+            args.report_interval,
+        )
+    )
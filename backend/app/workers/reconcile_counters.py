@@ -0,0 +1,54 @@
+"""
+Reconciliation job for the denormalized chat message counters.
+
+python -m app.workers.reconcile_counters [--once] [--interval 3600]
+"""
+
+import argparse
+import asyncio
+import logging
+
+from app.db.conn import get_async_session
+from app.db.repos.message import MessageRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def reconcile_all(batch_size: int = 500) -> int:
+    """
+    Walk all chats in batches and fix drifted message counters.
+
+    :param batch_size: Number of chats locked and recounted per transaction
+    :return: Number of fixed counters
+    """
+    fixed = 0
+    last_chat_id = None
+    while True:
+        async with get_async_session() as session:
+            batch_fixed, last_chat_id = await MessageRepository(
+                session
+            ).reconcile_message_counts(after_chat_id=last_chat_id, batch_size=batch_size)
+        fixed += batch_fixed
+        if last_chat_id is None:
+            return fixed
+
+
+async def main(once: bool, interval: int, batch_size: int):
+    """
+    Run the reconciliation once or periodically.
+    """
+    while True:
+        fixed = await reconcile_all(batch_size=batch_size)
+        logger.info("Message counters reconciled, %s fixed", fixed)
+        if once:
+            return
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconcile chat message counters")
+    parser.add_argument("--once", action="store_true", help="Run a single pass")
+    parser.add_argument("--interval", type=int, default=3600, help="Seconds between passes")
+    parser.add_argument("--batch-size", type=int, default=500, help="Chats per transaction")
+    args = parser.parse_args()
+    asyncio.run(main(args.once, args.interval, args.batch_size))
@@ -0,0 +1,58 @@
+"""
+Replay of dead-lettered chat messages.
+
+Moves the messages of a dead letter queue back to the queues they failed
+in (or to ``--into``), with the attempt count reset, until the dead
+letter queue is drained or ``--limit`` messages have been moved.
+
+python -m app.workers.replay [--group persist | --queue NAME] [--limit 1000]
+"""
+
+import argparse
+import asyncio
+import logging
+from typing import Optional
+
+from app.services.message_queue import create_message_queue_service
+
+logger = logging.getLogger(__name__)
+
+
+async def main(
+    group: str,
+    queue_name: Optional[str],
+    into: Optional[str],
+    limit: Optional[int],
+    idle_timeout: float,
+):
+    """
+    Replay the dead letters of a consumer group or queue once.
+    """
+    mq_service = create_message_queue_service()
+    try:
+        replayed = await mq_service.replay_dead_letters(
+            queue_name or mq_service.dead_letter_queue(group),
+            queue_name=into,
+            limit=limit,
+            idle_timeout=idle_timeout,
+        )
+    finally:
+        await mq_service.close()
+    logger.info("Replayed %s messages", replayed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay dead-lettered chat messages")
+    parser.add_argument(
+        "--group", default="persist", help="Consumer group whose dead letters are replayed"
+    )
+    parser.add_argument("--queue", default=None, help="Dead letter queue name (overrides --group)")
+    parser.add_argument(
+        "--into", default=None, help="Queue to replay into (the original queues by default)"
+    )
+    parser.add_argument("--limit", type=int, default=None, help="Max messages to replay")
+    parser.add_argument(
+        "--idle-timeout", type=float, default=2.0, help="Seconds without messages to stop"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.group, args.queue, args.into, args.limit, args.idle_timeout))
@@ -0,0 +1,9 @@
+"""
+Performance benchmarks for the backend.
+
+Benchmarks talk to real services configured through the usual settings
+(``DATABASE_*``, ``RABBITMQ_*``) and may create or truncate data, so always
+point them at a disposable database, e.g.::
+
+    DATABASE_NAME=ttai_bench python -m benchmarks.message_pagination
+"""
@@ -0,0 +1,178 @@
+"""
+Benchmark the database cost of the bot message ingest path.
+
+Feeds synthetic Telegram messages (``--users`` senders posting
+``--messages`` messages in total) through the bot middlewares and counts
+the database round trips (BEGIN / statements / COMMIT / ROLLBACK) per
+message, comparing the old select-update-refresh user sync, the single
+statement upsert and the in-memory identity cache. Command traffic
+(``/start``, ``/help``) is measured in sessions opened and pool checkouts
+per update, for a handler that resolves a repository and one that
+doesn't (the lazy ``DBReposContext`` opens no session for the latter).
+
+    DATABASE_NAME=ttai_bench python -m benchmarks.bot_ingest --messages 5000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from datetime import datetime
+
+from aiogram.types import Chat as TgChat
+from aiogram.types import Message
+from aiogram.types import User as TgUser
+from sqlalchemy import event
+
+from app.bot.middlewares import DatabaseMiddleware, UserMiddleware
+from app.bot.user_cache import UserIdentityCache
+from app.db.conn import get_async_engine, get_pool_stats
+from app.db.repos.user import UserRepository
+
+from .common import bench_engine
+
+
+class RoundTripCounter:
+    """Counts database round trips of an engine."""
+
+    def __init__(self, engine):
+        self.counts = Counter()
+        sync_engine = engine.sync_engine
+        event.listen(sync_engine, "begin", lambda conn: self.counts.update(["begin"]))
+        event.listen(sync_engine, "commit", lambda conn: self.counts.update(["commit"]))
+        event.listen(sync_engine, "rollback", lambda conn: self.counts.update(["rollback"]))
+        event.listen(
+            sync_engine,
+            "before_cursor_execute",
+            lambda *args: self.counts.update(["statement"]),
+        )
+
+    @property
+    def total(self) -> int:
+        """Total number of round trips."""
+        return sum(self.counts.values())
+
+    def reset(self):
+        """Forget the collected counts."""
+        self.counts.clear()
+
+
+async def legacy_create_or_update_user(self, telegram_id, first_name=None,
+                                       last_name=None, username=None, photo_url=None):
+    """The select-update-refresh user sync used before the upsert."""
+    existing_user = await self.get_user_by_telegram_id(telegram_id)
+    if existing_user:
+        existing_user.first_name = first_name
+        existing_user.last_name = last_name
+        existing_user.username = username
+        existing_user.photo_url = photo_url
+        await self.db.commit()
+        await self.db.refresh(existing_user)
+        return existing_user
+    return await self.create_user(telegram_id, first_name, last_name, username, photo_url)
+
+
+def make_messages(messages: int, users: int) -> list[Message]:
+    """Synthetic group messages from a pool of repeat senders."""
+    senders = [
+        TgUser(id=10_000 + n, is_bot=False, first_name=f"user {n}", username=f"user_{n}")
+        for n in range(users)
+    ]
+    chat = TgChat(id=-1001, type="supergroup")
+    return [
+        Message(
+            message_id=n,
+            date=datetime.now(),
+            chat=chat,
+            from_user=random.choice(senders),
+            text=f"message {n}",
+        )
+        for n in range(messages)
+    ]
+
+
+async def ingest(messages: list[Message], user_middleware: UserMiddleware) -> float:
+    """Run messages through the bot middlewares, return seconds spent."""
+    database_middleware = DatabaseMiddleware()
+
+    async def handler(event, data):
+        return None
+
+    async def user_step(event, data):
+        return await user_middleware(handler, event, data)
+
+    started = time.perf_counter()
+    for message in messages:
+        await database_middleware(user_step, message, {})
+    return time.perf_counter() - started
+
+
+async def ingest_commands(messages: list[Message], resolve_repo: bool) -> tuple[float, int]:
+    """Run command updates, return seconds spent and sessions opened."""
+    database_middleware = DatabaseMiddleware()
+    opened = 0
+
+    async def handler(event, data):
+        nonlocal opened
+        db_repos = data["db_repos"]
+        if resolve_repo:
+            await db_repos.user_repo.get_user_by_telegram_id(event.from_user.id)
+        opened += db_repos.is_used
+
+    started = time.perf_counter()
+    for message in messages:
+        await database_middleware(handler, message, {})
+    return time.perf_counter() - started, opened
+
+
+async def main(messages: int, users: int):
+    """Run the benchmark."""
+    async with bench_engine():
+        counter = RoundTripCounter(get_async_engine())
+        batch = make_messages(messages, users)
+
+        variants = [
+            ("select+update", legacy_create_or_update_user, None),
+            ("upsert", UserRepository.create_or_update_user, None),
+            ("upsert+cache", UserRepository.create_or_update_user, UserIdentityCache()),
+        ]
+        for name, implementation, user_cache in variants:
+            original = UserRepository.create_or_update_user
+            UserRepository.create_or_update_user = implementation
+            user_middleware = UserMiddleware(user_cache)
+            try:
+                # warm up, every user exists
+                await ingest(make_messages(users, users), user_middleware)
+                counter.reset()
+                elapsed = await ingest(batch, user_middleware)
+                if user_cache is not None:
+                    await user_cache.stop()
+            finally:
+                UserRepository.create_or_update_user = original
+
+            print(
+                f"{name:<14} {counter.total / messages:5.2f} round trips/message "
+                f"({dict(counter.counts)}) {messages / elapsed:8.0f} messages/s"
+            )
+
+        commands = make_messages(messages, users)
+        for command in commands:
+            command.__dict__["text"] = "/start"
+        for name, resolve_repo in (("cmd no repo", False), ("cmd user_repo", True)):
+            checkouts = get_pool_stats()["checkouts"]
+            elapsed, opened = await ingest_commands(commands, resolve_repo)
+            checkouts = get_pool_stats()["checkouts"] - checkouts
+            print(
+                f"{name:<14} {opened / messages:5.2f} sessions/update "
+                f"{checkouts / messages:5.2f} pool checkouts/update "
+                f"{messages / elapsed:8.0f} updates/s"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.users))
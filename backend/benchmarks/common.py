@@ -0,0 +1,64 @@
+"""
+Shared helpers for the benchmarks.
+"""
+
+import statistics
+import time
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, List
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.db.conn import get_async_engine
+from app.db.models import Base
+
+
+async def measure(
+    func: Callable[[], Awaitable[object]], repeat: int = 20, warmup: int = 3
+) -> List[float]:
+    """
+    Run an async callable several times and collect timings.
+
+    :param func: Async callable to measure
+    :param repeat: Number of measured runs
+    :param warmup: Number of not measured runs before
+    :return: Timings in milliseconds
+    """
+    for _ in range(warmup):
+        await func()
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summary(timings: List[float]) -> str:
+    """
+    Format timings as a short human readable summary.
+
+    :param timings: Timings in milliseconds
+    """
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return (
+        f"median={statistics.median(ordered):8.2f}ms "
+        f"p99={p99:8.2f}ms min={ordered[0]:8.2f}ms"
+    )
+
+
+@asynccontextmanager
+async def bench_engine(create_schema: bool = True):
+    """
+    Engine for the benchmark database with the schema created.
+    """
+    engine: AsyncEngine = get_async_engine()
+    if create_schema:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    try:
+        yield engine
+    finally:
+        await engine.dispose()
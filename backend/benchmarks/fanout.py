@@ -0,0 +1,120 @@
+"""
+Benchmark the in-process fan-out of a chat with many subscribers.
+
+Subscribes ``--subscribers`` readers to one chat and publishes
+``--messages`` messages at ``--rate`` messages/s. Reports the fan-out
+latency (publish until the last reader got the message), the publish
+call alone, and the memory per idle subscription and per subscription
+with its reader task. ``--slow`` readers never read, they exercise the
+``--policy`` for slow subscribers::
+
+    python -m benchmarks.fanout --subscribers 5000 --slow 50 --policy disconnect
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+import uuid
+from datetime import UTC, datetime
+
+from app.services.fanout import FanoutHub
+
+from .common import summary
+
+
+def encode(payload) -> str:
+    """Serialize a message like the web streams do."""
+    return json.dumps(payload, default=str)
+
+
+def make_payload(chat_id: uuid.UUID, n: int):
+    """Chat message number ``n``."""
+    return {
+        "id": uuid.uuid4(),
+        "chat_id": chat_id,
+        "user_id": uuid.uuid4(),
+        "content": f"message {n} " + "x" * 200,
+        "created_at": datetime.now(UTC),
+    }
+
+
+def measure_memory(subscribers: int) -> float:
+    """Bytes allocated per idle subscription."""
+    hub = FanoutHub(encode)
+    chat_id = uuid.uuid4()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    subscriptions = [hub.subscribe(chat_id) for _ in range(subscribers)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del subscriptions
+    return (after - before) / subscribers
+
+
+async def main(subscribers: int, slow: int, messages: int, rate: float, policy: str, max_pending: int):
+    """Run the benchmark."""
+    print(f"idle subscription: {measure_memory(subscribers):.0f} bytes")
+
+    hub = FanoutHub(encode, max_pending=max_pending, policy=policy)
+    chat_id = uuid.uuid4()
+    readers = subscribers - slow
+    received: dict = {}
+    published: dict = {}
+    latencies: list[float] = []
+    done = asyncio.Event()
+
+    async def read(subscription):
+        while True:
+            message = await subscription.get()
+            count = received[message.payload["id"]] = received.get(message.payload["id"], 0) + 1
+            if count == readers:
+                latencies.append((time.perf_counter() - published[message.payload["id"]]) * 1000)
+                if len(latencies) == messages:
+                    done.set()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tasks = [asyncio.create_task(read(hub.subscribe(chat_id))) for _ in range(readers)]
+    for _ in range(slow):
+        hub.subscribe(chat_id)
+    await asyncio.sleep(0)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"subscription with a reader task: {(after - before) / subscribers:.0f} bytes")
+
+    publish_times: list[float] = []
+    started = time.perf_counter()
+    for n in range(messages):
+        payload = make_payload(chat_id, n)
+        published[payload["id"]] = time.perf_counter()
+        hub.publish(payload)
+        publish_times.append((time.perf_counter() - published[payload["id"]]) * 1000)
+        delay = started + (n + 1) / rate - time.perf_counter()
+        await asyncio.sleep(max(delay, 0))
+    await asyncio.wait_for(done.wait(), 60)
+
+    print(f"fan-out to {readers} readers: {summary(latencies)}")
+    print(f"publish call:           {summary(publish_times)}")
+    print(
+        f"{hub.stats.delivered} delivered, {hub.stats.dropped} dropped, "
+        f"{hub.stats.evicted} evicted ({policy}), {hub.connections} subscribed"
+    )
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subscribers", type=int, default=5000)
+    parser.add_argument("--slow", type=int, default=50, help="Subscribers that never read")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=100, help="Messages/s")
+    parser.add_argument("--policy", choices=["drop_oldest", "disconnect"], default="drop_oldest")
+    parser.add_argument("--max-pending", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(
+        main(args.subscribers, args.slow, args.messages, args.rate, args.policy, args.max_pending)
+    )
@@ -0,0 +1,98 @@
+"""
+Benchmark COUNT(*) over chat_messages vs the denormalized chat counter.
+
+Seeds ``--messages`` rows (10M by default) spread over ``--chats`` chats and
+compares the total lookup and a full history page with both strategies.
+
+    DATABASE_NAME=ttai_bench python -m benchmarks.message_counter --messages 10000000
+"""
+
+import argparse
+import asyncio
+import uuid
+
+from sqlalchemy import func, select, text
+
+from app.db.conn import get_async_session_maker
+from app.db.models import Chat, ChatMessage
+from app.db.repos.message import MessageRepository
+from app.db.types.pagination import CountStrategy
+
+from .common import bench_engine, measure, summary
+
+SEED_SQL = """
+INSERT INTO chat_messages (id, chat_id, user_id, content, created_at)
+SELECT gen_random_uuid(), chat_ids[1 + n % array_length(chat_ids, 1)], :user_id,
+       'message #' || n, now() - make_interval(secs => :messages - n)
+FROM generate_series(1, :messages) AS n,
+     (SELECT array_agg(id) AS chat_ids FROM chats WHERE owner_id = :user_id) AS c
+"""
+
+
+async def seed(session, messages: int, chats: int) -> list[uuid.UUID]:
+    """Create chats with the requested amount of messages and fill the counters."""
+    user_id = uuid.uuid4()
+    chat_ids = [uuid.uuid4() for _ in range(chats)]
+    await session.execute(
+        text("INSERT INTO users (id, telegram_id) VALUES (:id, :tg)"),
+        {"id": user_id, "tg": int(user_id.int % 2**31)},
+    )
+    await session.execute(
+        text(
+            "INSERT INTO chats (id, title, username, chat_type, owner_id) "
+            "VALUES (:id, 'bench', :username, 'PUBLIC', :owner)"
+        ),
+        [{"id": chat_id, "username": f"bench_{chat_id.hex}", "owner": user_id} for chat_id in chat_ids],
+    )
+    await session.execute(text(SEED_SQL), {"user_id": user_id, "messages": messages})
+    await session.commit()
+
+    last_chat_id = None
+    repo = MessageRepository(session)
+    while True:
+        _, last_chat_id = await repo.reconcile_message_counts(after_chat_id=last_chat_id)
+        if last_chat_id is None:
+            break
+    await session.execute(text("ANALYZE"))
+    return chat_ids
+
+
+async def main(messages: int, chats: int, repeat: int):
+    """Run the benchmark."""
+    async with bench_engine():
+        async with get_async_session_maker()() as session:
+            chat_ids = await seed(session, messages, chats)
+            chat_id = chat_ids[0]
+            print(f"seeded {messages} messages in {chats} chats")
+
+            count_timings = await measure(
+                lambda: session.execute(
+                    select(func.count()).where(ChatMessage.chat_id == chat_id)
+                ),
+                repeat=repeat,
+            )
+            counter_timings = await measure(
+                lambda: session.execute(
+                    select(Chat.message_count).where(Chat.id == chat_id)
+                ),
+                repeat=repeat,
+            )
+            print(f"total  count(*) {summary(count_timings)}")
+            print(f"total  counter  {summary(counter_timings)}")
+
+            repo = MessageRepository(session)
+            for strategy in (CountStrategy.EXACT, CountStrategy.COUNTER):
+                timings = await measure(
+                    lambda: repo.get_messages_by_chat(chat_id, count=strategy),
+                    repeat=repeat,
+                )
+                print(f"page   {strategy.value:<8} {summary(timings)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=10_000_000)
+    parser.add_argument("--chats", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.chats, args.repeat))
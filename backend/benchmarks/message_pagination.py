@@ -0,0 +1,106 @@
+"""
+Benchmark OFFSET vs keyset (cursor) pagination of the chat history.
+
+Seeds a single chat with ``--messages`` rows (1M by default) and compares the
+cost of fetching a page at different depths with both strategies.
+
+    DATABASE_NAME=ttai_bench python -m benchmarks.message_pagination --messages 1000000
+"""
+
+import argparse
+import asyncio
+import uuid
+
+from sqlalchemy import func, select, text
+
+from app.db.conn import get_async_session_maker
+from app.db.models import ChatMessage
+from app.db.repos.message import MessageRepository
+from app.db.types.cursor import encode_cursor
+
+from .common import bench_engine, measure, summary
+
+SEED_SQL = """
+INSERT INTO chat_messages (id, chat_id, user_id, content, created_at)
+SELECT gen_random_uuid(), :chat_id, :user_id, 'message #' || n,
+       now() - make_interval(secs => :messages - n)
+FROM generate_series(1, :messages) AS n
+"""
+
+
+async def seed(session, messages: int) -> uuid.UUID:
+    """Create a user and a chat with the requested amount of messages."""
+    user_id, chat_id = uuid.uuid4(), uuid.uuid4()
+    await session.execute(
+        text("INSERT INTO users (id, telegram_id) VALUES (:id, :tg)"),
+        {"id": user_id, "tg": int(user_id.int % 2**31)},
+    )
+    await session.execute(
+        text(
+            "INSERT INTO chats (id, title, username, chat_type, owner_id) "
+            "VALUES (:id, 'bench', :username, 'PUBLIC', :owner)"
+        ),
+        {"id": chat_id, "username": f"bench_{chat_id.hex}", "owner": user_id},
+    )
+    await session.execute(
+        text(SEED_SQL), {"chat_id": chat_id, "user_id": user_id, "messages": messages}
+    )
+    await session.commit()
+    await session.execute(text("ANALYZE chat_messages"))
+    return chat_id
+
+
+async def cursor_at_depth(session, chat_id: uuid.UUID, depth: int) -> str | None:
+    """Cursor pointing at the message ``depth`` rows from the newest one."""
+    if depth == 0:
+        return None
+    row = (
+        await session.execute(
+            select(ChatMessage)
+            .where(ChatMessage.chat_id == chat_id)
+            .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+            .offset(depth - 1)
+            .limit(1)
+        )
+    ).scalar_one()
+    return encode_cursor([row.created_at, row.id])
+
+
+async def main(messages: int, per_page: int, repeat: int):
+    """Run the benchmark."""
+    async with bench_engine():
+        async with get_async_session_maker()() as session:
+            chat_id = await seed(session, messages)
+            total = (
+                await session.execute(
+                    select(func.count()).where(ChatMessage.chat_id == chat_id)
+                )
+            ).scalar_one()
+            print(f"seeded chat {chat_id} with {total} messages")
+
+            repo = MessageRepository(session)
+            for depth in (0, total // 100, total // 10, total // 2, total - per_page):
+                page = depth // per_page + 1
+                cursor = await cursor_at_depth(session, chat_id, depth)
+
+                offset_timings = await measure(
+                    lambda: repo.get_messages_by_chat(chat_id, page=page, per_page=per_page),
+                    repeat=repeat,
+                )
+                cursor_timings = await measure(
+                    lambda: repo.get_messages_by_chat_cursor(
+                        chat_id, before=cursor, per_page=per_page
+                    ),
+                    repeat=repeat,
+                )
+                print(f"depth={depth:>9} offset  {summary(offset_timings)}")
+                print(f"depth={depth:>9} cursor  {summary(cursor_timings)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--per-page", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.per_page, args.repeat))
@@ -0,0 +1,90 @@
+"""
+Compare the chat message payload codecs.
+
+Encodes and decodes ``--messages`` synthetic payloads with every available
+codec and reports the average body size and the CPU time per message.
+The old body (JSON with string UUIDs) plus its duplicate headers is shown
+for reference. No broker or database is needed::
+
+    python -m benchmarks.mq_codecs --messages 100000 --content-size 80
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import UTC, datetime
+
+from app.services.codecs import CODECS, get_codec
+
+
+def make_payloads(messages: int, content_size: int) -> list[dict]:
+    """Synthetic payloads with ``content_size`` characters of text."""
+    chat_ids = [uuid.uuid4() for _ in range(100)]
+    user_id = uuid.uuid4()
+    return [
+        {
+            "id": uuid.uuid4(),
+            "chat_id": chat_ids[n % len(chat_ids)],
+            "user_id": user_id,
+            "content": ("message %d " % n).ljust(content_size, "x"),
+            "created_at": datetime.now(UTC),
+        }
+        for n in range(messages)
+    ]
+
+
+def legacy_size(payload: dict) -> int:
+    """Size of the body and the headers published before the codecs."""
+    body = json.dumps(
+        {
+            "chat_id": str(payload["chat_id"]),
+            "user_id": str(payload["user_id"]),
+            "content": payload["content"],
+        }
+    ).encode()
+    headers = json.dumps(
+        {
+            "chat_id": str(payload["chat_id"]),
+            "user_id": str(payload["user_id"]),
+            "timestamp": payload["created_at"].isoformat(),
+        }
+    ).encode()
+    return len(body) + len(headers)
+
+
+def main(messages: int, content_size: int):
+    """Run the benchmark."""
+    payloads = make_payloads(messages, content_size)
+    legacy = sum(legacy_size(payload) for payload in payloads) / messages
+    print(f"{'legacy':<8} {legacy:7.1f} bytes/message (body + headers)")
+
+    for name in CODECS:
+        try:
+            codec = get_codec(name)
+        except ImportError:
+            print(f"{name:<8} not installed")
+            continue
+
+        started = time.perf_counter()
+        bodies = [codec.encode(payload) for payload in payloads]
+        encoded = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for body in bodies:
+            codec.decode(body)
+        decoded = time.perf_counter() - started
+
+        size = sum(len(body) for body in bodies) / messages
+        print(
+            f"{name:<8} {size:7.1f} bytes/message "
+            f"encode={encoded / messages * 1e6:6.2f}us decode={decoded / messages * 1e6:6.2f}us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--content-size", type=int, default=80)
+    args = parser.parse_args()
+    main(args.messages, args.content_size)
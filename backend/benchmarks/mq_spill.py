@@ -0,0 +1,107 @@
+"""
+Benchmark the publish latency through the spilling publish buffer.
+
+Publishes at ``--rate`` messages/s with the in-process transport for three
+phases of ``--duration`` seconds: broker up, broker down (publishes hang
+for ``--hang`` seconds and fail, messages are journaled) and broker back
+(the journal is replayed). Reports the publish latency of every phase and
+how long the replay took::
+
+    python -m benchmarks.mq_spill --rate 2000 --journal /tmp/mq-journal
+"""
+
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+import uuid
+
+from app.services.journal import Journal
+from app.services.message_queue import MessageQueueService
+from app.services.publish_buffer import PublishBuffer
+from app.services.transports.memory import MemoryBroker, MemoryTransport
+
+from .common import summary
+
+
+class OutageTransport(MemoryTransport):
+    """In-process transport that can simulate an unreachable broker."""
+
+    def __init__(self, broker: MemoryBroker, hang: float):
+        super().__init__(broker=broker)
+        self.hang = hang
+        self.down = False
+
+    async def publish(self, envelopes):
+        if self.down:
+            await asyncio.sleep(self.hang)
+            raise ConnectionError("broker is down")
+        await super().publish(envelopes)
+
+
+async def phase(service: MessageQueueService, rate: float, duration: float) -> list[float]:
+    """Publish at a fixed rate, return the latencies in milliseconds."""
+    chat_id, user_id = uuid.uuid4(), uuid.uuid4()
+    latencies: list[float] = []
+
+    async def publish(n: int):
+        started = time.perf_counter()
+        await service.publish_message(chat_id, user_id, f"message {n}")
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    tasks = []
+    started = time.perf_counter()
+    n = 0
+    while time.perf_counter() - started < duration:
+        tasks.append(asyncio.create_task(publish(n)))
+        n += 1
+        delay = started + n / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+async def main(rate: float, duration: float, hang: float, spill_after: float, journal: str):
+    """Run the benchmark."""
+    broker = MemoryBroker(queue_size=10**9)
+    queue = broker.declare_queue("sink")
+    broker.bind(queue, "#")
+    transport = OutageTransport(broker, hang)
+    buffer = PublishBuffer(transport, Journal(journal), spill_after=spill_after)
+    service = MessageQueueService(transport=transport, buffer=buffer)
+
+    sent = 0
+    replay_started = time.perf_counter()
+    for name, down in (("broker up:  ", False), ("broker down:", True), ("broker back:", False)):
+        transport.down = down
+        if name == "broker back:":
+            replay_started = time.perf_counter()
+        latencies = await phase(service, rate, duration)
+        sent += len(latencies)
+        print(f"{name} {summary(latencies)}")
+    while buffer.spilling:
+        await asyncio.sleep(0.01)
+    print(
+        f"journal replayed in {time.perf_counter() - replay_started:.2f}s, "
+        f"{buffer.stats.spilled} spilled, {buffer.stats.replayed} replayed, "
+        f"{queue.messages.qsize()} of {sent} delivered"
+    )
+    await service.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=float, default=2000, help="Messages/s")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds per phase")
+    parser.add_argument("--hang", type=float, default=1.0, help="Seconds a failing publish hangs")
+    parser.add_argument("--spill-after", type=float, default=0.2)
+    parser.add_argument("--journal", default=None, help="Journal directory (a temporary one)")
+    args = parser.parse_args()
+    directory = args.journal or tempfile.mkdtemp(prefix="mq-journal-")
+    try:
+        asyncio.run(main(args.rate, args.duration, args.hang, args.spill_after, directory))
+    finally:
+        if args.journal is None:
+            shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,157 @@
+"""
+End-to-end message queue throughput without an external broker.
+
+Publishes ``--messages`` chat messages through the message queue service
+and consumes them with ``--concurrency`` handler tasks, on the in-process
+transport by default (``--transport``), and reports messages/s. With
+``--persist`` the consumer writes the messages with the persistence worker
+buffer (needs the benchmark database).
+
+With ``--partitions`` the messages are consumed from that many ordered
+partitions with ``--concurrency`` handler tasks each, ``--work-ms``
+simulates the handler latency, so the scaling with the partition count
+shows::
+
+    python -m benchmarks.mq_throughput --messages 100000 --codec msgpack
+    python -m benchmarks.mq_throughput --partitions 1 2 4 8 --concurrency 4 --work-ms 1
+    DATABASE_NAME=ttai_bench python -m benchmarks.mq_throughput --persist
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+from app.config import MessageQueueSettings
+from app.services.message_queue import MessageQueueService
+from app.services.transports import get_transport
+
+
+async def run(
+    service: MessageQueueService, messages: int, concurrency: int, handle, partitioned: bool
+) -> float:
+    """Publish and consume the messages, return messages/s."""
+    chat_ids = [uuid.uuid4() for _ in range(100)]
+    user_id = uuid.uuid4()
+    consumed = 0
+    done = asyncio.Event()
+
+    async def on_message(payload: dict):
+        nonlocal consumed
+        await handle(payload)
+        consumed += 1
+        if consumed == messages:
+            done.set()
+
+    if partitioned:
+        consuming = service.consume_partitions(
+            on_message,
+            group=f"bench-{uuid.uuid4().hex}",
+            prefetch=concurrency * 2,
+            concurrency=concurrency,
+        )
+    else:
+        consuming = service.consume(
+            on_message,
+            queue_name=f"bench-{uuid.uuid4().hex}",
+            routing_key="#",
+            prefetch=concurrency * 2,
+            concurrency=concurrency,
+        )
+    consumer = asyncio.create_task(consuming)
+    await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    for start in range(0, messages, 1000):
+        await service.publish_many(
+            {"chat_id": chat_ids[n % len(chat_ids)], "user_id": user_id, "content": f"message {n}"}
+            for n in range(start, min(start + 1000, messages))
+        )
+    await done.wait()
+    elapsed = time.perf_counter() - started
+
+    consumer.cancel()
+    await asyncio.gather(consumer, return_exceptions=True)
+    return messages / elapsed
+
+
+async def bench_partitions(
+    transport: str, codec: str, messages: int, concurrency: int, partitions: list, work_ms: float
+):
+    """Consume from ordered partitions with a simulated handler latency."""
+    for count in partitions:
+        service = MessageQueueService(
+            codec=codec,
+            transport=get_transport(mq=MessageQueueSettings(transport=transport)),
+            partitions=count,
+        )
+
+        async def work(payload: dict):
+            await asyncio.sleep(work_ms / 1000)
+
+        rate = await run(service, messages, concurrency, work, partitioned=True)
+        await service.close()
+        print(f"{transport}/{codec} {count:>3} partitions: {rate:8.0f} messages/s")
+
+
+async def main(transport: str, codec: str, messages: int, concurrency: int, persist: bool):
+    """Run the benchmark."""
+    service = MessageQueueService(
+        codec=codec,
+        transport=get_transport(mq=MessageQueueSettings(transport=transport)),
+    )
+
+    if not persist:
+
+        async def discard(payload: dict):
+            return None
+
+        rate = await run(service, messages, concurrency, discard, partitioned=False)
+    else:
+        # pylint: disable=import-outside-toplevel
+        from app.workers.persist import MessageBuffer
+
+        from .common import bench_engine
+        from .persist import seed
+
+        async with bench_engine():
+            user_id, chat_ids = await seed(100)
+            buffer = MessageBuffer()
+            await buffer.start()
+
+            async def store(payload: dict):
+                # spread over the seeded chats, the foreign keys must hold
+                payload["chat_id"] = chat_ids[payload["chat_id"].int % len(chat_ids)]
+                payload["user_id"] = user_id
+                await buffer.add(payload)
+
+            rate = await run(service, messages, concurrency, store, partitioned=False)
+            await buffer.stop()
+            print(buffer.stats.summary())
+    await service.close()
+    print(f"{transport}/{codec}: {rate:8.0f} messages/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--transport", default="memory", choices=["memory", "rabbitmq", "postgres"])
+    parser.add_argument("--codec", default="json", choices=["json", "orjson", "msgpack"])
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--persist", action="store_true", help="Write the messages to the database")
+    parser.add_argument("--partitions", type=int, nargs="*", help="Partition counts to compare")
+    parser.add_argument("--work-ms", type=float, default=1.0, help="Handler latency with --partitions")
+    args = parser.parse_args()
+    if args.partitions:
+        asyncio.run(
+            bench_partitions(
+                args.transport,
+                args.codec,
+                args.messages,
+                args.concurrency,
+                args.partitions,
+                args.work_ms,
+            )
+        )
+    else:
+        asyncio.run(main(args.transport, args.codec, args.messages, args.concurrency, args.persist))
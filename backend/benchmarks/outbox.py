@@ -0,0 +1,105 @@
+"""
+Benchmark the outbox to publish lag of the chat messages.
+
+``--writers`` tasks store messages with their outbox rows at ``--rate``
+messages/s in total for ``--duration`` seconds while ``--relays`` relays
+publish the outbox with the transport of MQ_TRANSPORT. Reports the write
+rate and the lag from the commit of an outbox row to its publish confirm.
+
+    DATABASE_NAME=ttai_bench python -m benchmarks.outbox --rate 2000 --relays 1 2 4
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db.conn import get_async_session
+from app.db.repos.message import MessageRepository
+from app.services.message_queue import create_message_queue_service
+from app.services.outbox import OutboxRelay, create_message
+
+from .common import bench_engine
+from .persist import seed
+
+
+async def write(mq_service, user_id, chat_ids, rate: float, duration: float, offset: int) -> int:
+    """Store messages at a fixed rate, return the number of messages."""
+    written = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        async with get_async_session() as session:
+            await create_message(
+                MessageRepository(session),
+                mq_service,
+                chat_ids[(offset + written) % len(chat_ids)],
+                user_id,
+                f"message {written}",
+            )
+        written += 1
+        delay = started + written / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    return written
+
+
+async def run(relays: int, writers: int, rate: float, duration: float, batch_size: int, user_id, chat_ids):
+    """Write and relay, print the throughput and the lag."""
+    mq_service = create_message_queue_service()
+    outbox_relays = [
+        OutboxRelay(mq_service.transport, dsn=settings.database.dsn, batch_size=batch_size)
+        for _ in range(relays)
+    ]
+    tasks = [asyncio.create_task(relay.run()) for relay in outbox_relays]
+    started = time.perf_counter()
+    written = sum(
+        await asyncio.gather(
+            *(
+                write(mq_service, user_id, chat_ids, rate / writers, duration, writer)
+                for writer in range(writers)
+            )
+        )
+    )
+    elapsed = time.perf_counter() - started
+    # let the relays drain the outbox
+    while sum(relay.stats.messages for relay in outbox_relays) < written:
+        await asyncio.sleep(0.05)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await mq_service.close()
+
+    lags = sorted(lag for relay in outbox_relays for lag in relay.stats.lags)
+    p50 = lags[len(lags) // 2]
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(
+        f"{relays} relays: {written / elapsed:8.0f} messages/s written, "
+        f"lag p50={p50:.2f}ms p99={p99:.2f}ms max={lags[-1]:.2f}ms"
+    )
+
+
+async def main(relays: list[int], writers: int, rate: float, duration: float, batch_size: int, chats: int):
+    """Run the benchmark."""
+    async with bench_engine():
+        user_id, chat_ids = await seed(chats)
+        for count in relays:
+            await run(count, writers, rate, duration, batch_size, user_id, chat_ids)
+        async with get_async_session() as session:
+            await session.execute(text("DELETE FROM outbox"))
+            await session.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--relays", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--rate", type=float, default=2000, help="Messages/s written in total")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--chats", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(
+        main(args.relays, args.writers, args.rate, args.duration, args.batch_size, args.chats)
+    )
@@ -0,0 +1,84 @@
+"""
+Benchmark the batched MQ -> Postgres persistence of chat messages.
+
+Feeds ``--messages`` synthetic MQ messages straight into the persistence
+worker buffer (no broker involved) and reports messages/s and the flush
+batch sizes and latencies for every ``--batch-size``.
+
+    DATABASE_NAME=ttai_bench python -m benchmarks.persist --messages 100000
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import UTC, datetime
+
+from sqlalchemy import text
+
+from app.db.conn import get_async_session
+from app.workers.persist import MessageBuffer
+
+from .common import bench_engine
+
+
+async def seed(chats: int) -> tuple[uuid.UUID, list[uuid.UUID]]:
+    """Create a user and the chats the messages are written to."""
+    user_id = uuid.uuid4()
+    chat_ids = [uuid.uuid4() for _ in range(chats)]
+    async with get_async_session() as session:
+        await session.execute(
+            text("INSERT INTO users (id, telegram_id) VALUES (:id, :tg)"),
+            {"id": user_id, "tg": int(user_id.int % 2**31)},
+        )
+        await session.execute(
+            text(
+                "INSERT INTO chats (id, title, username, chat_type, owner_id) "
+                "VALUES (:id, 'bench', :username, 'PUBLIC', :owner)"
+            ),
+            [
+                {"id": chat_id, "username": f"bench_{chat_id.hex}", "owner": user_id}
+                for chat_id in chat_ids
+            ],
+        )
+        await session.commit()
+    return user_id, chat_ids
+
+
+async def run(messages: int, batch_size: int, user_id, chat_ids) -> float:
+    """Persist the messages, return messages/s."""
+    buffer = MessageBuffer(batch_size=batch_size, flush_interval=0.05)
+    payloads = [
+        {
+            "id": uuid.uuid4(),
+            "chat_id": chat_ids[n % len(chat_ids)],
+            "user_id": user_id,
+            "content": f"message {n}",
+            "created_at": datetime.now(UTC),
+        }
+        for n in range(messages)
+    ]
+    await buffer.start()
+    started = time.perf_counter()
+    await asyncio.gather(*(buffer.add(payload) for payload in payloads))
+    elapsed = time.perf_counter() - started
+    await buffer.stop()
+    print(f"batch {batch_size:>5}: {messages / elapsed:8.0f} messages/s, {buffer.stats.summary()}")
+    return messages / elapsed
+
+
+async def main(messages: int, chats: int, batch_sizes: list[int]):
+    """Run the benchmark."""
+    async with bench_engine():
+        user_id, chat_ids = await seed(chats)
+        for batch_size in batch_sizes:
+            await run(messages, batch_size, user_id, chat_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=100000)
+    parser.add_argument("--chats", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[100, 1000, 5000])
+    args = parser.parse_args()
+    asyncio.run(main(args.messages, args.chats, args.batch_size))
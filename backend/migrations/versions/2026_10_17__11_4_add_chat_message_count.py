@@ -0,0 +1,49 @@
+"""add chat message count
+
+Revision ID: a83d5e0c41b7
+Revises: 4f1c2a9d7e35
+Create Date: 2026-10-17 11:04:19.530127
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a83d5e0c41b7"
+down_revision: Union[str, None] = "4f1c2a9d7e35"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade the database."""
+    op.add_column(
+        "chats",
+        sa.Column(
+            "message_count",
+            sa.BigInteger(),
+            server_default=sa.text("0"),
+            nullable=False,
+        ),
+    )
+    # Backfill the counters from the existing messages
+    op.execute(
+        """
+        UPDATE chats SET message_count = counts.total
+        FROM (
+            SELECT chat_id, count(*) AS total
+            FROM chat_messages
+            GROUP BY chat_id
+        ) AS counts
+        WHERE chats.id = counts.chat_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade the database."""
+    op.drop_column("chats", "message_count")
@@ -0,0 +1,41 @@
+"""add bot state
+
+Revision ID: c5e1f7a2b913
+Revises: a83d5e0c41b7
+Create Date: 2026-10-17 13:20:07.412593
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5e1f7a2b913"
+down_revision: Union[str, None] = "a83d5e0c41b7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade the database."""
+    op.create_table(
+        "bot_state",
+        sa.Column("bot_id", sa.BigInteger(), autoincrement=False, nullable=False),
+        sa.Column("last_update_id", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("bot_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade the database."""
+    op.drop_table("bot_state")
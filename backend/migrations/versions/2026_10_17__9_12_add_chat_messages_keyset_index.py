@@ -0,0 +1,35 @@
+"""add chat messages keyset index
+
+Revision ID: 4f1c2a9d7e35
+Revises: 6bb8ba3b2418
+Create Date: 2026-10-17 09:12:41.118204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4f1c2a9d7e35"
+down_revision: Union[str, None] = "6bb8ba3b2418"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade the database."""
+    op.create_index(
+        "ix_chat_messages_chat_id_created_at_id",
+        "chat_messages",
+        ["chat_id", "created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade the database."""
+    op.drop_index(
+        "ix_chat_messages_chat_id_created_at_id", table_name="chat_messages"
+    )
@@ -0,0 +1,183 @@
+"""
+Test in-memory caches.
+"""
+
+import uuid
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from aiogram.types import User as TelegramUser
+
+from app.bot.chat_cache import TelegramChatCacheListener
+from app.bot import user_cache
+from app.bot.user_cache import UserIdentityCache
+from app.db.models.user import User
+from app.db.repos.chat import TELEGRAM_CHAT_CACHE, TELEGRAM_CHAT_CHANNEL, ChatRepository
+from app.utils.ttl_cache import TTLCache
+
+
+class FakeTimer:
+    """Manually advanced clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_expires_entries():
+    """Entries are gone after their TTL."""
+    timer = FakeTimer()
+    cache = TTLCache(maxsize=10, ttl=5, timer=timer)
+    cache.set("a", 1)
+    cache.set("b", None, ttl=1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b", "miss") is None
+
+    timer.now = 2
+    assert cache.get("b", "miss") == "miss"
+    timer.now = 6
+    assert "a" not in cache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    """A full cache drops the least recently used entry."""
+    cache = TTLCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+@pytest.mark.asyncio
+async def test_repeat_sender_costs_no_queries():
+    """Only the first message of a sender reaches the repository."""
+    telegram_user = TelegramUser(id=42, is_bot=False, first_name="Ann")
+    user_repo = AsyncMock()
+    user_repo.create_or_update_user.return_value = User(
+        id=uuid.uuid4(), telegram_id=42, first_name="Ann"
+    )
+    cache = UserIdentityCache()
+
+    first = await cache.get_user(telegram_user, user_repo)
+    second = await cache.get_user(telegram_user, user_repo)
+
+    assert first is second
+    user_repo.create_or_update_user.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_changed_profile_is_written_behind():
+    """A profile change updates the cached user and waits for the flush."""
+    user_repo = AsyncMock()
+    user_repo.create_or_update_user.return_value = User(
+        id=uuid.uuid4(), telegram_id=42, first_name="Ann"
+    )
+    cache = UserIdentityCache()
+    first = await cache.get_user(TelegramUser(id=42, is_bot=False, first_name="Ann"), user_repo)
+
+    user = await cache.get_user(
+        TelegramUser(id=42, is_bot=False, first_name="Anna", username="anna"), user_repo
+    )
+
+    assert (user.first_name, user.username) == ("Anna", "anna")
+    # an update still handling the first one keeps its snapshot
+    assert (first.first_name, first.username) == ("Ann", None)
+    assert cache._pending == {42: ("Anna", None, "anna")}
+    user_repo.create_or_update_user.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_does_not_restore_overwritten_profiles(monkeypatch):
+    """A profile upserted during a failed flush is not overwritten by the old one."""
+    user_repo = AsyncMock()
+    user_repo.create_or_update_user.side_effect = lambda **kwargs: User(
+        id=uuid.uuid4(), photo_url=None, **kwargs
+    )
+    cache = UserIdentityCache()
+    for first_name in ("Ann", "Anna"):
+        await cache.get_user(TelegramUser(id=42, is_bot=False, first_name=first_name), user_repo)
+        await cache.get_user(TelegramUser(id=43, is_bot=False, first_name=first_name), user_repo)
+
+    class UserRepository:
+        """Fails after 42 was upserted again, with a newer profile."""
+
+        def __init__(self, session):
+            self.session = session
+
+        async def update_profiles(self, profiles):
+            """Fail to write the profiles."""
+            cache._users.pop(42)
+            await cache.get_user(TelegramUser(id=42, is_bot=False, first_name="Annie"), user_repo)
+            raise ConnectionError("database is down")
+
+    @asynccontextmanager
+    async def get_async_session():
+        yield None
+
+    monkeypatch.setattr(user_cache, "UserRepository", UserRepository)
+    monkeypatch.setattr(user_cache, "get_async_session", get_async_session)
+    await cache.flush()
+
+    assert cache._pending == {43: ("Anna", None, None)}
+
+
+@pytest.mark.asyncio
+async def test_not_mirrored_chat_is_cached():
+    """A miss is remembered, the second lookup does not query the database."""
+    TELEGRAM_CHAT_CACHE.clear()
+    session = AsyncMock()
+    session.execute.return_value = MagicMock(scalar_one_or_none=MagicMock(return_value=None))
+    chat_repo = ChatRepository(session)
+
+    assert await chat_repo.resolve_chat_id_by_telegram_id(-100) is None
+    assert await chat_repo.resolve_chat_id_by_telegram_id(-100) is None
+    session.execute.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_mirroring_invalidates_cached_miss():
+    """Setting telegram_chat_id drops the cached miss."""
+    TELEGRAM_CHAT_CACHE.clear()
+    TELEGRAM_CHAT_CACHE.set(-100, None)
+    session = AsyncMock()
+    session.execute.return_value = MagicMock(rowcount=1)
+
+    await ChatRepository(session).set_telegram_chat_id(uuid.uuid4(), -100)
+
+    assert -100 not in TELEGRAM_CHAT_CACHE
+
+
+@pytest.mark.asyncio
+async def test_deleted_chat_is_invalidated_in_other_processes():
+    """Deleting a chat notifies the listeners, which drop the cached chat."""
+    session = AsyncMock()
+    session.execute.return_value = MagicMock(
+        one_or_none=MagicMock(return_value=SimpleNamespace(telegram_chat_id=-100))
+    )
+
+    await ChatRepository(session).delete_chat(uuid.uuid4())
+
+    notifies = [
+        call.args[0].compile(compile_kwargs={"literal_binds": True})
+        for call in session.execute.await_args_list[1:]
+    ]
+    assert [str(statement) for statement in notifies] == [
+        f"SELECT pg_notify('{TELEGRAM_CHAT_CHANNEL}', '-100') AS pg_notify_1"
+    ]
+    session.commit.assert_awaited_once()
+
+    # the bot process still has the deleted chat
+    cache = TTLCache()
+    cache.set(-100, uuid.uuid4())
+    TelegramChatCacheListener(dsn="postgresql://", cache=cache).on_notify(
+        None, 1, TELEGRAM_CHAT_CHANNEL, "-100"
+    )
+    assert -100 not in cache
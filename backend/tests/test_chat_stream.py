@@ -0,0 +1,128 @@
+"""
+Test the live chat message stream hub.
+"""
+
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from app.services.chat_stream import ChatStreamHub
+from app.services.message_queue import MessageQueueService
+from app.services.transports.memory import MemoryBroker, MemoryTransport
+
+
+async def wait_for(condition, timeout: float = 1.0):
+    """Poll until ``condition()`` is true."""
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+def make_hub(broker: MemoryBroker, name: str, encode=None) -> ChatStreamHub:
+    """Hub of a node on the in-process broker."""
+    return ChatStreamHub(
+        encode or (lambda payload: payload["content"]),
+        lambda: MessageQueueService(transport=MemoryTransport(broker=broker)),
+        queue_name=name,
+    )
+
+
+@pytest.mark.asyncio
+async def test_hub_fans_out_to_the_subscribers_of_the_chat():
+    """One node queue serves every local subscriber, a message is encoded once."""
+    broker = MemoryBroker()
+    encoded = []
+
+    def encode(payload):
+        encoded.append(payload["id"])
+        return json.dumps({"content": payload["content"]})
+
+    hub = make_hub(broker, "node", encode)
+    publisher = MessageQueueService(transport=MemoryTransport(broker=broker))
+    chat_id, other_chat_id, user_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    first = await hub.listen(chat_id)
+    second = await hub.listen(chat_id)
+    other = await hub.listen(other_chat_id)
+    assert hub.connections == 3
+    assert broker.queues["node"].bindings == {f"{chat_id}.*", f"{other_chat_id}.*"}
+
+    for n in range(3):
+        await publisher.publish_message(chat_id, user_id, f"message {n}")
+    await wait_for(lambda: len(second.pending) == 3)
+
+    expected = [json.dumps({"content": f"message {n}"}) for n in range(3)]
+    assert [(await first.get()).text for _ in range(3)] == expected
+    assert [(await second.get()).text for _ in range(3)] == expected
+    assert not other.pending
+    assert len(encoded) == 3
+
+    first.close()
+    second.close()
+    assert chat_id not in hub.subscriptions
+    await wait_for(lambda: broker.queues["node"].bindings == {f"{other_chat_id}.*"})
+    await publisher.publish_message(chat_id, user_id, "nobody listens")
+    await publisher.publish_message(other_chat_id, user_id, "other")
+    await wait_for(lambda: other.pending)
+    assert len(encoded) == 4
+
+    await hub.stop()
+    await publisher.close()
+    assert "node" not in broker.queues
+
+
+@pytest.mark.asyncio
+async def test_nodes_receive_the_messages_of_their_chats_once():
+    """A message reaches each node with listeners once, and no other node."""
+    broker = MemoryBroker()
+    nodes = [make_hub(broker, f"node-{n}") for n in range(3)]
+    publisher = MessageQueueService(transport=MemoryTransport(broker=broker))
+    chat_id, other_chat_id, user_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    for _ in range(5):
+        await nodes[0].listen(chat_id)
+    await nodes[1].listen(chat_id)
+    await nodes[2].listen(other_chat_id)
+
+    await publisher.publish_message(chat_id, user_id, "hello")
+    await wait_for(lambda: nodes[1].stats.published == 1)
+    await asyncio.sleep(0.05)
+
+    assert [node.stats.published for node in nodes] == [1, 1, 0]
+    assert [node.stats.delivered for node in nodes] == [5, 1, 0]
+    assert all(queue.messages.empty() for queue in broker.queues.values())
+
+    for node in nodes:
+        await node.stop()
+    await publisher.close()
+
+
+@pytest.mark.asyncio
+async def test_listeners_leaving_before_the_binding_leave_nothing_behind():
+    """The binding waits of the chats without subscribers are dropped."""
+
+    class HangingTransport(MemoryTransport):
+        """Transport whose bindings never complete."""
+
+        async def bind(self, queue_name, routing_key):
+            """Wait forever."""
+            await asyncio.Event().wait()
+
+    hub = ChatStreamHub(
+        lambda payload: payload["content"],
+        lambda: MessageQueueService(transport=HangingTransport(broker=MemoryBroker())),
+        queue_name="node",
+    )
+    timed_out = [await hub.listen(uuid.uuid4(), timeout=0.01) for _ in range(3)]
+    cancelled = asyncio.create_task(hub.listen(uuid.uuid4()))
+    await asyncio.sleep(0.01)
+    cancelled.cancel()
+    await asyncio.gather(cancelled, return_exceptions=True)
+    for subscription in timed_out:
+        subscription.close()
+
+    assert not hub.subscriptions
+    assert not hub._bound_events
+    await hub.stop()
@@ -0,0 +1,38 @@
+"""
+Test the chat message payload codecs.
+"""
+
+import uuid
+from datetime import UTC, datetime
+
+import pytest
+
+from app.services.codecs import get_codec, get_decoder
+
+
+@pytest.mark.parametrize("name", ["json", "orjson", "msgpack"])
+def test_codec_round_trip(name: str):
+    """A payload decodes back to the same typed values."""
+    if name != "json":
+        pytest.importorskip(name)
+    codec = get_codec(name)
+    payload = {
+        "id": uuid.uuid4(),
+        "chat_id": uuid.uuid4(),
+        "user_id": uuid.uuid4(),
+        "content": "hello 👋",
+        "created_at": datetime.now(UTC),
+    }
+
+    body = codec.encode(payload)
+
+    assert get_decoder(codec.content_type).decode(body) == payload
+    assert codec.decode(body) == payload
+
+
+def test_unknown_codec():
+    """Unknown codecs and content types are refused."""
+    with pytest.raises(ValueError):
+        get_codec("xml")
+    with pytest.raises(ValueError):
+        get_decoder("text/plain")
@@ -0,0 +1,58 @@
+"""
+Test loading the settings from the environment.
+"""
+
+from app.config import Settings
+from app.services import message_queue
+from app.services.transports.memory import MemoryTransport
+
+
+def test_message_queue_settings_from_env(monkeypatch):
+    """MQ_* variables reach the nested message queue settings."""
+    monkeypatch.setenv("MQ_CAPACITY", "42")
+    monkeypatch.setenv("MQ_RETRY_ATTEMPTS", "3")
+    monkeypatch.setenv("MQ_RETRY_DELAY", "0.5")
+    monkeypatch.setenv("MQ_RETRY_MULTIPLIER", "2")
+    monkeypatch.setenv("MQ_RETRY_CAP", "60")
+    monkeypatch.setenv("MQ_BUFFER_SIZE", "100")
+    monkeypatch.setenv("MQ_BUFFER_SPILL", "0.25")
+    monkeypatch.setenv("MQ_JOURNAL_DIR", "/var/lib/ttai/journal")
+    monkeypatch.setenv("MQ_JOURNAL_SEGMENT", "1024")
+
+    mq = Settings(_env_file=None).mq
+
+    assert mq.capacity == 42
+    assert mq.retry.model_dump() == {"attempts": 3, "delay": 0.5, "multiplier": 2, "cap": 60}
+    assert mq.buffer.model_dump() == {"size": 100, "spill": 0.25}
+    assert mq.journal.model_dump() == {"dir": "/var/lib/ttai/journal", "segment": 1024}
+
+
+def test_publish_buffer_is_enabled_from_env(monkeypatch, tmp_path):
+    """MQ_JOURNAL_DIR turns the publish buffer on."""
+    transport = MemoryTransport()
+    monkeypatch.setattr(message_queue, "settings", Settings(_env_file=None))
+    assert message_queue.create_publish_buffer(transport) is None
+
+    monkeypatch.setenv("MQ_JOURNAL_DIR", str(tmp_path))
+    monkeypatch.setenv("MQ_BUFFER_SIZE", "100")
+    monkeypatch.setattr(message_queue, "settings", Settings(_env_file=None))
+    buffer = message_queue.create_publish_buffer(transport)
+    assert buffer.journal.directory == str(tmp_path / "chat_messages" / "0")
+    assert buffer.max_size == 100
+    buffer.journal.close()
+    assert message_queue.create_message_queue_service().buffer is None
+
+
+def test_stream_settings_from_env(monkeypatch):
+    """STREAM_* variables reach the nested stream settings."""
+    monkeypatch.setenv("STREAM_PENDING", "10")
+    monkeypatch.setenv("STREAM_OVERFLOW", "disconnect")
+    monkeypatch.setenv("STREAM_REPLAY_PAGE", "20")
+    monkeypatch.setenv("STREAM_REPLAY_LIMIT", "200")
+    monkeypatch.setenv("STREAM_REPLAY_GRACE", "2.5")
+
+    stream = Settings(_env_file=None).stream
+
+    assert stream.pending == 10
+    assert stream.overflow == "disconnect"
+    assert stream.replay.model_dump() == {"page": 20, "limit": 200, "grace": 2.5}
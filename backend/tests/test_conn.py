@@ -0,0 +1,69 @@
+"""
+Test the database connection pool options and metrics.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import exc
+from sqlalchemy.util import greenlet_spawn
+
+from app.config import DatabaseSettings
+from app.db.conn import MeteredAsyncQueuePool, get_engine_options, get_pool_stats
+from app.web.depends import get_current_user
+from app.web.main import app
+
+
+def test_engine_options_of_the_profiles():
+    """Behind PgBouncer no named prepared statement is reused."""
+    direct = get_engine_options(DatabaseSettings(pool={"size": 3, "overflow": 2}, statements=50))
+    assert direct["poolclass"] is MeteredAsyncQueuePool
+    assert (direct["pool_size"], direct["max_overflow"]) == (3, 2)
+    assert direct["connect_args"] == {
+        "statement_cache_size": 50,
+        "prepared_statement_cache_size": 50,
+    }
+
+    pgbouncer = get_engine_options(DatabaseSettings(profile="pgbouncer"))["connect_args"]
+    assert pgbouncer["statement_cache_size"] == 0
+    assert pgbouncer["prepared_statement_cache_size"] == 0
+    names = {pgbouncer["prepared_statement_name_func"]() for _ in range(2)}
+    assert len(names) == 2
+
+
+@pytest.mark.asyncio
+async def test_pool_counts_checkouts_and_timeouts():
+    """Checkout waits and timeouts are counted and reported with the pool state."""
+    pool = MeteredAsyncQueuePool(creator=MagicMock, pool_size=1, max_overflow=0, timeout=0.05)
+
+    def check_out():
+        connection = pool.connect()
+        with pytest.raises(exc.TimeoutError):
+            pool.connect()
+        return connection
+
+    connection = await greenlet_spawn(check_out)
+    stats = get_pool_stats(SimpleNamespace(sync_engine=SimpleNamespace(pool=pool)))
+    assert (stats["size"], stats["checked_out"]) == (1, 1)
+    assert (stats["checkouts"], stats["timeouts"]) == (2, 1)
+    assert stats["wait_max"] >= 0.05
+    assert stats["wait_avg"] == stats["wait_total"] / 2
+
+    await greenlet_spawn(connection.close)
+    assert pool.recreate().metrics is pool.metrics
+
+
+def test_pool_stats_require_authentication():
+    """The pool statistics are not public."""
+    client = TestClient(app)
+    assert client.get("/healthcheck/db/pool").status_code == 403
+
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(id=None)
+    try:
+        response = client.get("/healthcheck/db/pool")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert "checkouts" in response.json()
@@ -0,0 +1,36 @@
+"""
+Test the batched acknowledgements of the MQ consumer.
+"""
+
+from types import SimpleNamespace
+
+from app.services.consumer import DeliveryTracker
+
+
+def make_message(delivery_tag: int):
+    """Stand-in for an incoming message, only the tag is used."""
+    return SimpleNamespace(delivery_tag=delivery_tag)
+
+
+def test_delivery_tracker_acks_contiguous_deliveries():
+    """Only deliveries below the first unfinished one are acked."""
+    tracker = DeliveryTracker()
+    messages = [make_message(tag) for tag in range(1, 6)]
+
+    tracker.done(messages[1])
+    assert tracker.take() is None
+
+    tracker.done(messages[0])
+    assert tracker.pending == 2
+    assert tracker.take() is messages[1]
+    assert tracker.take() is None
+
+    # a rejected message moves the watermark but is never acked
+    tracker.done(messages[3], handled=False)
+    tracker.done(messages[2])
+    assert tracker.watermark == 4
+    assert tracker.take() is messages[2]
+
+    tracker.done(messages[4], handled=False)
+    assert tracker.watermark == 5
+    assert tracker.take() is None
@@ -0,0 +1,36 @@
+"""
+Test web dependencies.
+"""
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.db.repos.chat import ChatRepository
+from app.db.repos.message import MessageRepository
+from app.db.repos.user import UserRepository
+from app.web.depends import get_repo
+
+
+def test_repositories_share_request_session():
+    """All repositories of a request use one session, a new one per request."""
+    app = FastAPI()
+    sessions = []
+
+    @app.get("/")
+    async def endpoint(
+        chat_repo: ChatRepository = Depends(get_repo(ChatRepository)),
+        message_repo: MessageRepository = Depends(get_repo(MessageRepository)),
+        user_repo: UserRepository = Depends(get_repo(UserRepository)),
+    ):
+        # the sessions themselves, ids may be reused once they are collected
+        sessions.append((chat_repo.db, message_repo.db, user_repo.db))
+        return {}
+
+    client = TestClient(app)
+    client.get("/")
+    client.get("/")
+
+    first, second = sessions
+    assert first[0] is first[1] is first[2]
+    assert second[0] is second[1] is second[2]
+    assert first[0] is not second[0]
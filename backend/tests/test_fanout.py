@@ -0,0 +1,78 @@
+"""
+Test the fan-out hub and its slow subscriber policies.
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.services.fanout import FanoutHub, SubscriptionClosed
+
+
+def make_payload(chat_id, n: int):
+    """Chat message number ``n``."""
+    return {"id": n, "chat_id": chat_id, "content": f"message {n}"}
+
+
+@pytest.mark.asyncio
+async def test_message_is_encoded_once_and_shared():
+    """Every subscriber gets the same message object and frames."""
+    encoded = []
+
+    def encode(payload):
+        encoded.append(payload["id"])
+        return payload["content"]
+
+    hub = FanoutHub(encode)
+    chat_id = uuid.uuid4()
+    subscriptions = [hub.subscribe(chat_id) for _ in range(3)]
+    hub.subscribe(uuid.uuid4())
+
+    message = hub.publish(make_payload(chat_id, 0))
+    assert encoded == [0]
+    received = [await subscription.get() for subscription in subscriptions]
+    assert all(item is message for item in received)
+    frames = {id(item.frame("test", lambda item: item.data + b"\n")) for item in received}
+    assert len(frames) == 1
+    assert hub.publish(make_payload(uuid.uuid4(), 1)) is None
+    assert hub.stats.delivered == 3
+
+
+@pytest.mark.asyncio
+async def test_drop_oldest_keeps_the_newest_messages():
+    """A slow subscriber loses its oldest messages, the others get everything."""
+    hub = FanoutHub(lambda payload: payload["content"], max_pending=2)
+    chat_id = uuid.uuid4()
+    slow = hub.subscribe(chat_id)
+    fast = hub.subscribe(chat_id, max_pending=10)
+
+    for n in range(5):
+        hub.publish(make_payload(chat_id, n))
+    assert [slow.get_nowait().payload["id"] for _ in range(2)] == [3, 4]
+    assert [fast.get_nowait().payload["id"] for _ in range(5)] == list(range(5))
+    assert slow.dropped == 3
+    assert hub.stats.dropped == 3
+
+
+@pytest.mark.asyncio
+async def test_disconnect_evicts_slow_subscribers():
+    """A subscriber falling behind is evicted and its reader wakes up."""
+    hub = FanoutHub(lambda payload: payload["content"], max_pending=2, policy="disconnect")
+    chat_id = uuid.uuid4()
+    notified = []
+    slow = hub.subscribe(chat_id, notify=lambda: notified.append(True))
+    waiting = hub.subscribe(chat_id, max_pending=10)
+    reader = asyncio.create_task(waiting.get())
+    await asyncio.sleep(0)
+
+    for n in range(3):
+        hub.publish(make_payload(chat_id, n))
+    assert (await reader).payload["id"] == 0
+    assert slow.evicted and slow.closed
+    assert not waiting.evicted
+    assert slow not in hub.subscriptions[chat_id]
+    assert len(notified) == 2
+    assert hub.stats.evicted == 1
+    with pytest.raises(SubscriptionClosed):
+        await slow.get()
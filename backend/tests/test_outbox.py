@@ -0,0 +1,168 @@
+"""
+Test the outbox relay.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from app.db.repos.outbox import OutboxRepository
+from app.services import outbox
+from app.services.journal import Journal
+from app.services.outbox import OutboxRelay
+from app.services.publish_buffer import PublishBuffer
+from app.services.transports.memory import MemoryBroker, MemoryTransport
+
+
+class FakeOutbox:
+    """Outbox rows shared by the fake repositories."""
+
+    def __init__(self, count: int):
+        self.rows = [
+            SimpleNamespace(
+                id=n,
+                routing_key=f"chat.{n % 2}",
+                content_type="application/json",
+                message_id=str(n),
+                body=str(n).encode(),
+                age=0.01,
+            )
+            for n in range(count)
+        ]
+
+    def repository(self, session):
+        """Build a repository over the rows."""
+        rows = self.rows
+
+        class Repository:
+            """Outbox repository over a list."""
+
+            async def claim(self, batch_size: int):
+                """Claim the oldest rows."""
+                return rows[:batch_size]
+
+            async def delete(self, ids):
+                """Delete the published rows."""
+                rows[:] = [row for row in rows if row.id not in ids]
+
+        return Repository()
+
+
+class FakeSession:
+    """Session that is never used by the fake repository."""
+
+    async def rollback(self):
+        """Nothing to roll back."""
+
+
+@asynccontextmanager
+async def fake_session():
+    """Open a fake session."""
+    yield FakeSession()
+
+
+@pytest.mark.asyncio
+async def test_relay_publishes_in_order_and_deletes(monkeypatch):
+    """Batches are published in outbox order and deleted after the publish."""
+    fake = FakeOutbox(5)
+    monkeypatch.setattr(outbox, "OutboxRepository", fake.repository)
+    broker = MemoryBroker()
+    queue = broker.declare_queue("test")
+    broker.bind(queue, "#")
+    relay = OutboxRelay(MemoryTransport(broker=broker), batch_size=2, session_factory=fake_session)
+
+    assert [await relay.relay_batch() for _ in range(3)] == [2, 2, 1]
+    assert not fake.rows
+    published = [queue.messages.get_nowait().message_id for _ in range(5)]
+    assert published == ["0", "1", "2", "3", "4"]
+    assert relay.stats.messages == 5
+    assert min(relay.stats.lags) >= 10
+
+
+@pytest.mark.asyncio
+async def test_relay_keeps_rows_when_publish_fails(monkeypatch):
+    """Rows of a batch that could not be published stay in the outbox."""
+    fake = FakeOutbox(3)
+    monkeypatch.setattr(outbox, "OutboxRepository", fake.repository)
+
+    class BrokenTransport(MemoryTransport):
+        """Transport whose broker is down."""
+
+        async def publish(self, envelopes):
+            """Fail to publish."""
+            raise ConnectionError("broker is down")
+
+    relay = OutboxRelay(BrokenTransport(broker=MemoryBroker()), session_factory=fake_session)
+
+    with pytest.raises(ConnectionError):
+        await relay.relay_batch()
+    assert len(fake.rows) == 3
+    assert relay.stats.messages == 0
+
+
+@pytest.mark.asyncio
+async def test_relay_drains_the_outbox_to_the_buffer_journal(monkeypatch, tmp_path):
+    """While the broker is down, journaled batches are deleted from the outbox."""
+    fake = FakeOutbox(3)
+    monkeypatch.setattr(outbox, "OutboxRepository", fake.repository)
+
+    class BrokenTransport(MemoryTransport):
+        """Transport whose broker is down."""
+
+        async def publish(self, envelopes):
+            """Fail to publish."""
+            raise ConnectionError("broker is down")
+
+    transport = BrokenTransport(broker=MemoryBroker())
+    buffer = PublishBuffer(transport, Journal(str(tmp_path)), retry_interval=10)
+    relay = OutboxRelay(transport, session_factory=fake_session, buffer=buffer)
+
+    assert await relay.relay_batch() == 3
+    assert not fake.rows
+    assert buffer.journal.pending == 3
+    await buffer.stop()
+
+
+class LockingSession:
+    """Session running the outbox queries over rows, with advisory locks."""
+
+    def __init__(self, rows, locks: dict):
+        self.rows = rows
+        self.locks = locks
+
+    async def execute(self, statement):
+        """Run a partition count or a claim query."""
+        await asyncio.sleep(0)
+        compiled = statement.compile(dialect=postgresql.dialect())
+        if "GROUP BY" in str(compiled):
+            partitions = {}
+            for row in self.rows:
+                partitions[row.partition] = partitions.get(row.partition, 0) + 1
+            return SimpleNamespace(all=lambda: list(partitions.items()))
+        partitions, limit = compiled.params["partition_1"], compiled.params["param_1"]
+        claimed = [row for row in self.rows if row.partition in partitions][:limit]
+        return SimpleNamespace(all=lambda: claimed)
+
+    async def scalar(self, statement):
+        """Try to take an advisory lock."""
+        await asyncio.sleep(0)
+        key = tuple(statement.compile(dialect=postgresql.dialect()).params.values())
+        return self.locks.setdefault(key, self) is self
+
+
+@pytest.mark.asyncio
+async def test_concurrent_claims_get_disjoint_partitions():
+    """A claim locks only the partitions of its batch, the others are left."""
+    rows = [SimpleNamespace(id=n, partition=n % 4) for n in range(8)]
+    locks = {}
+
+    first, second = await asyncio.gather(
+        OutboxRepository(LockingSession(rows, locks)).claim(4),
+        OutboxRepository(LockingSession(rows, locks)).claim(4),
+    )
+    assert {row.partition for row in first} == {0, 1}
+    assert {row.partition for row in second} == {2, 3}
+    assert len(first) == len(second) == 4
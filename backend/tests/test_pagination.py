@@ -0,0 +1,65 @@
+"""
+Test pagination helpers.
+"""
+
+from datetime import UTC, datetime
+from uuid import uuid4
+
+import pytest
+
+from app.db.models.chat_message import ChatMessage
+from app.db.types.cursor import InvalidCursorError, decode_cursor, encode_cursor
+from app.db.types.pagination import CountStrategy, Pagination
+
+KEYS = (ChatMessage.created_at, ChatMessage.id)
+
+
+def test_cursor_round_trip():
+    """Cursor decodes back into the typed key values."""
+    values = (datetime.now(UTC), uuid4())
+
+    cursor = encode_cursor(values)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, KEYS) == values
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    ["", "not-a-cursor", encode_cursor(["2025-01-01T00:00:00"]), encode_cursor(["x", "y"])],
+)
+def test_invalid_cursor(cursor: str):
+    """Malformed cursors are rejected with InvalidCursorError."""
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(cursor, KEYS)
+
+
+def test_partial_last_page():
+    """A partially filled last page is a valid page."""
+    pagination = Pagination(items=[1, 2, 3], total_items=23, page=3, per_page=10)
+
+    assert pagination.total_pages == 3
+    assert not pagination.has_next
+    assert pagination.previous_page == 2
+
+
+def test_page_out_of_range():
+    """A page past the last one is rejected."""
+    with pytest.raises(ValueError):
+        Pagination(items=[], total_items=20, page=3, per_page=10)
+
+
+def test_pagination_without_total():
+    """Without a total the next page is known from the extra row."""
+    pagination = Pagination(
+        items=[1, 2],
+        total_items=None,
+        page=4,
+        per_page=2,
+        count_strategy=CountStrategy.NONE,
+        has_next=True,
+    )
+
+    assert pagination.total_pages is None
+    assert pagination.next_page == 5
+    assert pagination.previous_page == 3
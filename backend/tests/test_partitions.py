@@ -0,0 +1,38 @@
+"""
+Test the partitioning of the chat message stream.
+"""
+
+import uuid
+from collections import Counter
+
+from app.services.partitions import (chat_routing_key, get_partition,
+                                     jump_hash, parse_partitions)
+
+
+def test_jump_hash_is_consistent():
+    """Keys are spread evenly and few move when a partition is added."""
+    keys = [uuid.uuid4().int for _ in range(10000)]
+
+    before = [jump_hash(key, 16) for key in keys]
+    after = [jump_hash(key, 17) for key in keys]
+
+    counts = Counter(before)
+    assert set(counts) == set(range(16))
+    assert min(counts.values()) > 10000 / 16 * 0.8
+    moved = sum(old != new for old, new in zip(before, after))
+    # ideally 1/17 of the keys, and only to the new partition
+    assert moved < 10000 / 17 * 1.3
+    assert all(new == 16 for old, new in zip(before, after) if old != new)
+
+
+def test_chat_routing_key():
+    """The partition is the last word of the routing key."""
+    chat_id = uuid.uuid4()
+    assert chat_routing_key(chat_id, 8) == f"{chat_id}.{get_partition(chat_id, 8)}"
+    assert get_partition(chat_id, 1) == 0
+
+
+def test_parse_partitions():
+    """Ranges and single partitions are accepted."""
+    assert parse_partitions("0-3, 8,10") == {0, 1, 2, 3, 8, 10}
+    assert parse_partitions("") == set()
@@ -0,0 +1,58 @@
+"""
+Test the batching of the MQ persistence worker.
+"""
+
+import asyncio
+import uuid
+from datetime import UTC, datetime
+
+import pytest
+
+from app.workers.persist import MessageBuffer
+
+
+def make_payload(content: str = "hello") -> dict:
+    """Build a decoded MQ message."""
+    return {
+        "id": uuid.uuid4(),
+        "chat_id": uuid.uuid4(),
+        "user_id": uuid.uuid4(),
+        "content": content,
+        "created_at": datetime.now(UTC),
+    }
+
+
+@pytest.mark.asyncio
+async def test_buffer_flushes_on_size_and_isolates_bad_messages():
+    """A full buffer is written at once, a failing message fails alone."""
+    batches = []
+
+    async def write(rows):
+        if any(row["content"] == "bad" for row in rows):
+            raise ValueError("bad message")
+        batches.append([row["content"] for row in rows])
+
+    buffer = MessageBuffer(batch_size=3, flush_interval=60)
+    buffer._write = write
+
+    results = await asyncio.gather(
+        buffer.add(make_payload("a")),
+        buffer.add(make_payload("b")),
+        buffer.add(make_payload("c")),
+    )
+    assert results == [None, None, None]
+    assert batches == [["a", "b", "c"]]
+
+    tasks = [
+        asyncio.create_task(buffer.add(make_payload(content)))
+        for content in ("d", "bad")
+    ]
+    await asyncio.sleep(0)
+    await buffer.stop()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert results[0] is None
+    assert isinstance(results[1], ValueError)
+    assert batches[1:] == [["d"]]
+    assert buffer.stats.batches == 2
+    assert buffer.stats.messages == 5
+    assert buffer.stats.failed == 1
@@ -0,0 +1,193 @@
+"""
+Test the publish buffer and its journal.
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.journal import Journal, JournalLocked, open_journal_slot
+from app.services.publish_buffer import PublishBuffer, encode_envelope
+from app.services.transports import Envelope
+from app.services.transports.memory import MemoryBroker, MemoryTransport
+
+
+class FlakyTransport(MemoryTransport):
+    """Memory transport whose broker can be taken down."""
+
+    def __init__(self, broker: MemoryBroker):
+        super().__init__(broker=broker)
+        self.down = False
+
+    async def publish(self, envelopes):
+        """Publish, or fail after a while if the broker is down."""
+        if self.down:
+            # an unreachable broker hangs until the connection attempt fails
+            await asyncio.sleep(0.05)
+            raise ConnectionError("broker is down")
+        await super().publish(envelopes)
+
+
+def make_envelope(n: int) -> Envelope:
+    """Build a message numbered ``n``."""
+    return Envelope(
+        body=str(n).encode(),
+        routing_key="chat.0",
+        content_type="text/plain",
+        message_id=str(n),
+        headers={"n": n},
+    )
+
+
+def make_broker():
+    """Broker with a queue receiving every message."""
+    broker = MemoryBroker()
+    queue = broker.declare_queue("test")
+    broker.bind(queue, "#")
+    return broker, queue
+
+
+def test_journal_survives_reopen(tmp_path):
+    """Appended records are read in order across segments and restarts."""
+    journal = Journal(str(tmp_path), segment_size=64)
+    journal.append([b"a" * 10, b"b" * 10, b"c" * 10, b"d" * 100])
+    records, position = journal.read(2)
+    assert records == [b"a" * 10, b"b" * 10]
+    journal.commit(position, len(records))
+    journal.close()
+
+    journal = Journal(str(tmp_path), segment_size=64)
+    assert journal.pending == 2
+    journal.append([b"e"])
+    records, position = journal.read(10)
+    assert records == [b"c" * 10, b"d" * 100, b"e"]
+    journal.commit(position, len(records))
+    assert journal.pending == 0
+    assert len(list(tmp_path.glob("*.seg"))) == 1
+
+
+def test_journal_is_used_by_one_process(tmp_path):
+    """A journal directory can't be opened twice, processes take slots."""
+    journal = Journal(str(tmp_path / "0"))
+    with pytest.raises(JournalLocked):
+        Journal(str(tmp_path / "0"))
+    journal.append([b"a"])
+    journal.close()
+
+    first = open_journal_slot(str(tmp_path))
+    second = open_journal_slot(str(tmp_path))
+    third = open_journal_slot(str(tmp_path))
+    assert first.directory == str(tmp_path / "0")
+    assert first.pending == 1
+    assert {second.directory, third.directory} == {str(tmp_path / "1"), str(tmp_path / "2")}
+    for journal in (second, third):
+        journal.close()
+
+    # a free slot holding records is taken before the empty ones
+    first.close()
+    assert open_journal_slot(str(tmp_path)).directory == str(tmp_path / "0")
+
+
+@pytest.mark.asyncio
+async def test_buffer_spills_during_outage_and_replays_in_order(tmp_path):
+    """Publishes stay fast while the broker is down and are replayed in order."""
+    broker, queue = make_broker()
+    transport = FlakyTransport(broker)
+    buffer = PublishBuffer(
+        transport, Journal(str(tmp_path)), spill_after=0.2, retry_interval=0.01
+    )
+
+    await buffer.put([make_envelope(0)])
+    transport.down = True
+    latencies = []
+    for n in range(1, 50):
+        started = time.perf_counter()
+        await buffer.put([make_envelope(n)])
+        latencies.append(time.perf_counter() - started)
+    assert buffer.spilling
+    # only the first publish waits for the failure
+    assert max(latencies[1:]) < 0.05
+
+    transport.down = False
+    for _ in range(100):
+        if not buffer.spilling:
+            break
+        await asyncio.sleep(0.01)
+    await buffer.put([make_envelope(50)])
+    await buffer.stop()
+
+    received = [queue.messages.get_nowait().headers["n"] for _ in range(51)]
+    assert received == list(range(51))
+    assert buffer.stats.replayed == 49
+
+
+@pytest.mark.asyncio
+async def test_journaled_messages_survive_a_crash(tmp_path):
+    """Messages journaled before a crash are published by the next process."""
+    transport = FlakyTransport(MemoryBroker())
+    transport.down = True
+    buffer = PublishBuffer(transport, Journal(str(tmp_path)), retry_interval=10)
+    await buffer.put([make_envelope(n) for n in range(3)])
+    # crash: the tasks die without a clean stop, the exit releases the lock
+    for task in buffer._tasks:
+        task.cancel()
+    buffer.journal.close()
+
+    broker, queue = make_broker()
+    restarted = PublishBuffer(FlakyTransport(broker), Journal(str(tmp_path)))
+    assert restarted.spilling
+    await restarted.start()
+    for _ in range(100):
+        if not restarted.spilling:
+            break
+        await asyncio.sleep(0.01)
+    await restarted.stop()
+
+    assert [queue.messages.get_nowait().headers["n"] for _ in range(3)] == [0, 1, 2]
+
+
+class PausingJournal(Journal):
+    """Journal whose read pauses once the replay checks that it is empty."""
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self.empty_reads = 0
+        self.paused = threading.Event()
+        self.resume = threading.Event()
+
+    def read(self, count: int):
+        """Read, the second empty read (under the journal lock) waits for ``resume``."""
+        records, position = super().read(count)
+        if not records:
+            self.empty_reads += 1
+            if self.empty_reads == 2:
+                self.paused.set()
+                self.resume.wait(5)
+        return records, position
+
+
+@pytest.mark.asyncio
+async def test_put_during_final_journal_check_is_not_lost(tmp_path):
+    """A spill queued while the replay holds the journal lock is journaled and published."""
+    broker, queue = make_broker()
+    journal = PausingJournal(str(tmp_path))
+    journal.append([encode_envelope(make_envelope(0))])
+    buffer = PublishBuffer(FlakyTransport(broker), journal, retry_interval=0.01)
+    await buffer.start()
+    await asyncio.to_thread(journal.paused.wait, 5)
+
+    # still spilling: the message waits for the journal lock
+    put = asyncio.create_task(buffer.put([make_envelope(1)]))
+    await asyncio.sleep(0.01)
+    journal.resume.set()
+    await asyncio.wait_for(put, 1)
+    for _ in range(100):
+        if not buffer.spilling:
+            break
+        await asyncio.sleep(0.01)
+    await buffer.stop()
+
+    assert [queue.messages.get_nowait().headers["n"] for _ in range(2)] == [0, 1]
+    assert queue.messages.empty()
@@ -0,0 +1,136 @@
+"""
+Test the retries and dead letters of failed messages.
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.services.message_queue import MessageQueueService
+from app.services.retry import ATTEMPTS_HEADER, QUEUE_HEADER, RetryPolicy
+from app.services.transports import Envelope
+from app.services.transports.memory import MemoryBroker, MemoryTransport
+
+
+def test_retry_policy_backoff():
+    """Delays grow exponentially up to the max delay."""
+    policy = RetryPolicy(initial_delay=1, multiplier=4, max_delay=30)
+    assert [policy.delay(attempt) for attempt in range(1, 5)] == [1, 4, 16, 30]
+    assert policy.get_dead_letter_queue("q") == "q.dead"
+
+
+@pytest.mark.asyncio
+async def test_failed_message_does_not_block_partition():
+    """A failing message is retried later while the next ones go on."""
+    broker = MemoryBroker()
+    service = MessageQueueService(transport=MemoryTransport(broker=broker), partitions=1)
+    chat_id, user_id = uuid.uuid4(), uuid.uuid4()
+    handled = []
+    failures = 0
+    done = asyncio.Event()
+
+    async def handle(payload: dict):
+        nonlocal failures
+        if payload["content"] == "flaky" and failures < 2:
+            failures += 1
+            raise RuntimeError("database is down")
+        handled.append(payload["content"])
+        if len(handled) == 3:
+            done.set()
+
+    consumer = asyncio.create_task(
+        service.consume_partitions(
+            handle,
+            group="test",
+            concurrency=1,
+            retry=RetryPolicy(initial_delay=0.01, multiplier=2),
+        )
+    )
+    await asyncio.sleep(0.01)
+    await service.publish_many(
+        {"chat_id": chat_id, "user_id": user_id, "content": content}
+        for content in ("flaky", "1", "2")
+    )
+    await asyncio.wait_for(done.wait(), 1)
+    consumer.cancel()
+    await asyncio.gather(consumer, return_exceptions=True)
+
+    assert handled == ["1", "2", "flaky"]
+    assert broker.queues["chat_messages.test.dead"].messages.empty()
+
+
+@pytest.mark.asyncio
+async def test_poison_message_is_dead_lettered_and_replayed():
+    """After max attempts a message is dead-lettered, replay sends it back."""
+    broker = MemoryBroker()
+    service = MessageQueueService(transport=MemoryTransport(broker=broker))
+    chat_id, user_id = uuid.uuid4(), uuid.uuid4()
+    attempts = 0
+    fixed = asyncio.Event()
+    handled = asyncio.Event()
+
+    async def handle(payload: dict):
+        nonlocal attempts
+        attempts += 1
+        if not fixed.is_set():
+            raise RuntimeError("bug")
+        handled.set()
+
+    consumer = asyncio.create_task(
+        service.consume(
+            handle,
+            queue_name="work",
+            concurrency=1,
+            retry=RetryPolicy(max_attempts=3, initial_delay=0.001),
+        )
+    )
+    await asyncio.sleep(0.01)
+    await service.publish_message(chat_id, user_id, "poison")
+
+    dead = broker.queues["work.dead"].messages
+    for _ in range(100):
+        if not dead.empty():
+            break
+        await asyncio.sleep(0.01)
+    assert attempts == 3
+    envelope = dead.get_nowait()
+    assert envelope.headers[ATTEMPTS_HEADER] == 3
+    assert envelope.headers[QUEUE_HEADER] == "work"
+    dead.put_nowait(envelope)
+
+    fixed.set()
+    replayed = await service.replay_dead_letters("work.dead", idle_timeout=0.05)
+    await asyncio.wait_for(handled.wait(), 1)
+    consumer.cancel()
+    await asyncio.gather(consumer, return_exceptions=True)
+
+    assert replayed == 1
+    assert attempts == 4
+    assert dead.empty()
+
+
+@pytest.mark.asyncio
+async def test_replay_stops_at_the_limit():
+    """Exactly ``limit`` messages are replayed, the others stay dead-lettered."""
+    broker = MemoryBroker()
+    service = MessageQueueService(transport=MemoryTransport(broker=broker))
+    dead = broker.declare_queue("work.dead").messages
+    for n in range(200):
+        dead.put_nowait(
+            Envelope(
+                body=b"{}",
+                routing_key="chat.0",
+                content_type="application/json",
+                message_id=str(n),
+                headers={QUEUE_HEADER: "work", ATTEMPTS_HEADER: 3},
+            )
+        )
+
+    replayed = await asyncio.wait_for(
+        service.replay_dead_letters("work.dead", limit=10, idle_timeout=0.05), 5
+    )
+
+    assert replayed == 10
+    assert broker.queues["work"].messages.qsize() == 10
+    assert dead.qsize() == 190
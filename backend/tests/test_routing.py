@@ -0,0 +1,97 @@
+"""
+Test read replica routing.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.repos.base import HAS_WRITES, BaseRepository
+from app.db.repos.chat import ChatRepository
+from app.db.routing import LazyReplicaSession, ReplicaRouter
+
+
+def test_reader_prefers_replica_until_write():
+    """Reads go to the replica until the primary session has written."""
+    primary, replica = AsyncSession(), AsyncSession()
+    repo = BaseRepository(primary, replica=replica)
+
+    assert repo.reader is replica
+
+    primary.info[HAS_WRITES] = True
+    assert repo.reader is primary
+
+
+def test_reader_without_replica():
+    """Without a replica all reads go to the primary."""
+    primary = AsyncSession()
+
+    assert BaseRepository(primary).reader is primary
+
+
+@pytest.mark.asyncio
+async def test_write_preconditions_are_read_from_the_primary():
+    """A chat checked before a write is read from the primary."""
+    primary, replica = MagicMock(info={}), MagicMock()
+    primary.execute = AsyncMock()
+    replica.execute = AsyncMock()
+    repo = ChatRepository(primary, replica=replica)
+
+    await repo.get_chat_by_id(MagicMock())
+    assert replica.execute.await_count == 1
+
+    await repo.get_chat_by_id(MagicMock(), primary=True)
+    assert primary.execute.await_count == 1
+    assert replica.execute.await_count == 1
+
+
+def test_router_skips_unhealthy_and_lagging_replicas():
+    """Only healthy replicas within the lag limit are picked."""
+    router = ReplicaRouter([MagicMock(), MagicMock(), MagicMock()], max_lag=5)
+    down, lagging, good = router.replicas
+    down.healthy = False
+    lagging.healthy, lagging.lag = True, 30
+    good.healthy, good.lag = True, 0.5
+
+    assert {id(router.pick()) for _ in range(4)} == {id(good)}
+
+    good.lag = 10
+    assert router.pick() is None
+
+
+@pytest.mark.asyncio
+async def test_slow_health_check_does_not_block_sessions():
+    """Sessions use the last known replica state while a check hangs."""
+    router = ReplicaRouter([MagicMock()])
+    checking = asyncio.Event()
+
+    async def check_replica(replica):
+        checking.set()
+        await asyncio.sleep(3600)
+
+    router.check_replica = check_replica
+    assert router.get_session() is None
+    await checking.wait()
+
+    replica = router.replicas[0]
+    replica.healthy, replica.lag = True, 0
+    assert isinstance(router.get_session(), AsyncSession)
+    await router.stop()
+
+
+def test_lazy_replica_session_is_opened_by_the_first_read():
+    """A request writing before it reads never opens a replica session."""
+    router = MagicMock()
+    router.get_session.return_value = AsyncSession()
+
+    primary = AsyncSession()
+    primary.info[HAS_WRITES] = True
+    assert BaseRepository(primary, replica=LazyReplicaSession(router)).reader is primary
+    router.get_session.assert_not_called()
+
+    repo = BaseRepository(AsyncSession(), replica=LazyReplicaSession(router))
+    assert repo.reader is router.get_session.return_value
+    assert repo.reader is router.get_session.return_value
+    router.get_session.assert_called_once()
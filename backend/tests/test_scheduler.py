@@ -0,0 +1,70 @@
+"""
+Test the sharded bot update scheduler.
+"""
+
+import asyncio
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message, Update
+
+from app.bot.scheduler import ShardedUpdateScheduler
+
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    """Build a text message update in a chat."""
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 1700000000,
+                "chat": {"id": chat_id, "type": "group", "title": "Test"},
+                "from": {"id": 1, "is_bot": False, "first_name": "Test"},
+                "text": f"message {update_id}",
+            },
+        }
+    )
+
+
+@pytest.mark.asyncio
+async def test_scheduler_keeps_chat_order():
+    """Updates of a chat are handled in order, other chats run meanwhile."""
+    handled = []
+    release = asyncio.Event()
+    router = Router()
+
+    @router.message()
+    async def handle(message: Message):
+        if message.chat.id == 1 and message.message_id == 1:
+            await release.wait()
+        handled.append((message.chat.id, message.message_id))
+
+    scheduler = ShardedUpdateScheduler(shards=2)
+    dispatcher = Dispatcher()
+    dispatcher.update.outer_middleware(scheduler)
+    dispatcher.include_router(router)
+    bot = Bot(token="42:TEST")
+
+    other_chat = 2
+    assert scheduler.get_shard(1) != scheduler.get_shard(other_chat)
+
+    tasks = [
+        asyncio.create_task(dispatcher.feed_update(bot, make_update(1, 1))),
+        asyncio.create_task(dispatcher.feed_update(bot, make_update(2, 1))),
+        asyncio.create_task(dispatcher.feed_update(bot, make_update(3, other_chat))),
+    ]
+    await tasks[2]
+    assert handled == [(other_chat, 3)]
+
+    stats = scheduler.get_stats()[scheduler.get_shard(1)]
+    assert stats["depth"] == 1
+    assert stats["lag"] > 0
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert handled == [(other_chat, 3), (1, 1), (1, 2)]
+
+    await scheduler.stop()
+    assert not scheduler.is_running
+    assert sum(shard["processed"] for shard in scheduler.get_stats()) == 3
@@ -0,0 +1,205 @@
+"""
+Test the server-sent event stream of the chat messages.
+"""
+
+import uuid
+from contextlib import asynccontextmanager
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.db.types.cursor import CursorPagination, decode_cursor, encode_cursor
+from app.services.fanout import FanoutHub
+from app.utils.access_token import create_access_token
+from app.web import sse
+
+
+def make_message(chat_id, n: int):
+    """Stored message number ``n``."""
+    return SimpleNamespace(
+        id=uuid.UUID(int=n),
+        chat_id=chat_id,
+        user_id=None,
+        user=None,
+        content=f"message {n}",
+        created_at=datetime(2026, 1, 1, tzinfo=UTC) + timedelta(seconds=n),
+    )
+
+
+def to_payload(message):
+    """Live payload of a stored message."""
+    return {
+        "id": message.id,
+        "chat_id": message.chat_id,
+        "user_id": message.user_id,
+        "content": message.content,
+        "created_at": message.created_at,
+    }
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    """Hub serializing a message as its content."""
+    hub = FanoutHub(lambda payload: f"live {payload['content']}")
+    monkeypatch.setattr(sse, "chat_stream_hub", hub)
+    return hub
+
+
+@pytest.mark.asyncio
+async def test_resume_replays_missed_messages_then_goes_live(hub, monkeypatch):
+    """Messages published during the replay are sent once, after it."""
+    chat_id = uuid.uuid4()
+    messages = [make_message(chat_id, n) for n in range(4)]
+
+    async def replay_messages(chat_id, cursor):
+        # published meanwhile, the first one is replayed as well
+        hub.publish(to_payload(messages[2]))
+        hub.publish(to_payload(messages[3]))
+        return messages[1:3]
+
+    monkeypatch.setattr(sse, "replay_messages", replay_messages)
+    cursor = encode_cursor((messages[0].created_at, messages[0].id))
+    events = sse.chat_events(chat_id, cursor)
+
+    received = [(await anext(events)).decode() for _ in range(3)]
+    assert [event.splitlines()[0] for event in received] == [
+        f"id: {encode_cursor((message.created_at, message.id))}" for message in messages[1:]
+    ]
+    assert received[2].endswith("data: live message 3\n\n")
+    await events.aclose()
+    assert not hub.subscriptions
+
+
+@pytest.mark.asyncio
+async def test_live_messages_out_of_cursor_order_are_sent(hub, monkeypatch):
+    """Only replayed messages are skipped, not every older live message."""
+    chat_id = uuid.uuid4()
+    messages = [make_message(chat_id, n) for n in range(5)]
+
+    async def replay_messages(chat_id, cursor):
+        hub.publish(to_payload(messages[2]))
+        return messages[1:3]
+
+    monkeypatch.setattr(sse, "replay_messages", replay_messages)
+    cursor = encode_cursor((messages[0].created_at, messages[0].id))
+    events = sse.chat_events(chat_id, cursor)
+    replayed = [await anext(events) for _ in range(2)]
+
+    # concurrent senders: the newer message is delivered first
+    hub.publish(to_payload(messages[4]))
+    hub.publish(to_payload(messages[3]))
+    live = [(await anext(events)).decode() for _ in range(2)]
+    assert len(replayed) == 2
+    assert live[0].endswith("data: live message 4\n\n")
+    assert live[1].endswith("data: live message 3\n\n")
+    await events.aclose()
+
+
+@pytest.mark.asyncio
+async def test_idle_stream_sends_keepalives_and_drops_slow_clients(hub, monkeypatch):
+    """Keep-alive comments while idle, a client falling behind is disconnected."""
+    monkeypatch.setattr(settings.stream, "keepalive", 0.01)
+    chat_id = uuid.uuid4()
+    events = sse.chat_events(chat_id, None)
+
+    assert await anext(events) == sse.KEEPALIVE
+    hub.publish(to_payload(make_message(chat_id, 0)))
+    assert (await anext(events)).endswith(b"data: live message 0\n\n")
+    for n in range(1, hub.max_pending + 2):
+        hub.publish(to_payload(make_message(chat_id, n)))
+    assert [event async for event in events] == []
+    assert hub.stats.evicted == 1
+    assert not hub.subscriptions
+
+
+@pytest.mark.asyncio
+async def test_session_is_closed_before_streaming(hub, monkeypatch):
+    """The membership check holds no connection while the stream is open."""
+    monkeypatch.setattr(settings.stream, "keepalive", 0.01)
+    user = SimpleNamespace(id=uuid.uuid4())
+    log = []
+
+    @asynccontextmanager
+    async def get_async_session():
+        log.append("open")
+        yield None
+        log.append("close")
+
+    class UserRepository:
+        """Finds the user."""
+
+        def __init__(self, session):
+            self.session = session
+
+        async def get_user_by_id(self, user_id):
+            """The user with the ID of the token."""
+            return user if user_id == str(user.id) else None
+
+    class ChatMemberRepository:
+        """Every user is a member."""
+
+        def __init__(self, session):
+            self.session = session
+
+        async def get_chat_member(self, chat_id, user_id):
+            """A member of the chat."""
+            return SimpleNamespace(chat_id=chat_id, user_id=user_id)
+
+    monkeypatch.setattr(sse, "get_async_session", get_async_session)
+    monkeypatch.setattr(sse, "UserRepository", UserRepository)
+    monkeypatch.setattr(sse, "ChatMemberRepository", ChatMemberRepository)
+    token = create_access_token({"sub": str(user.id)})
+
+    response = await sse.chat_messages_events(uuid.uuid4(), None, None, token)
+    events = response.body_iterator
+    assert await anext(events) == sse.KEEPALIVE
+    log.append("event")
+    await events.aclose()
+    assert log == ["open", "close", "event"]
+
+
+@pytest.mark.asyncio
+async def test_resume_replays_messages_committed_late(monkeypatch):
+    """A message older than the last event but sent after it is replayed."""
+    monkeypatch.setattr(settings.stream.replay, "page", 2)
+    chat_id = uuid.uuid4()
+    stored = [make_message(chat_id, n) for n in range(6)]
+
+    class MessageRepository:
+        """Keyset pages over the stored messages."""
+
+        def __init__(self, session):
+            self.session = session
+
+        async def get_messages_by_chat_cursor(self, chat_id, after, per_page):
+            """The oldest messages after the cursor, newest first."""
+            key = decode_cursor(after, sse.CURSOR_KEYS)
+            newer = [row for row in stored if (row.created_at, row.id) > key]
+            items = newer[:per_page]
+            return CursorPagination(
+                list(reversed(items)),
+                per_page,
+                has_next=True,
+                has_previous=len(newer) > per_page,
+                previous_cursor=encode_cursor((items[-1].created_at, items[-1].id)),
+            )
+
+    @asynccontextmanager
+    async def get_async_session():
+        yield None
+
+    monkeypatch.setattr(sse, "MessageRepository", MessageRepository)
+    monkeypatch.setattr(sse, "get_async_session", get_async_session)
+
+    # 0, 1, 2 and 4 were sent, 3 was committed after 4
+    cursor = encode_cursor((stored[4].created_at, stored[4].id))
+    replayed = await sse.replay_messages(chat_id, cursor)
+    assert [row.content for row in replayed] == [
+        "message 0", "message 1", "message 2", "message 3", "message 5"
+    ]
+
+    monkeypatch.setattr(settings.stream.replay, "grace", 0)
+    replayed = await sse.replay_messages(chat_id, cursor)
+    assert [row.content for row in replayed] == ["message 5"]
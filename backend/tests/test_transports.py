@@ -0,0 +1,165 @@
+"""
+Test the message queue transports that need no external backend.
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.services.message_queue import MessageQueueService
+from app.services.transports import Envelope, RequeueMessage, topic_matches
+from app.services.transports.memory import MemoryBroker, MemoryTransport
+
+
+@pytest.mark.parametrize(
+    "pattern, routing_key, matches",
+    [
+        ("*", "chat", True),
+        ("*", "chat.1", False),
+        ("#", "chat.1", True),
+        ("#", "", True),
+        ("chat.*", "chat.1", True),
+        ("chat.#", "chat", True),
+        ("chat.#.x", "chat.1.2.x", True),
+        ("chat.*.x", "chat.1.2.x", False),
+    ],
+)
+def test_topic_matches(pattern: str, routing_key: str, matches: bool):
+    """Topic patterns follow the AMQP rules."""
+    assert topic_matches(pattern, routing_key) is matches
+
+
+@pytest.mark.asyncio
+async def test_memory_transport_round_trip():
+    """Messages are routed by chat ID, decoded and consumed in order."""
+    service = MessageQueueService(transport=MemoryTransport(broker=MemoryBroker()))
+    chat_id, other_chat_id, user_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    received = []
+    done = asyncio.Event()
+
+    async def handle(payload: dict):
+        received.append(payload["content"])
+        if len(received) == 3:
+            done.set()
+
+    consumer = asyncio.create_task(
+        service.consume(
+            handle, queue_name="test", routing_key=f"{chat_id}.*", concurrency=1
+        )
+    )
+    await asyncio.sleep(0)
+    await service.publish_many(
+        [
+            {"chat_id": chat_id, "user_id": user_id, "content": "1"},
+            {"chat_id": other_chat_id, "user_id": user_id, "content": "other"},
+            {"chat_id": chat_id, "user_id": user_id, "content": "2"},
+        ]
+    )
+    await service.publish_message(chat_id, user_id, "3")
+
+    await asyncio.wait_for(done.wait(), 1)
+    consumer.cancel()
+    await asyncio.gather(consumer, return_exceptions=True)
+    assert received == ["1", "2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_memory_transport_consume_messages():
+    """The generator yields messages one at a time and cleans up on close."""
+    broker = MemoryBroker()
+    service = MessageQueueService(transport=MemoryTransport(broker=broker))
+    chat_id, user_id = uuid.uuid4(), uuid.uuid4()
+
+    messages = service.consume_messages(chat_id)
+    first = asyncio.create_task(messages.__anext__())
+    await asyncio.sleep(0.01)
+    await service.publish_message(chat_id, user_id, "hello")
+    await service.publish_message(chat_id, user_id, "again")
+
+    payload = await asyncio.wait_for(first, 1)
+    assert payload["content"] == "hello"
+    assert payload["chat_id"] == chat_id
+    await messages.aclose()
+    assert not broker.queues
+
+
+@pytest.mark.asyncio
+async def test_memory_transport_partitions_keep_chat_order():
+    """Partitions with concurrent handlers keep the order within a chat."""
+    broker = MemoryBroker()
+    service = MessageQueueService(transport=MemoryTransport(broker=broker), partitions=4)
+    chat_ids = [uuid.uuid4() for _ in range(20)]
+    user_id = uuid.uuid4()
+    received = {chat_id: [] for chat_id in chat_ids}
+    total = len(chat_ids) * 10
+    done = asyncio.Event()
+
+    async def handle(payload: dict):
+        # out of order completion if two messages of a chat overlapped
+        await asyncio.sleep(0.001 * (int(payload["content"]) % 3))
+        received[payload["chat_id"]].append(int(payload["content"]))
+        if sum(len(contents) for contents in received.values()) == total:
+            done.set()
+
+    consumers = [
+        asyncio.create_task(
+            service.consume_partitions(handle, group="test", concurrency=4, standby_delay=0)
+        )
+        for _ in range(2)
+    ]
+    await asyncio.sleep(0.01)
+    # the second consumer of every partition is a standby
+    assert all(queue.active.locked() for queue in broker.queues.values())
+    assert len(broker.queues) == 4
+
+    await service.publish_many(
+        {"chat_id": chat_id, "user_id": user_id, "content": str(n)}
+        for n in range(10)
+        for chat_id in chat_ids
+    )
+    await asyncio.wait_for(done.wait(), 5)
+    for consumer in consumers:
+        consumer.cancel()
+    await asyncio.gather(*consumers, return_exceptions=True)
+
+    assert all(contents == list(range(10)) for contents in received.values())
+
+
+@pytest.mark.asyncio
+async def test_memory_transport_requeues_into_a_full_queue():
+    """Messages are put back while publishers wait for room in the queue."""
+    broker = MemoryBroker(queue_size=1)
+    transport = MemoryTransport(broker=broker)
+    queue = broker.declare_queue("test")
+    broker.bind(queue, "#")
+    handled = []
+    first = asyncio.Event()
+
+    async def handle(envelope):
+        handled.append(envelope.message_id)
+        if len(handled) == 1:
+            # the publisher refills the queue meanwhile
+            first.set()
+            await asyncio.sleep(0.01)
+            raise RequeueMessage()
+        await asyncio.Event().wait()
+
+    publisher = asyncio.create_task(
+        transport.publish([Envelope(b"", "chat", "application/json", str(n)) for n in range(3)])
+    )
+    consumer = asyncio.create_task(
+        transport.consume(handle, queue_name="test", routing_key=None, concurrency=1)
+    )
+    await first.wait()
+    while len(handled) < 2 and not consumer.done():
+        await asyncio.sleep(0.01)
+    # the handled message goes back into the full queue as well
+    consumer.cancel()
+    await asyncio.gather(consumer, return_exceptions=True)
+
+    assert consumer.cancelled()
+    received = [queue.messages.get_nowait().message_id for _ in range(2)]
+    await publisher
+    received.append(queue.messages.get_nowait().message_id)
+    assert received == ["0", "1", "2"]
@@ -0,0 +1,159 @@
+"""
+Test the bot webhook entry point.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.bot.scheduler import ShardedUpdateScheduler
+from app.bot.webhook import ConcurrentRequestHandler, UpdateTracker
+
+
+def make_update(update_id: int, chat_id: int = 1) -> dict:
+    """Build a recorded text message update."""
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1700000000,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": 1, "is_bot": False, "first_name": "Test"},
+            "text": f"message {update_id}",
+        },
+    }
+
+
+def test_update_tracker_watermark():
+    """The watermark only passes updates once all older ones are done."""
+    tracker = UpdateTracker(last_update_id=10)
+
+    assert not tracker.claim(10)
+    assert tracker.claim(11)
+    assert tracker.claim(12)
+    assert not tracker.claim(12)
+
+    tracker.done(12)
+    assert tracker.last_update_id == 10
+    assert not tracker.claim(12)
+
+    tracker.done(11)
+    assert tracker.last_update_id == 12
+    assert tracker.dirty
+    assert tracker.in_flight == 0
+
+
+def test_update_tracker_waits_for_late_updates():
+    """A late update is not skipped, a missing one holds the watermark for a while."""
+    now = [0.0]
+    tracker = UpdateTracker(gap_timeout=60, timer=lambda: now[0])
+    for update_id in (101, 103):
+        assert tracker.claim(update_id)
+        tracker.done(update_id)
+    assert tracker.last_update_id == 101
+
+    # delivered again after a 503
+    assert tracker.claim(102)
+    assert not tracker.claim(103)
+    tracker.done(102)
+    assert tracker.last_update_id == 103
+
+    # 104 never arrives
+    assert tracker.claim(105)
+    tracker.done(105)
+    assert tracker.last_update_id == 103
+    now[0] = 61
+    tracker.advance()
+    assert tracker.last_update_id == 105
+
+
+@pytest.mark.asyncio
+async def test_webhook_handles_updates_in_background():
+    """Updates are answered at once, checked for the secret and deduplicated."""
+    handled = []
+    release = asyncio.Event()
+    router = Router()
+
+    @router.message()
+    async def handle(message: Message):
+        await release.wait()
+        handled.append(message.message_id)
+
+    dispatcher = Dispatcher()
+    dispatcher.include_router(router)
+    bot = Bot(token="42:TEST")
+
+    handler = ConcurrentRequestHandler(
+        dispatcher=dispatcher, bot=bot, secret_token="secret", concurrency=1, backlog=1
+    )
+    handler.load = AsyncMock()
+    handler.flush = AsyncMock()
+    app = web.Application()
+    handler.register(app, path="/webhook")
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": "secret"}
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post("/webhook", json=make_update(1))
+        assert response.status == 401
+
+        # answered while the handler is still waiting
+        response = await client.post("/webhook", json=make_update(1), headers=headers)
+        assert response.status == 200
+        response = await client.post("/webhook", json=make_update(1), headers=headers)
+        assert response.status == 200
+        response = await client.post("/webhook", json=make_update(2), headers=headers)
+        assert response.status == 200
+        response = await client.post("/webhook", json=make_update(3), headers=headers)
+        assert response.status == 503
+
+        release.set()
+        await asyncio.gather(*handler._background_feed_update_tasks)
+
+    assert handled == [1, 2]
+    assert handler.tracker.last_update_id == 2
+
+
+@pytest.mark.asyncio
+async def test_busy_chat_does_not_take_every_slot():
+    """Updates queued behind a busy chat hold no slot, other chats go on."""
+    handled = []
+    release = asyncio.Event()
+    router = Router()
+
+    @router.message()
+    async def handle(message: Message):
+        if message.chat.id == 1:
+            await release.wait()
+        handled.append(message.message_id)
+
+    scheduler = ShardedUpdateScheduler(shards=2)
+    dispatcher = Dispatcher()
+    dispatcher.update.outer_middleware(scheduler)
+    dispatcher["update_scheduler"] = scheduler
+    dispatcher.include_router(router)
+    handler = ConcurrentRequestHandler(
+        dispatcher=dispatcher, bot=Bot(token="42:TEST"), concurrency=2, backlog=10
+    )
+    handler.load = AsyncMock()
+    handler.flush = AsyncMock()
+    app = web.Application()
+    handler.register(app, path="/webhook")
+    assert scheduler.get_shard(1) != scheduler.get_shard(2)
+
+    async with TestClient(TestServer(app)) as client:
+        for update_id in (1, 2, 3):
+            await client.post("/webhook", json=make_update(update_id, chat_id=1))
+        await client.post("/webhook", json=make_update(4, chat_id=2))
+        for _ in range(100):
+            if handled:
+                break
+            await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(*handler._background_feed_update_tasks)
+    await scheduler.stop()
+    assert handled == [4, 1, 2, 3]